@@ -52,6 +52,10 @@ from blueprints.community import community_bp
 from utils.error_handlers import register_error_handlers
 from utils.cache_utils import clear_all_caches
 from services.recommendation_service import create_recommendation_engine, RecommendationEngine
+from services.recommendation_cache import register_cache_invalidation
+from services.wine_stats_service import register_wine_stats_tracking
+from services.wine_feature_store import register_wine_trait_tracking
+from services.search_sync_service import register_search_sync, search_sync_service
 from services.wine_discovery_service import create_wine_discovery_service
 
 # Function to sanitize data before JSON serialization
@@ -281,6 +285,17 @@ def create_app():
         # Initialize Other Extensions
         socketio.init_app(app)
         mail.init_app(app)
+
+        # Keep per-wine review stats in step with review writes
+        register_wine_stats_tracking()
+        # Trait link changes mark their wines as updated for incremental readers
+        register_wine_trait_tracking()
+
+        # Queue search index updates for changed wines
+        if app.config.get('SEARCH_SYNC_ENABLED', True):
+            register_search_sync()
+            if app.config.get('SEARCH_SYNC_WORKER'):
+                search_sync_service.start(app)
         
         # Celery Configuration
         celery.conf.update(app.config)
@@ -310,6 +325,7 @@ def create_app():
             try:
                 recommendation_engine = create_recommendation_engine()
                 app.config['recommendation_engine'] = recommendation_engine
+                register_cache_invalidation()
             except Exception as e:
                 from utils.error_handlers import handle_initialization_error
                 handle_initialization_error(e, "Recommendation Engine")
@@ -383,6 +399,29 @@ def create_app():
                 db.session.rollback()
                 raise
         
+        from commands import (
+            index_wines_command,
+            build_recommendation_snapshot_command,
+            recommend_batch_command,
+            evaluate_recommendations_command,
+            import_wines_command,
+            build_wine_features_command,
+            backfill_wine_stats_command,
+            check_wine_stats_command,
+            build_search_index_command,
+            sync_search_index_command
+        )
+        app.cli.add_command(index_wines_command)
+        app.cli.add_command(build_recommendation_snapshot_command)
+        app.cli.add_command(recommend_batch_command)
+        app.cli.add_command(evaluate_recommendations_command)
+        app.cli.add_command(import_wines_command)
+        app.cli.add_command(build_wine_features_command)
+        app.cli.add_command(backfill_wine_stats_command)
+        app.cli.add_command(check_wine_stats_command)
+        app.cli.add_command(build_search_index_command)
+        app.cli.add_command(sync_search_index_command)
+        
         @app.cli.command("clear-caches")
         def clear_caches():
             """Clear all application caches"""
@@ -0,0 +1,116 @@
+"""
+Benchmark implicit ALS training time and recall@K
+
+Synthetic interactions are sampled from hidden user/item taste vectors
+(plus item popularity), one interaction per user is held out, and
+recall@K of the held-out wine is compared between ALS and a popularity
+baseline. Per-request latency of the ALS path (one matrix-vector product
+plus top-K) is also reported.
+
+Usage: python benchmarks/als_benchmark.py [n_users:n_items:n_interactions ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.matrix_factorization import ImplicitALS
+from utils.recommendation_helpers import RecommendationHelper
+
+K = 10
+HIDDEN_FACTORS = 8
+EVAL_USERS = 2000
+
+
+def synthetic_interactions(n_users, n_items, n_interactions, seed=42):
+    """
+    Sample (user, item, weight) columns from a hidden low-rank taste model
+    """
+    rng = np.random.default_rng(seed)
+    users = rng.standard_normal((n_users, HIDDEN_FACTORS)).astype(np.float32)
+    items = rng.standard_normal((n_items, HIDDEN_FACTORS)).astype(np.float32)
+    popularity = np.log1p(rng.zipf(1.5, n_items).clip(max=1000)).astype(np.float32)
+
+    per_user = np.maximum(1, rng.poisson(n_interactions / n_users, n_users))
+    user_col = np.repeat(np.arange(n_users), per_user)
+    item_col = np.empty(len(user_col), dtype=np.int64)
+    offset = 0
+    for user in range(n_users):
+        logits = items.dot(users[user]) + popularity
+        # Gumbel top-k: sample items without replacement by taste + popularity
+        sample = RecommendationHelper.top_k(logits + rng.gumbel(size=n_items).astype(np.float32), per_user[user])
+        item_col[offset:offset + len(sample)] = sample
+        offset += len(sample)
+    weights = rng.choice([1.0, 2.0, 3.0], len(user_col), p=[0.6, 0.3, 0.1])
+    return user_col, item_col[:offset], weights
+
+
+def hold_out(user_col, item_col, weights, n_users, n_items, seed=0):
+    """
+    Hold out one random interaction per user with at least two
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(user_col))
+    _, first = np.unique(user_col[order], return_index=True)
+    test = order[first]
+    counts = np.bincount(user_col, minlength=n_users)
+    test = test[counts[user_col[test]] > 1]
+
+    train = np.ones(len(user_col), dtype=bool)
+    train[test] = False
+    matrix = sparse.csr_matrix(
+        (weights[train].astype(np.float32), (user_col[train], item_col[train])), shape=(n_users, n_items)
+    )
+    return matrix, dict(zip(user_col[test].tolist(), item_col[test].tolist()))
+
+
+def recall_at_k(rank, train, held_out, users):
+    hits = 0
+    for user in users:
+        seen = train.indices[train.indptr[user]:train.indptr[user + 1]]
+        hits += held_out[user] in set(rank(user, seen).tolist())
+    return hits / len(users)
+
+
+def run(n_users, n_items, n_interactions):
+    user_col, item_col, weights = synthetic_interactions(n_users, n_items, n_interactions)
+    train, held_out = hold_out(user_col, item_col, weights, n_users, n_items)
+    users = np.random.default_rng(1).choice(list(held_out), min(EVAL_USERS, len(held_out)), replace=False)
+
+    start = time.perf_counter()
+    als = ImplicitALS(factors=32, iterations=10).fit(train)
+    train_seconds = time.perf_counter() - start
+
+    def rank_als(user, seen):
+        return als.recommend(als.user_factors[user], exclude=seen, k=K)[0]
+
+    popularity = np.asarray((train > 0).sum(axis=0)).ravel().astype(np.float32)
+
+    def rank_popular(user, seen):
+        scores = popularity.copy()
+        scores[seen] = -np.inf
+        return RecommendationHelper.top_k(scores, K)
+
+    start = time.perf_counter()
+    als_recall = recall_at_k(rank_als, train, held_out, users)
+    latency_ms = (time.perf_counter() - start) / len(users) * 1000
+    popular_recall = recall_at_k(rank_popular, train, held_out, users)
+
+    print(
+        f"{n_users:>7,} users x {n_items:>6,} wines, {train.nnz:>9,} interactions | "
+        f"train {train_seconds:7.2f}s | recall@{K} ALS {als_recall:.3f} vs popularity {popular_recall:.3f} | "
+        f"recommend {latency_ms:.3f} ms/user"
+    )
+
+
+if __name__ == '__main__':
+    sizes = [tuple(int(part) for part in arg.split(':')) for arg in sys.argv[1:]] or [
+        (10_000, 5_000, 200_000),
+        (50_000, 20_000, 1_000_000)
+    ]
+    for size in sizes:
+        run(*size)
@@ -0,0 +1,69 @@
+"""
+Benchmark the IVF approximate nearest-neighbour index against brute force
+
+Synthetic item embeddings are drawn around a few hundred taste clusters
+(factor vectors of real catalogs cluster by style, so uniformly random
+vectors would be an unrealistically hard case). For each n_probe setting,
+recall@K of the IVF top K against the exact inner-product top K and the
+per-query latency of both are reported.
+
+Usage: python benchmarks/ann_benchmark.py [n_items:dim ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.recommendation_helpers import IVFIndex, RecommendationHelper
+
+K = 10
+CLUSTERS = 200
+QUERIES = 500
+PROBES = (1, 4, 8, 16, 32)
+
+
+def clustered_vectors(n, dim, centers, rng):
+    return (centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim))).astype(np.float32)
+
+
+def run(n_items, dim):
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((CLUSTERS, dim))
+    items = clustered_vectors(n_items, dim, centers, rng)
+    queries = clustered_vectors(QUERIES, dim, centers, rng)
+
+    start = time.perf_counter()
+    index = IVFIndex().build(items)
+    build_seconds = time.perf_counter() - start
+
+    exact, brute_timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        exact.append(set(RecommendationHelper.top_k(items.dot(query), K).tolist()))
+        brute_timings.append(time.perf_counter() - start)
+    brute_ms = np.median(brute_timings) * 1000
+
+    print(f"{n_items:>9,} items x {dim} dims | {len(index.centroids)} lists, "
+          f"build {build_seconds:.2f}s | brute force p50 {brute_ms:.3f} ms")
+    for n_probe in PROBES:
+        timings, recall = [], 0.0
+        for query, expected in zip(queries, exact):
+            start = time.perf_counter()
+            found, _ = index.query(query, K, n_probe=n_probe)
+            timings.append(time.perf_counter() - start)
+            recall += len(expected.intersection(found.tolist())) / K
+        ivf_ms = np.median(timings) * 1000
+        print(f"    n_probe {n_probe:>3} | recall@{K} {recall / QUERIES:.3f} | "
+              f"p50 {ivf_ms:.3f} ms ({brute_ms / ivf_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    sizes = [tuple(int(part) for part in arg.split(':')) for arg in sys.argv[1:]] or [
+        (100_000, 32),
+        (1_000_000, 32)
+    ]
+    for size in sizes:
+        run(*size)
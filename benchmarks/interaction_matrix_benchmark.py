@@ -0,0 +1,89 @@
+"""
+Benchmark the recommendation interaction matrix build
+
+Compares the previous dense ``np.zeros((users, wines))`` build with the
+sparse CSR/CSC build used by ``RecommendationEngine`` on synthetic
+interactions. The dense build is skipped when it would not fit in memory
+and its size is reported from the shape instead.
+
+Usage: python benchmarks/interaction_matrix_benchmark.py [n_interactions ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.recommendation_helpers import RecommendationHelper
+
+DENSE_LIMIT_BYTES = 2 * 1024 ** 3
+INTERACTIONS_PER_USER = 20
+CATALOG_SIZE = 20000
+
+
+def synthetic_interactions(n_interactions, seed=42):
+    """
+    Generate long-tailed synthetic (user, wine, weight) columns
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(1, n_interactions // INTERACTIONS_PER_USER)
+    user_ids = rng.integers(1, n_users + 1, n_interactions)
+    wine_ids = (rng.zipf(1.3, n_interactions) % CATALOG_SIZE) + 1
+    weights = rng.choice([1.0, 2.0, 3.0], n_interactions)
+    return user_ids, wine_ids, weights
+
+
+def build_dense(user_ids, wine_ids, weights):
+    """
+    Previous implementation: Python loop into a dense float64 matrix
+    """
+    users = sorted(set(user_ids.tolist()))
+    wines = sorted(set(wine_ids.tolist()))
+    matrix = np.zeros((len(users), len(wines)))
+    user_index = {user_id: idx for idx, user_id in enumerate(users)}
+    wine_index = {wine_id: idx for idx, wine_id in enumerate(wines)}
+    for user_id, wine_id, weight in zip(user_ids.tolist(), wine_ids.tolist(), weights.tolist()):
+        matrix[user_index[user_id], wine_index[wine_id]] = weight
+    return matrix
+
+
+def sparse_nbytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def run(n_interactions):
+    user_ids, wine_ids, weights = synthetic_interactions(n_interactions)
+    catalog = np.arange(1, CATALOG_SIZE + 1)
+
+    start = time.perf_counter()
+    csr, row_ids, col_ids = RecommendationHelper.build_interaction_matrix(
+        user_ids, wine_ids, weights, catalog_wine_ids=catalog
+    )
+    csc = csr.tocsc()
+    sparse_seconds = time.perf_counter() - start
+    sparse_bytes = sparse_nbytes(csr) + sparse_nbytes(csc)
+
+    n_users = len(np.unique(user_ids))
+    n_wines = len(np.unique(wine_ids))
+    dense_bytes = n_users * n_wines * 8
+    if dense_bytes <= DENSE_LIMIT_BYTES:
+        start = time.perf_counter()
+        build_dense(user_ids, wine_ids, weights)
+        dense_time = f"{time.perf_counter() - start:8.3f}s"
+    else:
+        dense_time = "skipped"
+
+    print(
+        f"{n_interactions:>9,} interactions | "
+        f"dense {dense_bytes / 1024 ** 2:10.1f} MiB {dense_time:>9} | "
+        f"sparse {sparse_bytes / 1024 ** 2:7.1f} MiB {sparse_seconds:7.3f}s "
+        f"(shape {csr.shape[0]}x{csr.shape[1]}, nnz {csr.nnz:,})"
+    )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        run(size)
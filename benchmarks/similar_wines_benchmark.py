@@ -0,0 +1,104 @@
+"""
+Benchmark the precomputed similar-wines table
+
+Builds a synthetic model (long-tailed interactions plus a handful of traits
+per wine), times the offline blocked top-k computation, and compares the
+per-request cost of the old approach (scoring one wine against the whole
+catalog) with the O(1) lookup served from the precomputed table.
+
+Usage: python benchmarks/similar_wines_benchmark.py [n_wines ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.recommendation_service import RecommendationModel
+from utils.recommendation_helpers import RecommendationHelper
+
+N_TRAITS = 60
+TRAITS_PER_WINE = 5
+INTERACTIONS_PER_WINE = 10
+INTERACTIONS_PER_USER = 20
+K = 20
+LOOKUPS = 1000
+
+
+def synthetic_model(n_wines, seed=42):
+    """
+    Build a RecommendationModel with synthetic interactions and traits
+    """
+    rng = np.random.default_rng(seed)
+    n_interactions = n_wines * INTERACTIONS_PER_WINE
+    n_users = max(1, n_interactions // INTERACTIONS_PER_USER)
+    wine_ids = np.arange(1, n_wines + 1)
+
+    interactions, user_ids, _ = RecommendationHelper.build_interaction_matrix(
+        rng.integers(1, n_users + 1, n_interactions),
+        (rng.zipf(1.3, n_interactions) % n_wines) + 1,
+        rng.choice([1.0, 2.0, 3.0], n_interactions),
+        catalog_wine_ids=wine_ids
+    )
+    traits = sparse.csr_matrix(
+        (np.ones(n_wines * TRAITS_PER_WINE, dtype=np.float32),
+         (np.repeat(np.arange(n_wines), TRAITS_PER_WINE), rng.integers(0, N_TRAITS, n_wines * TRAITS_PER_WINE))),
+        shape=(n_wines, N_TRAITS)
+    )
+    traits.data[:] = 1.0
+    return RecommendationModel(
+        interaction_matrix=interactions,
+        user_ids=user_ids,
+        wine_ids=wine_ids.tolist(),
+        wine_trait_matrix=traits,
+        trait_ids=range(N_TRAITS)
+    )
+
+
+def per_request_similar(model, wine_idx, k=K):
+    """
+    Score one wine against the whole catalog, as a request-time query would
+    """
+    vectors = sparse.hstack([
+        RecommendationHelper.normalize_rows(model.interaction_matrix_csc.T) * np.float32(np.sqrt(0.5)),
+        RecommendationHelper.normalize_rows(model.wine_trait_matrix) * np.float32(np.sqrt(0.5))
+    ], format='csr')
+    scores = vectors.dot(vectors[wine_idx].T).toarray().ravel()
+    scores[wine_idx] = -np.inf
+    return RecommendationHelper.top_k(scores, k)
+
+
+def run(n_wines):
+    model = synthetic_model(n_wines)
+    rng = np.random.default_rng(0)
+    sample = rng.integers(1, n_wines + 1, LOOKUPS).tolist()
+
+    start = time.perf_counter()
+    model.compute_similar_wines(k=K)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for wine_id in sample[:50]:
+        per_request_similar(model, model.wine_id_to_index[wine_id])
+    per_request_ms = (time.perf_counter() - start) / 50 * 1000
+
+    start = time.perf_counter()
+    for wine_id in sample:
+        model.similar_wine_ids(wine_id, limit=6)
+    lookup_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+
+    table_bytes = model.similar_wines.nbytes + model.similar_scores.nbytes
+    print(
+        f"{n_wines:>8,} wines | offline top-{K} {build_seconds:7.2f}s "
+        f"({table_bytes / 1024 ** 2:6.1f} MiB) | per-request scoring {per_request_ms:8.2f} ms | "
+        f"table lookup {lookup_us:6.1f} us"
+    )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 50_000, 100_000]
+    for size in sizes:
+        run(size)
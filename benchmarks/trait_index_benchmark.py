@@ -0,0 +1,93 @@
+"""
+Benchmark trait-based personalized ranking on the packed trait bitsets
+
+Builds a synthetic model (~170 traits, a handful per wine) and times
+``RecommendationEngine._rank_by_traits`` for random preference sets: one
+AND + popcount over every wine's uint64 bitset, then argpartition. The
+byte lookup-table popcount used on NumPy < 2.0 is timed separately over
+all words.
+
+Usage: python benchmarks/trait_index_benchmark.py [n_wines ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.recommendation_service import RecommendationEngine, RecommendationModel
+from utils.recommendation_helpers import _POPCOUNT_TABLE
+
+N_TRAITS = 170
+TRAITS_PER_WINE = 8
+PREFERRED_TRAITS = 6
+QUERIES = 500
+
+
+def synthetic_model(n_wines, seed=42):
+    """
+    Build a RecommendationModel with random traits and ratings
+    """
+    rng = np.random.default_rng(seed)
+    wine_ids = np.arange(1, n_wines + 1)
+    traits = sparse.csr_matrix(
+        (np.ones(n_wines * TRAITS_PER_WINE, dtype=np.float32),
+         (np.repeat(np.arange(n_wines), TRAITS_PER_WINE), rng.integers(0, N_TRAITS, n_wines * TRAITS_PER_WINE))),
+        shape=(n_wines, N_TRAITS)
+    )
+    wine_df = pd.DataFrame({'id': wine_ids, 'avg_rating': rng.uniform(0, 5, n_wines).round(2)})
+    wine_df.index = pd.Index(wine_ids)
+    return RecommendationModel(
+        wine_df=wine_df,
+        interaction_matrix=sparse.csr_matrix((0, n_wines), dtype=np.float32),
+        wine_ids=wine_ids.tolist(),
+        wine_trait_matrix=traits,
+        trait_ids=range(N_TRAITS)
+    )
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def run(n_wines):
+    model = synthetic_model(n_wines)
+    engine = RecommendationEngine()
+    rng = np.random.default_rng(0)
+    queries = [rng.choice(N_TRAITS, PREFERRED_TRAITS, replace=False).tolist() for _ in range(QUERIES)]
+    model.rating_tiebreak()
+
+    timings = []
+    for trait_ids in queries:
+        start = time.perf_counter()
+        engine._rank_by_traits(model, trait_ids, limit=10)
+        timings.append(time.perf_counter() - start)
+    p50, p99 = percentiles(timings)
+
+    lut_timings = []
+    for _ in range(QUERIES):
+        start = time.perf_counter()
+        counts = np.zeros(n_wines, dtype=np.float32)
+        for word in model.trait_bitsets:
+            masked = word & word[0]
+            counts += _POPCOUNT_TABLE[masked.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+        lut_timings.append(time.perf_counter() - start)
+    lut_p50, _ = percentiles(lut_timings)
+
+    print(
+        f"{n_wines:>8,} wines ({model.trait_bitsets.nbytes / 1024:7.0f} KiB bitsets) | "
+        f"rank top-10 p50 {p50:6.3f} ms p99 {p99:6.3f} ms | "
+        f"LUT popcount p50 {lut_p50:6.3f} ms | "
+        f"bitwise_count {'yes' if hasattr(np, 'bitwise_count') else 'no'}"
+    )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        run(size)
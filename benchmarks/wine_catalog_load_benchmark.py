@@ -0,0 +1,123 @@
+"""
+Benchmark RecommendationEngine catalog loading
+
+Seeds a throwaway SQLite database with a synthetic catalog and compares the
+previous per-wine loader (4N+1 queries) with the single grouped query used
+by ``RecommendationEngine._load_wine_data``.
+
+The legacy loader is only run up to ``LEGACY_LIMIT`` wines; past that it
+takes tens of minutes on SQLite and is skipped.
+
+Usage: python benchmarks/wine_catalog_load_benchmark.py [n_wines]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from flask import Flask
+from sqlalchemy import func
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extensions import db
+from models import User, Wine, WineRegion, WineReview, WineVarietal
+from services.recommendation_service import RecommendationEngine
+from services.wine_stats_service import WineStatsService
+
+REVIEWS_PER_WINE = 3
+LEGACY_LIMIT = 10_000
+
+
+def create_benchmark_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed_catalog(n_wines, seed=42):
+    """
+    Insert varietals, regions, wines and reviews with Core bulk inserts
+    """
+    rng = random.Random(seed)
+    db.create_all()
+    db.session.execute(WineVarietal.__table__.insert(), [{'id': i, 'name': f'Varietal {i}'} for i in range(1, 51)])
+    db.session.execute(WineRegion.__table__.insert(), [{'id': i, 'name': f'Region {i}'} for i in range(1, 201)])
+    db.session.execute(User.__table__.insert(), [{'id': i, 'email': f'user{i}@example.com'} for i in range(1, 1001)])
+    db.session.execute(Wine.__table__.insert(), [
+        {
+            'id': i,
+            'name': f'Wine {i}',
+            'type': rng.choice(['Red', 'White', 'Rose', 'Sparkling']),
+            'description': 'Synthetic benchmark wine',
+            'price': round(rng.uniform(5, 200), 2),
+            'alcohol_percentage': round(rng.uniform(9, 15), 1),
+            'varietal_id': rng.randint(1, 50),
+            'region_id': rng.randint(1, 200)
+        } for i in range(1, n_wines + 1)
+    ])
+    db.session.execute(WineReview.__table__.insert(), [
+        {'user_id': rng.randint(1, 1000), 'wine_id': rng.randint(1, n_wines), 'rating': rng.randint(1, 5)}
+        for _ in range(n_wines * REVIEWS_PER_WINE)
+    ])
+    db.session.commit()
+    # Core inserts bypass the review listener
+    WineStatsService().backfill()
+
+
+def legacy_load_wine_data():
+    """
+    Previous implementation: one query for wines plus four per wine
+    """
+    wines = Wine.query.all()
+    return pd.DataFrame([
+        {
+            'id': wine.id,
+            'name': wine.name,
+            'type': wine.type,
+            'varietal': wine.varietal.name if wine.varietal else 'Unknown',
+            'region': wine.region.name if wine.region else 'Unknown',
+            'description': wine.description or '',
+            'price': wine.price,
+            'alcohol_percentage': wine.alcohol_percentage,
+            'avg_rating': round(db.session.query(func.avg(WineReview.rating))
+                                .filter(WineReview.wine_id == wine.id).scalar() or 0, 2),
+            'total_reviews': WineReview.query.filter_by(wine_id=wine.id).count()
+        } for wine in wines
+    ])
+
+
+def timed(label, func_):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    result = func_()
+    print(f"{label:>8}: {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+def main(n_wines):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_benchmark_app(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        with app.app_context():
+            seed_catalog(n_wines)
+            print(f"Catalog of {n_wines:,} wines, {n_wines * REVIEWS_PER_WINE:,} reviews")
+
+            engine = RecommendationEngine()
+            wine_df = timed('after', engine._load_wine_data)
+            if n_wines > LEGACY_LIMIT:
+                print(f"  before: skipped (more than {LEGACY_LIMIT:,} wines)")
+                return
+
+            legacy_df = timed('before', legacy_load_wine_data)
+            merged = legacy_df.merge(wine_df, on='id', suffixes=('_old', '_new'))
+            assert len(merged) == n_wines
+            assert (merged['total_reviews_old'] == merged['total_reviews_new']).all()
+            assert ((merged['avg_rating_old'] - merged['avg_rating_new']).abs() < 1e-9).all()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
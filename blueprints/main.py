@@ -59,7 +59,7 @@ def health_check():
 @main_bp.route('/api/wines')
 def get_wines():
     """Get all wines"""
-    wines = Wine.query.all()
+    wines = Wine.query.options(*Wine.serialization_options()).all()
     return jsonify([wine.to_dict() for wine in wines])
 
 @main_bp.route('/api/wines/<int:wine_id>')
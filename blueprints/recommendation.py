@@ -1,10 +1,16 @@
+import time
+
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.recommendation_service import get_recommendation_engine
-from models import Wine
+from services.recommendation_cache import recommendation_cache
+from extensions import db
+from models import User, Wine
 
 recommendation_bp = Blueprint('recommendation', __name__)
 
+HYBRID_SIGNALS = ('traits', 'collaborative', 'popularity', 'rating', 'price')
+
 def get_engine():
     """
     Get the recommendation engine instance
@@ -43,20 +49,19 @@ def get_personalized_recommendations():
     """
     Get personalized wine recommendations
     """
-    user_id = get_jwt_identity()
+    start = time.perf_counter()
+    user_id = int(get_jwt_identity())
     top_n = request.args.get('top_n', default=5, type=int)
 
     try:
         engine = get_engine()
-        recommendations = engine.hybrid_recommendations(
-            user_id, 
-            top_n
-        )
+        recommendations, hit = recommendation_cache.get_wine_ids(engine, user_id, top_n)
         
-        # Fetch full wine details
-        recommended_wines = Wine.query.filter(Wine.id.in_(recommendations)).all()
+        # Fetch full wine details, keeping the recommendation order
+        wines = {wine.id: wine for wine in Wine.query.filter(Wine.id.in_(recommendations)).all()} if recommendations else {}
+        recommended_wines = [wines[wine_id] for wine_id in recommendations if wine_id in wines]
         
-        return jsonify({
+        response = jsonify({
             'recommendations': [
                 {
                     'id': wine.id,
@@ -66,6 +71,66 @@ def get_personalized_recommendations():
                     'description': wine.description
                 } for wine in recommended_wines
             ]
+        })
+        recommendation_cache.record_latency(time.perf_counter() - start, hit)
+        return response, 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@recommendation_bp.route('/hybrid', methods=['GET'])
+@jwt_required()
+def get_hybrid_recommendations():
+    """
+    Get recommendations blending several signals; any of the signal names
+    (traits, collaborative, popularity, rating, price) may be passed as a
+    query parameter to override its weight for this request
+    """
+    user_id = int(get_jwt_identity())
+    top_n = request.args.get('top_n', default=10, type=int)
+    weights = {name: request.args.get(name, type=float) for name in HYBRID_SIGNALS}
+    weights = {name: weight for name, weight in weights.items() if weight is not None}
+
+    try:
+        engine = get_engine()
+        return jsonify({
+            'recommendations': engine.get_hybrid_recommendations(user_id, limit=top_n, weights=weights),
+            'weights': weights
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@recommendation_bp.route('/personalized/stats', methods=['GET'])
+def get_personalized_cache_stats():
+    """
+    Get cache hit rate and p50/p99 latency of /personalized for this worker
+    """
+    return jsonify(recommendation_cache.stats()), 200
+
+@recommendation_bp.route('/content/similar/<int:wine_id>', methods=['GET'])
+def get_content_similar_wines(wine_id):
+    """
+    Get wines described like the given wine
+    """
+    top_n = request.args.get('top_n', default=6, type=int)
+    try:
+        engine = get_engine()
+        return jsonify({
+            'recommendations': engine.get_content_similar_wines(wine_id, limit=top_n)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@recommendation_bp.route('/content/search', methods=['GET'])
+def search_by_taste():
+    """
+    Rank wines against a free-text taste description (?q=dry red with cherry)
+    """
+    text = request.args.get('q', '')
+    top_n = request.args.get('top_n', default=10, type=int)
+    try:
+        engine = get_engine()
+        return jsonify({
+            'recommendations': engine.search_by_taste(text, limit=top_n)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -80,5 +145,37 @@ def get_available_traits():
         return jsonify({
             'traits': engine.all_traits
         }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@recommendation_bp.route('/model', methods=['GET'])
+def get_model_status():
+    """
+    Get version and build statistics of the served recommendation model
+    """
+    try:
+        engine = get_engine()
+        return jsonify(engine.model_info()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@recommendation_bp.route('/model/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_model():
+    """
+    Trigger a background rebuild of the recommendation model (admins only)
+    """
+    try:
+        current_user = db.session.get(User, get_jwt_identity())
+        if not current_user or not current_user.is_admin:
+            return jsonify({'error': 'Unauthorized. Admin access required.'}), 403
+
+        engine = get_engine()
+        incremental = request.args.get('incremental', default=False, type=lambda v: v.lower() == 'true')
+        engine.rebuild_async(incremental=incremental)
+        return jsonify({
+            'message': 'Recommendation model rebuild started',
+            'model': engine.model_info()
+        }), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
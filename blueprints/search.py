@@ -1,6 +1,7 @@
 # blueprints/search.py
 from flask import Blueprint, request, jsonify
 from services.search_service import SearchService
+from services.search_cache import search_cache
 
 search_bp = Blueprint('search', __name__)
 search_service = SearchService()
@@ -32,6 +33,13 @@ def search_wines():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@search_bp.route('/wines/stats', methods=['GET'])
+def search_cache_stats():
+    """
+    Search result cache hit rate of this worker
+    """
+    return jsonify(search_cache.stats()), 200
+
 @search_bp.route('/suggest', methods=['GET'])
 def suggest_wines():
     """
@@ -51,7 +59,7 @@ def index_wines():
     Manually trigger wine indexing
     """
     try:
-        search_service.index_wines()
-        return jsonify({'message': 'Wines indexed successfully'}), 200
+        stats = search_service.index_wines()
+        return jsonify({'message': 'Wines indexed successfully', 'stats': stats}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
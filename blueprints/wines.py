@@ -5,7 +5,7 @@ from sqlalchemy import func, case
 
 from extensions import db
 from models import Wine, WineReview, WineVarietal, WineRegion, User, UserWineInteraction, WineTrait, wine_traits
-from services.recommendation_service import recommendation_engine
+from services.recommendation_service import get_recommendation_engine
 
 # Create Blueprint
 wines_bp = Blueprint('wines', __name__)
@@ -28,8 +28,8 @@ def list_wines():
         min_price = request.args.get('min_price', type=float)
         max_price = request.args.get('max_price', type=float)
         
-        # Base query
-        query = Wine.query
+        # Base query, with the relationships the listing reads loaded up front
+        query = Wine.query.options(*Wine.serialization_options())
         
         # Apply filters
         if wine_type:
@@ -59,7 +59,8 @@ def list_wines():
                     'varietal': wine.varietal.name if wine.varietal else 'Unknown',
                     'region': wine.region.name if wine.region else 'Unknown',
                     'price': wine.price,
-                    'avg_rating': recommendation_engine._calculate_average_rating(wine)
+                    # From the eagerly joined stats row, no per-wine query
+                    'avg_rating': round(wine.avg_rating, 2)
                 } for wine in paginated_wines.items
             ],
             'total': paginated_wines.total,
@@ -78,6 +79,7 @@ def get_wine_details(wine_id):
     """
     try:
         wine = Wine.query.get_or_404(wine_id)
+        engine = get_recommendation_engine()
         
         # Fetch reviews
         reviews = WineReview.query\
@@ -96,8 +98,10 @@ def get_wine_details(wine_id):
                 'region': wine.region.name if wine.region else 'Unknown',
                 'price': wine.price,
                 'alcohol_percentage': wine.alcohol_percentage,
-                'avg_rating': recommendation_engine._calculate_average_rating(wine)
+                'avg_rating': engine._calculate_average_rating(wine)
             },
+            # Precomputed top-k lookup, no similarity work per request
+            'similar_wines': engine.get_similar_wines(wine_id),
             'reviews': [
                 {
                     'id': review.id,
@@ -255,13 +259,13 @@ def get_recommendations():
         user_id = get_jwt_identity()
         
         # Get recommendations
-        recommendations = recommendation_engine.get_personalized_recommendations(
+        recommendations = get_recommendation_engine().get_personalized_recommendations(
             user_id, 
-            top_n=10
+            limit=10
         )
         
         return jsonify({
-            'recommendations': recommendations
+            'recommendations': Wine.to_dict_many(recommendations)
         }), 200
     
     except Exception as e:
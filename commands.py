@@ -1,20 +1,265 @@
+import json
+import time
+
 import click
+from flask import current_app
 from flask.cli import with_appcontext
 from services.elasticsearch_service import ElasticsearchService
-from models import Wine
+from services.search_service import SearchService
+from services.recommendation_service import RecommendationEngine
+from services.recommendation_evaluation import RecommendationEvaluator, EVALUATION_MODES
+from services.wine_import_service import WineImportService, DEFAULT_DATASET
+from services.wine_feature_store import wine_feature_store
+from services.wine_stats_service import WineStatsService
+from services.local_search_service import local_search_service
+from services.search_sync_service import search_sync_service
+from extensions import db
+from models import Wine, User
 
 @click.command('index-wines')
+@click.option('--workers', default=None, type=int, help='Parallel bulk senders (defaults to SEARCH_BULK_WORKERS)')
+@click.option('--chunk-bytes', default=None, type=int,
+              help='Maximum bulk request size (defaults to SEARCH_BULK_CHUNK_BYTES)')
+@click.option('--reindex', is_flag=True,
+              help='Load new versions of the wine_search and wine_index indices and swap their aliases')
+@click.option('--keep', default=2, show_default=True, help='Index versions to keep with --reindex')
 @with_appcontext
-def index_wines_command():
+def index_wines_command(workers, chunk_bytes, reindex, keep):
     """
-    CLI command to index all wines in Elasticsearch
+    CLI command to index all wines in Elasticsearch (or in the local
+    search index when SEARCH_BACKEND is 'local')
     """
+    if current_app.config.get('SEARCH_BACKEND') == 'local':
+        index = local_search_service.index_wines()
+        click.echo(f"Successfully indexed {len(index)} wines in the local search index")
+        return
+
+    if reindex:
+        for service in (ElasticsearchService(), SearchService()):
+            try:
+                result = service.reindex(keep=keep, workers=workers, chunk_bytes=chunk_bytes)
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+            stats = result['stats']
+            click.echo(
+                f"{service.index_name} -> {result['index']}: {stats['indexed']} wines in {stats['seconds']:.2f}s "
+                f"({stats['docs_per_second'] or 0:.0f} docs/s, {stats['caught_up']} caught up), "
+                f"replaced {', '.join(result['previous']) or 'nothing'}, deleted {len(result['deleted'])} old versions"
+            )
+        return
+
     es_service = ElasticsearchService()
     
     # Create index if not exists
     es_service.create_index()
     
     # Bulk index all wines
-    es_service.bulk_index_wines()
+    stats = es_service.bulk_index_wines(workers=workers, chunk_bytes=chunk_bytes)
     
-    click.echo('Successfully indexed all wines in Elasticsearch')
\ No newline at end of file
+    click.echo(
+        f"Indexed {stats['indexed']} wines in Elasticsearch in {stats['seconds']:.2f}s "
+        f"({stats['docs_per_second'] or 0:.0f} docs/s, {stats['chunks']} chunks, {stats['retries']} retries, "
+        f"peak RSS {stats['peak_rss_mb']:.0f} MiB)"
+    )
+    if stats['failed']:
+        raise click.ClickException(f"{stats['failed']} wines could not be indexed")
+
+@click.command('build-recommendation-snapshot')
+@click.option('--output', default=None, help='Snapshot directory (defaults to RECOMMENDATION_SNAPSHOT_DIR)')
+@click.option('--keep', default=3, show_default=True, help='Number of snapshots to keep')
+@click.option('--similar-k', default=None, type=int,
+              help='Similar wines to precompute per wine (defaults to RECOMMENDATION_SIMILAR_WINES_K, 0 skips)')
+@with_appcontext
+def build_recommendation_snapshot_command(output, keep, similar_k):
+    """
+    CLI command to build and persist a recommendation model snapshot,
+    including the precomputed similar-wines table
+    """
+    if similar_k is not None:
+        current_app.config['RECOMMENDATION_SIMILAR_WINES_K'] = similar_k
+
+    engine = RecommendationEngine()
+    model = engine.rebuild()
+    if model is None:
+        raise click.ClickException('A recommendation model build is already running')
+
+    path = engine.save_snapshot(output, keep=keep)
+    click.echo(
+        f"Recommendation snapshot {model.version} written to {path} "
+        f"({model.to_dict()['interactions']} interactions, "
+        f"{model.to_dict()['similar_wines_k']} similar wines per wine, built in {model.build_duration:.2f}s)"
+    )
+
+@click.command('recommend-batch')
+@click.option('--output', required=True, type=click.File('w'), help='JSON lines file ("-" for stdout)')
+@click.option('--k', default=10, show_default=True, help='Recommendations per user')
+@click.option('--user-ids', default=None, help='Comma separated user ids (defaults to all users)')
+@with_appcontext
+def recommend_batch_command(output, k, user_ids):
+    """
+    CLI command to write recommendations for many users, one JSON object per line
+    """
+    engine = RecommendationEngine()
+    if not engine.initialized:
+        engine.initialize()
+
+    if user_ids:
+        user_ids = [int(user_id) for user_id in user_ids.split(',')]
+    else:
+        user_ids = [row[0] for row in db.session.query(User.id).order_by(User.id).all()]
+
+    start = time.perf_counter()
+    written = 0
+    for user_id, wine_ids in engine.recommend_batch(user_ids, k=k):
+        output.write(json.dumps({'user_id': user_id, 'wine_ids': wine_ids}) + '\n')
+        written += 1
+    elapsed = time.perf_counter() - start
+
+    click.echo(
+        f"Wrote recommendations for {written} users in {elapsed:.2f}s "
+        f"({written / elapsed if elapsed else 0:.0f} users/s)",
+        err=True
+    )
+
+@click.command('evaluate-recommendations')
+@click.option('--k', default=10, show_default=True, help='Recommendations per user')
+@click.option('--test-fraction', default=0.2, show_default=True, help='Share of the newest interactions held out')
+@click.option('--modes', default=','.join(EVALUATION_MODES), show_default=True, help='Comma separated recommender modes')
+@click.option('--workers', default=None, type=int, help='Scoring processes (defaults to the CPU count)')
+@click.option('--no-save', is_flag=True, help='Do not write ModelPerformanceMetric rows')
+@with_appcontext
+def evaluate_recommendations_command(k, test_fraction, modes, workers, no_save):
+    """
+    CLI command to evaluate every recommender mode offline on a time-based
+    split and record precision/recall/NDCG/coverage@K
+    """
+    modes = [mode.strip() for mode in modes.split(',') if mode.strip()]
+    unknown = set(modes) - set(EVALUATION_MODES)
+    if unknown:
+        raise click.BadParameter(f"Unknown modes: {', '.join(sorted(unknown))}", param_hint='--modes')
+
+    evaluator = RecommendationEvaluator(k=k, test_fraction=test_fraction, workers=workers)
+    results = evaluator.evaluate(modes=modes, save=not no_save)
+    if not results:
+        raise click.ClickException('No held-out interactions to evaluate against')
+
+    click.echo(f"{'mode':<12}{'P@' + str(k):>8}{'R@' + str(k):>8}{'NDCG':>8}{'hit':>8}{'cover':>8}{'users/s':>10}")
+    for mode, metrics in results.items():
+        click.echo(
+            f"{mode:<12}{metrics['precision']:8.4f}{metrics['recall']:8.4f}{metrics['ndcg']:8.4f}"
+            f"{metrics['hit_rate']:8.4f}{metrics['coverage']:8.4f}{metrics['users_per_second'] or 0:10.1f}"
+        )
+
+@click.command('import-wines')
+@click.option('--path', default=DEFAULT_DATASET, show_default=True, type=click.Path(exists=True, dir_okay=False),
+              help='Wine ratings dataset (pickled DataFrame or CSV with title, points and taster_name columns)')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per chunk and bulk statement')
+@click.option('--country', default='US', show_default=True, help='Country of newly created regions')
+@with_appcontext
+def import_wines_command(path, batch_size, country):
+    """
+    CLI command to import a wine ratings dataset into the catalog in
+    chunks; re-running it updates changed wines and skips the rest
+    """
+    def report(stats):
+        click.echo(f"{stats['rows']:>9,} rows  {stats['rows_per_second'] or 0:>9,.0f} rows/s", err=True)
+
+    try:
+        stats = WineImportService(batch_size=batch_size, country=country).import_file(path, progress=report)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(
+        f"Imported {stats['rows']} rows in {stats['seconds']:.2f}s ({stats['rows_per_second'] or 0:.0f} rows/s): "
+        f"{stats['inserted']} wines inserted, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+        f"{stats['duplicates']} duplicate titles skipped, {stats['varietals_created']} varietals and "
+        f"{stats['regions_created']} regions created, {stats['traits_linked']} traits linked"
+    )
+
+@click.command('build-wine-features')
+@click.option('--output', default=None, help='Feature store directory (defaults to WINE_FEATURE_STORE_DIR)')
+@click.option('--keep', default=2, show_default=True, help='Number of snapshots to keep')
+@click.option('--full', is_flag=True, help='Rebuild from scratch instead of refreshing the persisted snapshot')
+@with_appcontext
+def build_wine_features_command(output, keep, full):
+    """
+    CLI command to build (or incrementally refresh) and persist the
+    columnar wine feature store
+    """
+    start = time.perf_counter()
+    if full:
+        wine_feature_store.features = wine_feature_store.build()
+    else:
+        wine_feature_store.features = wine_feature_store.load(output)
+        wine_feature_store.refresh()
+
+    path = wine_feature_store.save(output, keep=keep)
+    click.echo(
+        f"Wine features {wine_feature_store.features.version} written to {path} "
+        f"({len(wine_feature_store.features)} wines, {time.perf_counter() - start:.2f}s)"
+    )
+
+@click.command('backfill-wine-stats')
+@with_appcontext
+def backfill_wine_stats_command():
+    """
+    CLI command to recompute every per-wine review stats row from wine_reviews
+    """
+    start = time.perf_counter()
+    written = WineStatsService().backfill()
+    click.echo(f"Wrote stats for {written} wines in {time.perf_counter() - start:.2f}s")
+
+@click.command('check-wine-stats')
+@click.option('--fix', is_flag=True, help='Recompute the stats rows that disagree with wine_reviews')
+@with_appcontext
+def check_wine_stats_command(fix):
+    """
+    CLI command to compare the per-wine review stats with wine_reviews
+    """
+    mismatches = WineStatsService().check(fix=fix)
+    for mismatch in mismatches:
+        click.echo(f"wine {mismatch['wine_id']}: expected {mismatch['expected']}, found {mismatch['actual']}")
+
+    if not mismatches:
+        click.echo('Wine stats are consistent')
+    elif fix:
+        click.echo(f"Recomputed {len(mismatches)} wine stats rows")
+    else:
+        raise click.ClickException(f"{len(mismatches)} wine stats rows are inconsistent (re-run with --fix)")
+
+@click.command('build-search-index')
+@click.option('--output', default=None, help='Index directory (defaults to LOCAL_SEARCH_INDEX_DIR)')
+@click.option('--keep', default=2, show_default=True, help='Number of index versions to keep')
+@with_appcontext
+def build_search_index_command(output, keep):
+    """
+    CLI command to build and persist the in-process search index used by
+    the 'local' search backend and as the Elasticsearch fallback
+    """
+    start = time.perf_counter()
+    index = local_search_service.index_wines(output, keep=keep)
+    click.echo(
+        f"Local search index {index.version} built ({len(index)} wines, "
+        f"{time.perf_counter() - start:.2f}s)"
+    )
+
+@click.command('sync-search-index')
+@click.option('--once', is_flag=True, help='Apply the queued changes and exit instead of polling')
+@click.option('--interval', default=None, type=int, help='Seconds between polls (defaults to SEARCH_SYNC_INTERVAL)')
+@with_appcontext
+def sync_search_index_command(once, interval):
+    """
+    CLI command to apply the queued search_outbox changes to the search
+    index, as a one-off or as a long-running worker
+    """
+    interval = interval or current_app.config.get('SEARCH_SYNC_INTERVAL', 5)
+    while True:
+        totals = search_sync_service.run_pending()
+        if totals['applied'] or once:
+            click.echo(
+                f"Synced {totals['upserted']} wines and {totals['deleted']} deletes "
+                f"from {totals['applied']} outbox rows"
+            )
+        if once:
+            return
+        time.sleep(interval)
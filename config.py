@@ -18,6 +18,52 @@ class Config:
     # Wine Recommendation Settings
     RECOMMENDATION_LIMIT = 10
     SIMILARITY_THRESHOLD = 0.7
+    # Directory of persisted, memory-mapped recommendation model snapshots
+    RECOMMENDATION_SNAPSHOT_DIR = os.environ.get('RECOMMENDATION_SNAPSHOT_DIR') or 'instance/recommendation_snapshots'
+    # Neighbours precomputed per wine for "similar wines" (0 disables)
+    RECOMMENDATION_SIMILAR_WINES_K = int(os.environ.get('RECOMMENDATION_SIMILAR_WINES_K', 20))
+    # Share of trait similarity vs. co-interaction similarity
+    RECOMMENDATION_SIMILARITY_TRAIT_WEIGHT = 0.5
+    # Similar users blended by get_similar_user_recommendations
+    RECOMMENDATION_NEIGHBOURHOOD_SIZE = int(os.environ.get('RECOMMENDATION_NEIGHBOURHOOD_SIZE', 5))
+    # 'jaccard' or 'cosine' similarity between user trait preferences
+    RECOMMENDATION_NEIGHBOUR_METRIC = 'jaccard'
+    # 'traits' (trait bitset ranking), 'als' (implicit matrix factorization)
+    # or 'content' (TF-IDF similarity to liked wines)
+    RECOMMENDATION_MODE = os.environ.get('RECOMMENDATION_MODE', 'traits')
+    RECOMMENDATION_ALS_FACTORS = 32
+    RECOMMENDATION_ALS_REGULARIZATION = 0.1
+    RECOMMENDATION_ALS_ALPHA = 20.0
+    RECOMMENDATION_ALS_ITERATIONS = 10
+    # Serve ALS rankings from an IVF approximate nearest-neighbour index over
+    # the item factors; lists scanned per query trade recall for latency
+    RECOMMENDATION_ANN_INDEX = os.environ.get('RECOMMENDATION_ANN_INDEX', 'false').lower() == 'true'
+    RECOMMENDATION_ANN_LISTS = None
+    RECOMMENDATION_ANN_PROBES = int(os.environ.get('RECOMMENDATION_ANN_PROBES', 8))
+    # Vocabulary size cap of the TF-IDF content model (None = unlimited)
+    RECOMMENDATION_CONTENT_MAX_FEATURES = 50000
+    # Default signal weights of the hybrid scorer; requests may override any
+    RECOMMENDATION_HYBRID_WEIGHTS = {
+        'traits': 0.35,
+        'collaborative': 0.25,
+        'popularity': 0.1,
+        'rating': 0.2,
+        'price': 0.1
+    }
+    # Cold-start popularity tables: wines kept per segment and the price
+    # band boundaries (0-20, 20-50, 50-100, 100+)
+    RECOMMENDATION_POPULAR_LIMIT = 100
+    RECOMMENDATION_PRICE_BANDS = [20, 50, 100]
+    # Seconds a user's cached recommendation ids live (also dropped on writes)
+    RECOMMENDATION_CACHE_TIMEOUT = 3600
+    # Seconds before a failed background model build is retried (doubled per
+    # consecutive failure)
+    RECOMMENDATION_REBUILD_RETRY_SECONDS = int(os.environ.get('RECOMMENDATION_REBUILD_RETRY_SECONDS', 60))
+    # Directory of persisted, memory-mapped wine feature arrays shared by the
+    # recommender, analytics and search indexers
+    WINE_FEATURE_STORE_DIR = os.environ.get('WINE_FEATURE_STORE_DIR') or 'instance/wine_features'
+    # Seconds before a reader triggers an incremental feature refresh
+    WINE_FEATURE_STORE_MAX_AGE = int(os.environ.get('WINE_FEATURE_STORE_MAX_AGE', 60))
 
     # File Upload Settings
     UPLOAD_FOLDER = 'static/uploads'
@@ -39,6 +85,32 @@ class Config:
     # Elasticsearch Configuration
     ELASTICSEARCH_HOST = 'http://localhost:9200'
     ELASTICSEARCH_WINE_INDEX = 'wine_discovery'
+    # Search backend: 'elasticsearch', or 'local' for the in-process BM25
+    # index persisted under LOCAL_SEARCH_INDEX_DIR
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'elasticsearch'
+    LOCAL_SEARCH_INDEX_DIR = os.environ.get('LOCAL_SEARCH_INDEX_DIR') or 'instance/search_index'
+    # Answer from the local index while Elasticsearch is unreachable
+    SEARCH_LOCAL_FALLBACK = os.environ.get('SEARCH_LOCAL_FALLBACK', 'true').lower() == 'true'
+    # Bulk indexing: wines read per database batch, bytes per bulk request,
+    # parallel senders, and retries (with exponential backoff from
+    # SEARCH_BULK_BACKOFF seconds) of rejected requests
+    SEARCH_BULK_BATCH_SIZE = int(os.environ.get('SEARCH_BULK_BATCH_SIZE', 1000))
+    SEARCH_BULK_CHUNK_BYTES = int(os.environ.get('SEARCH_BULK_CHUNK_BYTES', 5 * 1024 * 1024))
+    SEARCH_BULK_WORKERS = int(os.environ.get('SEARCH_BULK_WORKERS', 4))
+    SEARCH_BULK_MAX_RETRIES = 3
+    SEARCH_BULK_BACKOFF = 0.5
+    # Settings a reindexed search index gets back after its bulk load
+    SEARCH_INDEX_REPLICAS = int(os.environ.get('SEARCH_INDEX_REPLICAS', 1))
+    SEARCH_INDEX_REFRESH_INTERVAL = '1s'
+    # Change-data-capture sync: queue changed wines in search_outbox, and
+    # optionally flush them from a thread in the web process every
+    # SEARCH_SYNC_INTERVAL seconds (or run `flask sync-search-index`)
+    SEARCH_SYNC_ENABLED = os.environ.get('SEARCH_SYNC_ENABLED', 'true').lower() == 'true'
+    SEARCH_SYNC_WORKER = os.environ.get('SEARCH_SYNC_WORKER', 'false').lower() == 'true'
+    SEARCH_SYNC_INTERVAL = int(os.environ.get('SEARCH_SYNC_INTERVAL', 5))
+    SEARCH_SYNC_BATCH_SIZE = 1000
+    # Seconds a cached search result lives (reindexing and sync invalidate earlier)
+    SEARCH_CACHE_TIMEOUT = int(os.environ.get('SEARCH_CACHE_TIMEOUT', 300))
     # Caching Configuration
     CACHE_TYPE = 'redis'  # or 'filesystem' if Redis is not available
     CACHE_REDIS_URL = 'redis://localhost:6379/0'
@@ -0,0 +1,45 @@
+"""Add updated_at to wines and user_wine_interactions
+
+Revision ID: 3f1c2a9b7e10
+Revises: d6949d453c14
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9b7e10'
+down_revision = 'd6949d453c14'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    # user_wine_interactions is created by db.create_all, not by a migration
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    with op.batch_alter_table('wines', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_wines_updated_at'), ['updated_at'], unique=False)
+
+    if not _has_table('user_wine_interactions'):
+        return
+
+    with op.batch_alter_table('user_wine_interactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_wine_interactions_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    if _has_table('user_wine_interactions'):
+        with op.batch_alter_table('user_wine_interactions', schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f('ix_user_wine_interactions_updated_at'))
+            batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('wines', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_wines_updated_at'))
+        batch_op.drop_column('updated_at')
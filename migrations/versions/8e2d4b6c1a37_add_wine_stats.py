@@ -0,0 +1,52 @@
+"""Add wine_stats with per-wine review aggregates
+
+Revision ID: 8e2d4b6c1a37
+Revises: 3f1c2a9b7e10
+Create Date: 2026-10-18 09:41:27.530812
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2d4b6c1a37'
+down_revision = '3f1c2a9b7e10'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    if not _has_table('wine_stats'):
+        op.create_table('wine_stats',
+            sa.Column('wine_id', sa.Integer(), nullable=False),
+            sa.Column('rating_sum', sa.Float(), nullable=False),
+            sa.Column('rating_count', sa.Integer(), nullable=False),
+            sa.Column('avg_rating', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['wine_id'], ['wines.id'], ),
+            sa.PrimaryKeyConstraint('wine_id')
+        )
+        with op.batch_alter_table('wine_stats', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_wine_stats_updated_at'), ['updated_at'], unique=False)
+
+    # Backfill from the existing reviews; the flush listener maintains the rows afterwards.
+    # A table that already existed (e.g. from db.create_all) is recomputed from scratch.
+    if _has_table('wine_reviews'):
+        op.execute("DELETE FROM wine_stats")
+        op.execute(
+            "INSERT INTO wine_stats (wine_id, rating_sum, rating_count, avg_rating, updated_at) "
+            "SELECT wine_id, SUM(rating), COUNT(id), AVG(rating), CURRENT_TIMESTAMP "
+            "FROM wine_reviews WHERE wine_id IN (SELECT id FROM wines) GROUP BY wine_id"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('wine_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_wine_stats_updated_at'))
+
+    op.drop_table('wine_stats')
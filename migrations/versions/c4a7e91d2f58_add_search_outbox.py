@@ -0,0 +1,35 @@
+"""Add search_outbox for change-data-capture search sync
+
+Revision ID: c4a7e91d2f58
+Revises: 8e2d4b6c1a37
+Create Date: 2026-10-18 14:06:52.417390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a7e91d2f58'
+down_revision = '8e2d4b6c1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('wine_id', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('search_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_outbox_wine_id'), ['wine_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('search_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_outbox_wine_id'))
+
+    op.drop_table('search_outbox')
@@ -5,8 +5,8 @@ from datetime import datetime, UTC
 from extensions import db
 from enum import Enum as PyEnum
 from datetime import datetime, timedelta
-from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey, Column, Integer, String, Float, Boolean, DateTime, Text, func, JSON, Enum, Table
+from sqlalchemy.orm import column_property, joinedload, relationship, selectinload
+from sqlalchemy import ForeignKey, Column, Integer, String, Float, Boolean, DateTime, Text, func, JSON, Enum, Table, inspect
 from flask import current_app
 
 # Association tables
@@ -283,6 +283,7 @@ class Wine(db.Model):
     type = Column(String(50))  # e.g., Red, White, Rose
     price = Column(Float)
     alcohol_percentage = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Foreign Keys
     varietal_id = Column(Integer, ForeignKey('wine_varietals.id'))
@@ -301,6 +302,19 @@ class Wine(db.Model):
     traits = relationship('WineTrait', secondary=wine_traits,
                            backref=db.backref('wines', lazy='dynamic'))
 
+    # Denormalized rating aggregates; listings join them in through
+    # serialization_options, single wines load them on first access
+    stats = relationship('WineStats', uselist=False, lazy='select', back_populates='wine',
+                         cascade='all, delete-orphan')
+
+    @property
+    def avg_rating(self):
+        return float(self.stats.avg_rating) if self.stats else 0.0
+
+    @property
+    def review_count(self):
+        return int(self.stats.rating_count) if self.stats else 0
+
     def to_dict(self):
         """Convert wine object to dictionary"""
         # Get traits safely
@@ -308,14 +322,9 @@ class Wine(db.Model):
         if hasattr(self, 'traits') and self.traits is not None:
             traits_list = [{'id': t.id, 'name': t.name, 'category': t.category} for t in self.traits]
         
-        # Calculate average rating
-        avg_rating = 0.0
-        review_count = 0
-        if hasattr(self, 'reviews') and self.reviews is not None:
-            reviews = list(self.reviews)  # Convert to list to avoid LazyLoad issues
-            review_count = len(reviews)
-            if review_count > 0:
-                avg_rating = sum(r.rating for r in reviews) / review_count
+        # Rating aggregates are maintained on write (see WineStats)
+        avg_rating = self.avg_rating
+        review_count = self.review_count
         
         return {
             'id': self.id,
@@ -336,10 +345,42 @@ class Wine(db.Model):
         }
 
     def calculate_average_rating(self):
-        """Calculate average rating for the wine"""
-        if not self.reviews:
-            return 0.0
-        return sum(review.rating for review in self.reviews) / len(self.reviews)
+        """Average rating of the wine, from its stats row"""
+        return self.avg_rating
+
+    @staticmethod
+    def serialization_options():
+        """
+        Loader options for every relationship ``to_dict`` reads
+
+        Many-to-one lookups and the stats row are joined into the wine
+        query and traits come from a single IN query, so serializing any
+        number of wines costs two queries.
+        """
+        return (
+            joinedload(Wine.varietal),
+            joinedload(Wine.region),
+            joinedload(Wine.category),
+            joinedload(Wine.stats),
+            selectinload(Wine.traits)
+        )
+
+    @classmethod
+    def to_dict_many(cls, wines):
+        """
+        Serialize already-loaded wines without a lazy load per wine
+
+        Relationships the wines do not have yet are loaded for all of them
+        in one pass before ``to_dict`` runs.
+
+        :param wines: Wine instances, e.g. from the recommendation engine
+        :return: List of wine dicts in the same order
+        """
+        wines = list(wines)
+        unloaded = [wine.id for wine in wines if inspect(wine).unloaded & {'varietal', 'region', 'category', 'stats', 'traits'}]
+        if unloaded:
+            cls.query.options(*cls.serialization_options()).filter(cls.id.in_(unloaded)).all()
+        return [wine.to_dict() for wine in wines]
 
 class UserInteraction(db.Model):
     __tablename__ = 'user_interactions'
@@ -445,8 +486,10 @@ class WineReview(db.Model):
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    wine_id = Column(Integer, ForeignKey('wines.id'), nullable=False)
-    rating = Column(Float, nullable=False)
+    # active_history keeps the previous value on assignment even when the
+    # attribute was expired, so WineStats can subtract it at flush time
+    wine_id = column_property(Column(Integer, ForeignKey('wines.id'), nullable=False), active_history=True)
+    rating = column_property(Column(Float, nullable=False), active_history=True)
     comment = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -467,6 +510,56 @@ class WineReview(db.Model):
             'wine_name': self.wine.name if self.wine else ""
         }
 
+class WineStats(db.Model):
+    """
+    Per-wine rating aggregates, kept in step with wine_reviews
+
+    Rows are adjusted in the same transaction as every review insert,
+    rating change and delete (see services.wine_stats_service), so reads
+    never aggregate reviews.
+    """
+    __tablename__ = 'wine_stats'
+
+    wine_id = Column(Integer, ForeignKey('wines.id'), primary_key=True)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    avg_rating = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    wine = relationship('Wine', back_populates='stats')
+
+    def to_dict(self):
+        return {
+            'wine_id': self.wine_id,
+            'rating_sum': float(self.rating_sum),
+            'rating_count': self.rating_count,
+            'avg_rating': float(self.avg_rating)
+        }
+
+class SearchOutbox(db.Model):
+    """
+    Wines whose search documents must be re-sent (or deleted)
+
+    Rows are written in the same transaction as the change that caused
+    them (see services.search_sync_service) and removed once the search
+    index has applied them. wine_id has no foreign key so deletes can be
+    queued for wines that no longer exist.
+    """
+    __tablename__ = 'search_outbox'
+
+    id = Column(Integer, primary_key=True)
+    wine_id = Column(Integer, nullable=False, index=True)
+    operation = Column(String(10), nullable=False, default='upsert')  # upsert or delete
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'wine_id': self.wine_id,
+            'operation': self.operation,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class UserWineInteraction(db.Model):
     __tablename__ = 'user_wine_interactions'
 
@@ -476,6 +569,7 @@ class UserWineInteraction(db.Model):
     interaction_type = Column(String(50), nullable=False)  # e.g., view, like, favorite, share
     interaction_weight = Column(Float, default=1.0)  # Weight of the interaction (e.g., 1.0 for view, 2.0 for like, 3.0 for favorite)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     user = relationship('User', back_populates='wine_interactions')
@@ -1070,18 +1164,18 @@ class ModelRetrainingLog(db.Model):
 # Optional: Add some utility methods
 def calculate_wine_average_rating(wine_id):
     """
-    Calculate average rating for a specific wine
+    Average rating of a specific wine, from its stats row
     """
-    return db.session.query(func.avg(WineReview.rating))\
-        .filter(WineReview.wine_id == wine_id)\
+    return db.session.query(WineStats.avg_rating)\
+        .filter(WineStats.wine_id == wine_id)\
         .scalar() or 0
 
 def get_wine_review_count(wine_id):
     """
-    Get total number of reviews for a wine
+    Get total number of reviews for a wine, from its stats row
     """
-    return db.session.query(func.count(WineReview.id))\
-        .filter(WineReview.wine_id == wine_id)\
+    return db.session.query(WineStats.rating_count)\
+        .filter(WineStats.wine_id == wine_id)\
         .scalar() or 0
 
 class WineCategory(db.Model):
@@ -6,6 +6,7 @@ from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
 from extensions import db
 from models import Wine, WineReview, UserInteraction, UserPreference
+from services.wine_feature_store import wine_feature_store
 from sqlalchemy import func, distinct
 import datetime
 
@@ -31,48 +32,82 @@ from models import (
     User
 )
 
+def impute_features(features):
+    """
+    Replace missing values (wines without a price or an alcohol level)
+    with the column median, or 0 when a column has no values
+
+    :param features: 2-D array or DataFrame of numeric features
+    :return: float array without NaN, ready for scaling
+    """
+    values = np.array(features, dtype=np.float64)
+    for column in values.T:
+        missing = np.isnan(column)
+        if missing.any():
+            known = column[~missing]
+            column[missing] = np.median(known) if len(known) else 0.0
+    return values
+
+
+def json_safe(value):
+    """
+    ``value`` with NaN floats (nested in dicts and lists) replaced by None,
+    which jsonify would otherwise emit as invalid JSON
+    """
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
 class AnalyticsService:
     def wine_clustering(self):
         """
         Perform advanced wine clustering analysis
         """
-        # Prepare wine data for clustering
-        wines = Wine.query.all()
+        # Prepare wine data for clustering from the shared feature arrays
+        wine_features = wine_feature_store.get()
+        names = dict(db.session.query(Wine.id, Wine.name).all())
+        types = wine_features.decode('type')
         
-        # Extract features for clustering
-        features = [
-            [
-                wine.alcohol_percentage, 
-                wine.price, 
-                wine.rating
-            ] for wine in wines
-        ]
+        # Extract features for clustering (unreviewed wines rate 0, as in
+        # prepare_wine_dataset; a missing price or alcohol level gets the
+        # column median)
+        features = impute_features(np.column_stack([
+            wine_features.column('alcohol_percentage'),
+            wine_features.column('price'),
+            np.nan_to_num(wine_features.column('avg_rating'), nan=0.0)
+        ]))
         
         # Standardize features
         scaler = StandardScaler()
         scaled_features = scaler.fit_transform(features)
         
         # Perform K-means clustering
-        kmeans = KMeans(n_clusters=5, random_state=42)
+        kmeans = KMeans(n_clusters=min(5, len(features)), random_state=42)
         kmeans.fit(scaled_features)
         
         # Analyze clusters
         clusters = {}
-        for i, wine in enumerate(wines):
-            cluster = kmeans.labels_[i]
+        prices = wine_features.column('price').tolist()
+        for i, wine_id in enumerate(wine_features.wine_ids.tolist()):
+            cluster = int(kmeans.labels_[i])
             if cluster not in clusters:
                 clusters[cluster] = []
             clusters[cluster].append({
-                'id': wine.id,
-                'name': wine.name,
-                'type': wine.type,
-                'price': wine.price
+                'id': wine_id,
+                'name': names.get(wine_id),
+                'type': types[i],
+                'price': prices[i]
             })
         
-        return {
+        return json_safe({
             'total_clusters': len(clusters),
             'cluster_details': clusters
-        }
+        })
 
     def wine_recommendation_insights(self):
         """
@@ -173,29 +208,21 @@ class AnalyticsService:
         """
         Prepare comprehensive wine dataset for analysis
         """
-        # Fetch wine data with aggregated metrics
-        wines = db.session.query(
-            Wine,
-            func.avg(WineReview.rating).label('avg_rating'),
-            func.count(WineReview.id).label('review_count'),
-            func.count(distinct(UserInteraction.user_id)).label('unique_views')
-        ).outerjoin(WineReview, Wine.id == WineReview.wine_id) \
-         .outerjoin(UserInteraction, Wine.id == UserInteraction.wine_id) \
-         .group_by(Wine.id).all()
+        # Numeric attributes come from the shared feature arrays; only the
+        # names and view counts are queried here
+        wine_features = wine_feature_store.get()
+        self.wine_df = wine_features.frame(
+            ['price', 'alcohol_percentage', 'type', 'avg_rating', 'review_count']
+        ).reset_index()
+        self.wine_df['avg_rating'] = self.wine_df['avg_rating'].fillna(0)
 
-        # Convert to DataFrame
-        self.wine_df = pd.DataFrame([
-            {
-                'id': wine.Wine.id,
-                'name': wine.Wine.name,
-                'price': wine.Wine.price,
-                'alcohol_percentage': wine.Wine.alcohol_percentage,
-                'type': wine.Wine.type,
-                'avg_rating': wine.avg_rating or 0,
-                'review_count': wine.review_count,
-                'unique_views': wine.unique_views
-            } for wine in wines
-        ])
+        names = dict(db.session.query(Wine.id, Wine.name).all())
+        unique_views = dict(
+            db.session.query(UserInteraction.wine_id, func.count(distinct(UserInteraction.user_id)))
+            .group_by(UserInteraction.wine_id).all()
+        )
+        self.wine_df['name'] = self.wine_df['id'].map(names)
+        self.wine_df['unique_views'] = self.wine_df['id'].map(unique_views).fillna(0).astype(int)
 
     def wine_clustering(self, n_clusters=5):
         """
@@ -204,21 +231,21 @@ class AnalyticsService:
         # Prepare features for clustering
         features = ['price', 'alcohol_percentage', 'avg_rating', 'review_count']
         
-        # Normalize features
+        # Normalize features (missing prices and alcohol levels get the median)
         scaler = StandardScaler()
-        scaled_features = scaler.fit_transform(self.wine_df[features])
+        scaled_features = scaler.fit_transform(impute_features(self.wine_df[features]))
         
         # Perform clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        kmeans = KMeans(n_clusters=min(n_clusters, len(self.wine_df)), random_state=42)
         self.wine_df['cluster'] = kmeans.fit_predict(scaled_features)
         
         # Analyze cluster characteristics
         cluster_analysis = self.wine_df.groupby('cluster')[features].mean()
         
-        return {
+        return json_safe({
             'cluster_centers': cluster_analysis.to_dict(),
             'wines_per_cluster': self.wine_df['cluster'].value_counts().to_dict()
-        }
+        })
 
     def wine_recommendation_insights(self):
         """
@@ -271,7 +298,7 @@ class AnalyticsService:
             'id': 'count'
         }).rename(columns={'id': 'wine_count'})
 
-        return price_sensitivity.to_dict(orient='index')
+        return json_safe(price_sensitivity.to_dict(orient='index'))
 
     def predictive_wine_rating(self):
         """
@@ -282,7 +309,7 @@ class AnalyticsService:
         
         # Prepare features
         features = ['price', 'alcohol_percentage', 'review_count']
-        X = self.wine_df[features]
+        X = impute_features(self.wine_df[features])
         y = self.wine_df['avg_rating']
 
         # Split data
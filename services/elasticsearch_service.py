@@ -1,9 +1,31 @@
 from elasticsearch import Elasticsearch
 from models import Wine, UserPreference, UserInteraction
+from services.search_indexer import BulkIndexer
+from services.search_index_manager import SearchIndexManager
 from extensions import db
 from sqlalchemy import func
 
 class ElasticsearchService:
+    # Fields and mapping of the wine_search index
+    INDEX_FIELDS = ('name', 'description', 'type', 'region', 'price', 'traits', 'alcohol_percentage')
+    INDEX_MAPPINGS = {
+        "properties": {
+            "name": {"type": "text", "analyzer": "standard"},
+            "description": {"type": "text", "analyzer": "standard"},
+            "type": {"type": "keyword"},
+            "region": {"type": "keyword"},
+            "price": {"type": "float"},
+            "vintage": {"type": "integer"},
+            "traits": {
+                "type": "keyword",
+                "fields": {
+                    "text": {"type": "text"}
+                }
+            },
+            "alcohol_percentage": {"type": "float"}
+        }
+    }
+
     def __init__(self, hosts=['localhost:9200']):
         """
         Initialize Elasticsearch connection
@@ -15,25 +37,7 @@ class ElasticsearchService:
         """
         Create Elasticsearch index with enhanced mapping
         """
-        index_mapping = {
-            "mappings": {
-                "properties": {
-                    "name": {"type": "text", "analyzer": "standard"},
-                    "description": {"type": "text", "analyzer": "standard"},
-                    "type": {"type": "keyword"},
-                    "region": {"type": "keyword"},
-                    "price": {"type": "float"},
-                    "vintage": {"type": "integer"},
-                    "traits": {
-                        "type": "keyword",
-                        "fields": {
-                            "text": {"type": "text"}
-                        }
-                    },
-                    "alcohol_percentage": {"type": "float"}
-                }
-            }
-        }
+        index_mapping = {"mappings": self.INDEX_MAPPINGS}
         
         # Create index if not exists
         if not self.es.indices.exists(index=self.index_name):
@@ -63,36 +67,29 @@ class ElasticsearchService:
             body=doc
         )
 
-    def bulk_index_wines(self, wines=None):
+    def bulk_index_wines(self, wines=None, **options):
         """
-        Bulk index wines
+        Bulk index wines, streamed from the database in batches and sent
+        as size-capped chunks by parallel workers
+
+        :param wines: Wines to index, defaults to the whole catalog
+        :param options: BulkIndexer settings (chunk_bytes, workers, ...)
+        :return: Indexing stats, including docs_per_second and peak_rss_mb
         """
-        if wines is None:
-            wines = Wine.query.all()
-        
-        actions = []
-        for wine in wines:
-            # Split traits if it's a comma-separated string
-            traits = wine.traits.split(',') if wine.traits else []
-
-            action = {
-                "_index": self.index_name,
-                "_id": wine.id,
-                "_source": {
-                    'name': wine.name,
-                    'description': wine.description,
-                    'type': wine.type,
-                    'region': wine.region,
-                    'price': wine.price,
-                    'vintage': wine.vintage,
-                    'traits': traits,
-                    'alcohol_percentage': wine.alcohol_percentage
-                }
-            }
-            actions.append(action)
-        
-        if actions:
-            self.es.bulk(body=actions)
+        indexer = BulkIndexer(self.es, self.index_name, fields=self.INDEX_FIELDS, **options)
+        return indexer.index_wines(None if wines is None else [wine.id for wine in wines])
+
+    def reindex(self, keep=2, **options):
+        """
+        Rebuild the index into a new version and move the index_name alias
+        to it once complete, so searches never see a partial index
+
+        :param keep: Index versions to keep
+        :return: See SearchIndexManager.reindex
+        """
+        return SearchIndexManager(self.es).reindex(
+            self.index_name, mappings=self.INDEX_MAPPINGS, fields=self.INDEX_FIELDS, keep=keep, **options
+        )
 
     def personalized_search(self, user_id, query=None, filters=None):
         """
@@ -0,0 +1,512 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+
+from extensions import db
+from services.search_indexer import wine_documents
+from utils.snapshot_store import SnapshotStore
+
+# Text fields of the inverted index and the boosts SearchService queries them with
+TEXT_FIELDS = ('name', 'description', 'region', 'traits')
+DEFAULT_FIELD_BOOSTS = {'name': 3.0, 'description': 2.0, 'region': 1.0, 'traits': 1.0}
+# Exact-match fields, stored as int32 codes into a label list (-1 when unknown)
+KEYWORD_FIELDS = ('type', 'region', 'varietal')
+NUMERIC_FIELDS = ('price', 'average_rating', 'review_count')
+
+# Same buckets as the Elasticsearch price_ranges aggregation
+PRICE_RANGES = (
+    ('Budget', None, 20.0),
+    ('Mid-Range', 20.0, 50.0),
+    ('Premium', 50.0, 100.0),
+    ('Luxury', 100.0, None)
+)
+SORT_FIELDS = {
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'rating': ('average_rating', True),
+    'popularity': ('review_count', True)
+}
+
+# Elasticsearch's BM25 defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TOKEN_LENGTH = 40
+
+# Bump when the on-disk layout changes
+SEARCH_INDEX_FORMAT = 1
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """
+    Lower-cased, accent-folded alphanumeric tokens of ``text``
+    ("Rosé black_cherry" -> ['rose', 'black', 'cherry'])
+    """
+    if not text:
+        return []
+    folded = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return [token[:MAX_TOKEN_LENGTH] for token in _TOKEN_PATTERN.findall(folded.lower())]
+
+
+def _as_list(value):
+    """
+    Filter values given either as a list or a comma-separated string
+    """
+    if value is None or value == '' or value == []:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return list(value)
+
+
+class LocalSearchIndex:
+    """
+    Immutable in-process inverted index over the wine search documents
+
+    Each text field has a sorted term array and CSR postings (``offsets``
+    into parallel doc-position and term-frequency arrays) plus per-doc
+    field lengths, which is all BM25 needs. Keyword fields are int32 codes
+    and numbers are float64 columns, aligned with ``doc_ids``; traits also
+    get exact-match postings for the trait filter. Loaded indices are
+    memory-mapped like the wine feature store.
+    """
+
+    def __init__(self, doc_ids, documents, postings, keywords, labels, numbers,
+                 trait_postings, version=None, source=None):
+        self.doc_ids = doc_ids
+        self.documents = documents
+        self.postings = postings
+        self.keywords = keywords
+        self.labels = labels
+        self.numbers = numbers
+        self.trait_postings = trait_postings
+        self.version = version
+        self.source = source
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_documents(cls, documents, version=None, source=None):
+        """
+        Build the index of a list of search documents
+        """
+        documents = sorted(documents, key=lambda document: document['id'])
+        postings = {}
+        for field in TEXT_FIELDS:
+            counts = [Counter(tokenize(cls._field_text(document, field))) for document in documents]
+            postings[field] = cls._postings(counts, with_lengths=True)
+
+        labels = {
+            field: sorted({document.get(field) for document in documents if document.get(field) is not None})
+            for field in KEYWORD_FIELDS
+        }
+        keywords = {}
+        for field in KEYWORD_FIELDS:
+            codes = {label: code for code, label in enumerate(labels[field])}
+            keywords[field] = np.array([codes.get(document.get(field), -1) for document in documents], dtype=np.int32)
+
+        numbers = {
+            field: np.array([
+                np.nan if document.get(field) is None else float(document[field]) for document in documents
+            ], dtype=np.float64)
+            for field in NUMERIC_FIELDS
+        }
+
+        return cls(
+            doc_ids=np.array([document['id'] for document in documents], dtype=np.int64),
+            documents=documents,
+            postings=postings,
+            keywords=keywords,
+            labels=labels,
+            numbers=numbers,
+            trait_postings=cls._postings([Counter(document.get('traits') or []) for document in documents]),
+            version=version,
+            source=source
+        )
+
+    @staticmethod
+    def _field_text(document, field):
+        value = document.get(field)
+        if isinstance(value, (list, tuple)):
+            return ' '.join(str(item).replace('_', ' ') for item in value)
+        return value
+
+    @staticmethod
+    def _postings(counts, with_lengths=False):
+        """
+        CSR postings of per-document term counters
+        """
+        by_term = {}
+        for position, counter in enumerate(counts):
+            for term, frequency in counter.items():
+                by_term.setdefault(term, []).append((position, frequency))
+        terms = sorted(by_term)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(by_term[term]) for term in terms])
+        pairs = [pair for term in terms for pair in by_term[term]]
+        postings = {
+            'terms': np.array(terms, dtype=str) if terms else np.array([], dtype='<U1'),
+            'offsets': offsets,
+            'docs': np.array([position for position, _ in pairs], dtype=np.int32),
+            'freqs': np.array([frequency for _, frequency in pairs], dtype=np.float32)
+        }
+        if with_lengths:
+            postings['lengths'] = np.array([sum(counter.values()) for counter in counts], dtype=np.float32)
+        return postings
+
+    @staticmethod
+    def _lookup(postings, term):
+        """
+        (doc positions, frequencies) of ``term``, empty when unknown
+        """
+        terms = postings['terms']
+        position = int(np.searchsorted(terms, term))
+        if position >= len(terms) or terms[position] != term:
+            return postings['docs'][:0], postings['freqs'][:0]
+        start, end = postings['offsets'][position], postings['offsets'][position + 1]
+        return postings['docs'][start:end], postings['freqs'][start:end]
+
+    def score(self, text, boosts=None):
+        """
+        BM25 relevance of every document to ``text``
+
+        Like an Elasticsearch ``multi_match`` of type best_fields, a
+        document scores its best boosted field, and any query term in any
+        field is a match.
+
+        :param boosts: {field: boost}, defaults to DEFAULT_FIELD_BOOSTS
+        :return: float64 array over the documents (0 where nothing matched)
+        """
+        boosts = boosts or DEFAULT_FIELD_BOOSTS
+        terms = list(dict.fromkeys(tokenize(text)))
+        n_docs = len(self.doc_ids)
+        best = np.zeros(n_docs, dtype=np.float64)
+        for field, boost in boosts.items():
+            postings = self.postings[field]
+            lengths = postings['lengths']
+            average_length = float(lengths.mean()) if n_docs else 0.0
+            scores = np.zeros(n_docs, dtype=np.float64)
+            for term in terms:
+                docs, freqs = self._lookup(postings, term)
+                if not len(docs):
+                    continue
+                idf = np.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[docs] / max(average_length, 1e-9))
+                scores[docs] += idf * freqs * (BM25_K1 + 1.0) / (freqs + norm)
+            np.maximum(best, boost * scores, out=best)
+        return best
+
+    def keyword_mask(self, field, values):
+        """
+        Documents whose keyword ``field`` equals any of ``values``
+        """
+        labels = self.labels[field]
+        codes = [labels.index(value) for value in values if value in labels]
+        return np.isin(self.keywords[field], np.array(codes, dtype=np.int32))
+
+    def trait_mask(self, traits):
+        """
+        Documents having any of ``traits``
+        """
+        mask = np.zeros(len(self.doc_ids), dtype=bool)
+        for trait in traits:
+            docs, _ = self._lookup(self.trait_postings, trait)
+            mask[docs] = True
+        return mask
+
+    def search(self, text=None, boosts=None, types=None, regions=None, varietals=None, traits=None,
+               price_min=None, price_max=None, sort=None, offset=0, limit=20):
+        """
+        Filter, rank and page the documents
+
+        :param sort: A SORT_FIELDS key, or None to rank by relevance
+        :return: (page of documents, total matches, aggregations)
+        """
+        mask = np.ones(len(self.doc_ids), dtype=bool)
+        for field, values in (('type', types), ('region', regions), ('varietal', varietals)):
+            if values:
+                mask &= self.keyword_mask(field, values)
+        if traits:
+            mask &= self.trait_mask(traits)
+        price = self.numbers['price']
+        if price_min is not None:
+            mask &= price >= price_min
+        if price_max is not None:
+            mask &= price <= price_max
+
+        scores = None
+        if text and text.strip():
+            scores = self.score(text, boosts)
+            mask &= scores > 0
+
+        matches = np.flatnonzero(mask)
+        if sort in SORT_FIELDS:
+            field, descending = SORT_FIELDS[sort]
+            values = self.numbers[field][matches]
+            # Missing values sort last either way, ties in id order
+            key = np.where(np.isnan(values), np.inf, -values if descending else values)
+            matches = matches[np.argsort(key, kind='stable')]
+        elif scores is not None:
+            matches = matches[np.argsort(-scores[matches], kind='stable')]
+
+        page = matches[offset:offset + limit]
+        return [self.documents[position] for position in page.tolist()], len(matches), \
+            self.aggregations(matches)
+
+    def aggregations(self, matches):
+        """
+        wine_types and price_ranges buckets of the matching documents,
+        shaped like the Elasticsearch aggregation responses
+        """
+        codes = self.keywords['type'][matches]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.labels['type']))
+        wine_types = sorted(
+            ({'key': label, 'doc_count': int(count)} for label, count in zip(self.labels['type'], counts) if count),
+            key=lambda bucket: (-bucket['doc_count'], bucket['key'])
+        )[:10]
+
+        prices = self.numbers['price'][matches]
+        price_ranges = []
+        for key, low, high in PRICE_RANGES:
+            in_range = ~np.isnan(prices)
+            bucket = {'key': key}
+            if low is not None:
+                in_range &= prices >= low
+                bucket['from'] = low
+            if high is not None:
+                in_range &= prices < high
+                bucket['to'] = high
+            bucket['doc_count'] = int(in_range.sum())
+            price_ranges.append(bucket)
+
+        return {'wine_types': wine_types, 'price_ranges': price_ranges}
+
+    def suggest(self, prefix, limit=5):
+        """
+        Names starting with ``prefix`` (case-insensitive), best rated first
+        """
+        prefix = (prefix or '').strip().lower()
+        if not prefix:
+            return []
+        positions = [
+            position for position, document in enumerate(self.documents)
+            if (document.get('name') or '').lower().startswith(prefix)
+        ]
+        ratings = self.numbers['average_rating'][positions] if positions else []
+        order = np.argsort(-np.nan_to_num(ratings), kind='stable') if positions else []
+        return [self.documents[positions[i]]['name'] for i in order[:limit]]
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'documents': len(self.doc_ids),
+            'terms': {field: len(self.postings[field]['terms']) for field in TEXT_FIELDS}
+        }
+
+    def save(self, directory):
+        """
+        Persist the index as .npy files under ``directory/<version>``,
+        switching ``directory/CURRENT`` once every file is written
+
+        :return: Path of the written index
+        """
+        arrays = {'doc_ids': self.doc_ids}
+        for field, postings in dict(self.postings, trait_keywords=self.trait_postings).items():
+            arrays.update({f'{field}.{name}': array for name, array in postings.items()})
+        arrays.update({f'{field}.codes': codes for field, codes in self.keywords.items()})
+        arrays.update(self.numbers)
+
+        with SnapshotStore.write(directory, self.version) as staging:
+            SnapshotStore.save_arrays(staging, arrays)
+            with open(os.path.join(staging, 'documents.json'), 'w') as documents:
+                json.dump(self.documents, documents)
+            SnapshotStore.write_manifest(staging, {
+                'format': SEARCH_INDEX_FORMAT,
+                'version': self.version,
+                'source': self.source,
+                'labels': self.labels
+            })
+        return os.path.join(directory, self.version)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load the index ``directory/CURRENT`` points to, memory-mapped
+
+        :return: LocalSearchIndex, or None if no index exists
+        """
+        path, meta = SnapshotStore.open(directory, SEARCH_INDEX_FORMAT, 'search index')
+        if path is None:
+            return None
+        with open(os.path.join(path, 'documents.json')) as documents:
+            documents = json.load(documents)
+
+        def array(name):
+            return SnapshotStore.load_array(path, name, mmap_mode)
+
+        def postings(field, with_lengths=False):
+            names = ('terms', 'offsets', 'docs', 'freqs') + (('lengths',) if with_lengths else ())
+            return {name: array(f'{field}.{name}') for name in names}
+
+        return cls(
+            doc_ids=array('doc_ids'),
+            documents=documents,
+            postings={field: postings(field, with_lengths=True) for field in TEXT_FIELDS},
+            keywords={field: array(f'{field}.codes') for field in KEYWORD_FIELDS},
+            labels=meta['labels'],
+            numbers={field: array(field) for field in NUMERIC_FIELDS},
+            trait_postings=postings('trait_keywords'),
+            version=meta['version'],
+            source=meta.get('source')
+        )
+
+    @staticmethod
+    def prune(directory, keep=2):
+        """
+        Delete all but the ``keep`` newest indices, never the CURRENT one
+        """
+        SnapshotStore.prune(directory, keep)
+
+
+class LocalSearchService:
+    """
+    Search backend that answers ``advanced_search`` from a LocalSearchIndex
+    instead of Elasticsearch
+
+    Selected with SEARCH_BACKEND = 'local', and used by the Elasticsearch
+    backed services as their fallback when the cluster is unreachable. The
+    index is loaded from LOCAL_SEARCH_INDEX_DIR on first use (or built
+    from the database and saved there) and rebuilt by ``index_wines``.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        The current index, loaded or built on first use
+        """
+        index = self.index
+        if index is None or index.source != self._source():
+            with self._lock:
+                if self.index is None or self.index.source != self._source():
+                    self.index = self.load()
+                    if self.index is None:
+                        self.index = self.build()
+                        self._save(self.index)
+            index = self.index
+        return index
+
+    def load(self, directory=None):
+        """
+        Load the persisted index without publishing it
+
+        :return: LocalSearchIndex, or None if there is none, it is
+                 unreadable or it was built from another database
+        """
+        directory = directory or current_app.config.get('LOCAL_SEARCH_INDEX_DIR')
+        if not directory:
+            return None
+        try:
+            index = LocalSearchIndex.load(directory)
+        except Exception as e:
+            self.logger.error(f"Failed to load the local search index from {directory}: {e}")
+            return None
+        if index is not None and index.source != self._source():
+            self.logger.warning(f"Ignoring local search index in {directory} built from {index.source}")
+            return None
+        return index
+
+    def build(self):
+        """
+        Build an index of the whole catalog (not published)
+        """
+        start = time.perf_counter()
+        index = LocalSearchIndex.from_documents(
+            wine_documents(),
+            version=datetime.utcnow().strftime('%Y%m%d%H%M%S%f'),
+            source=self._source()
+        )
+        self.logger.info(f"Built local search index {index.to_dict()} in {time.perf_counter() - start:.2f}s")
+        return index
+
+    def index_wines(self, directory=None, keep=2):
+        """
+        Rebuild, persist and publish the index
+
+        :return: The published LocalSearchIndex
+        """
+        index = self.build()
+        self._save(index, directory, keep)
+        self.index = index
+        return index
+
+    def _save(self, index, directory=None, keep=2):
+        directory = directory or current_app.config.get('LOCAL_SEARCH_INDEX_DIR')
+        if not directory:
+            return None
+        try:
+            path = index.save(directory)
+            LocalSearchIndex.prune(directory, keep=keep)
+            return path
+        except OSError as e:
+            self.logger.error(f"Failed to save the local search index to {directory}: {e}")
+            return None
+
+    def advanced_search(self, query_params):
+        """
+        Same contract as SearchService.advanced_search
+
+        Also accepts the WineDiscoveryService filters (type, region and
+        grape_variety lists, min_price/max_price), and 'fields' to override
+        the field boosts.
+        """
+        page = max(1, query_params.get('page', 1))
+        per_page = max(1, query_params.get('per_page', 20))
+        price_min = query_params.get('price_min', query_params.get('min_price'))
+        price_max = query_params.get('price_max', query_params.get('max_price'))
+
+        wines, total, aggregations = self.get().search(
+            text=query_params.get('q') or query_params.get('query'),
+            boosts=query_params.get('fields'),
+            types=_as_list(query_params.get('type')),
+            regions=_as_list(query_params.get('region')),
+            varietals=_as_list(query_params.get('grape_variety')),
+            traits=_as_list(query_params.get('traits')),
+            price_min=price_min,
+            price_max=price_max,
+            sort=query_params.get('sort'),
+            offset=(page - 1) * per_page,
+            limit=per_page
+        )
+        return {
+            'wines': wines,
+            'total': total,
+            'aggregations': aggregations,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total_pages': (total + per_page - 1) // per_page
+            }
+        }
+
+    @staticmethod
+    def _source():
+        return repr(db.engine.url)
+
+
+# Global service instance
+local_search_service = LocalSearchService()
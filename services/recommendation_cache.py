@@ -0,0 +1,164 @@
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from extensions import cache
+from models import User, UserWineInteraction, WineReview
+
+
+class RecommendationCache:
+    """
+    Per-user cache of top-N recommended wine ids
+
+    Entries are stored in the application cache under the user id together
+    with the model version they were computed from, so a model swap turns
+    every entry into a miss without a flush. Entries are refilled lazily on
+    the next request. Writes that change a user's recommendations
+    (interactions, reviews, preferred traits) delete that user's entry
+    once the transaction commits; see ``register_cache_invalidation``.
+
+    Hit rate and endpoint latency are tracked per process.
+    """
+
+    KEY_PREFIX = 'recommendations:user:'
+
+    def __init__(self, max_samples=10000):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._latencies = {True: deque(maxlen=max_samples), False: deque(maxlen=max_samples)}
+
+    def key(self, user_id):
+        return f"{self.KEY_PREFIX}{user_id}"
+
+    def get_wine_ids(self, engine, user_id, limit):
+        """
+        Get a user's top ``limit`` wine ids, computing and caching on a miss
+
+        A cached list computed for a larger limit also serves smaller ones.
+
+        :return: (wine ids, whether the cache was hit)
+        """
+        version = engine.model.version
+        entry = None
+        try:
+            entry = cache.get(self.key(user_id))
+        except Exception as e:
+            self.logger.error(f"Recommendation cache read failed: {e}")
+
+        if entry and entry['version'] == version and (
+            entry['limit'] >= limit or len(entry['wine_ids']) < entry['limit']
+        ):
+            self._count(hit=True)
+            return entry['wine_ids'][:limit], True
+
+        self._count(hit=False)
+        wine_ids = engine.get_personalized_wine_ids(user_id, limit)
+        if version is not None:
+            try:
+                cache.set(
+                    self.key(user_id),
+                    {'version': version, 'limit': limit, 'wine_ids': wine_ids},
+                    timeout=current_app.config.get('RECOMMENDATION_CACHE_TIMEOUT', 3600)
+                )
+            except Exception as e:
+                self.logger.error(f"Recommendation cache write failed: {e}")
+        return wine_ids, False
+
+    def invalidate(self, *user_ids):
+        """
+        Drop the cached recommendations of the given users
+        """
+        if not user_ids:
+            return
+        try:
+            cache.delete_many(*[self.key(user_id) for user_id in user_ids])
+        except Exception as e:
+            self.logger.error(f"Recommendation cache invalidation failed: {e}")
+
+    def record_latency(self, seconds, hit):
+        with self._lock:
+            self._latencies[hit].append(seconds)
+
+    def stats(self):
+        """
+        Hit rate and p50/p99 endpoint latency (ms) of this process
+        """
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            samples = {hit: np.array(latencies) * 1000 for hit, latencies in self._latencies.items()}
+        every = np.concatenate([samples[True], samples[False]])
+
+        def percentiles(values):
+            if not len(values):
+                return {'count': 0, 'p50_ms': None, 'p99_ms': None}
+            return {
+                'count': int(len(values)),
+                'p50_ms': round(float(np.percentile(values, 50)), 3),
+                'p99_ms': round(float(np.percentile(values, 99)), 3)
+            }
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            'latency': percentiles(every),
+            'latency_hit': percentiles(samples[True]),
+            'latency_miss': percentiles(samples[False])
+        }
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+
+recommendation_cache = RecommendationCache()
+
+
+def _changed_user_ids(session):
+    """
+    Users whose recommendations are affected by the pending flush
+    """
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (UserWineInteraction, WineReview)) and obj.user_id is not None:
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, User) and obj.id is not None:
+            if inspect(obj).attrs.preferred_traits.history.has_changes():
+                user_ids.add(obj.id)
+    return user_ids
+
+
+def register_cache_invalidation():
+    """
+    Invalidate cached recommendations when a transaction that wrote a
+    user's interactions, reviews or preferred traits commits
+    """
+    if event.contains(Session, 'before_flush', _collect_changed_users):
+        return
+    event.listen(Session, 'before_flush', _collect_changed_users)
+    event.listen(Session, 'after_commit', _invalidate_changed_users)
+    event.listen(Session, 'after_rollback', _discard_changed_users)
+
+
+def _collect_changed_users(session, flush_context, instances):
+    session.info.setdefault('recommendation_cache_users', set()).update(_changed_user_ids(session))
+
+
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop('recommendation_cache_users', None)
+    if user_ids and has_app_context():
+        recommendation_cache.invalidate(*user_ids)
+
+
+def _discard_changed_users(session):
+    session.info.pop('recommendation_cache_users', None)
@@ -0,0 +1,293 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from flask import Flask, current_app
+
+from extensions import db
+from models import ModelPerformanceMetric, User, UserPreference, UserWineInteraction, user_traits
+from services.recommendation_service import RecommendationEngine
+from utils.recommendation_helpers import IVFIndex
+
+# Recommender modes the evaluator scores; 'popularity' is the cold-start
+# baseline and 'als_ann' is ALS served from the IVF index, so its metrics
+# show what the approximate search costs
+EVALUATION_MODES = ('popularity', 'traits', 'neighbours', 'content', 'als', 'als_ann', 'hybrid')
+
+# Set in each pool worker by _init_worker
+_worker = {}
+
+
+class RecommendationEvaluator:
+    """
+    Offline ranking evaluation of every recommender mode
+
+    Interactions are split by time: a model is built from the interactions
+    and review aggregates from before the cutoff (see
+    ``RecommendationEngine._build_model``), and each user's positively weighted
+    interactions after it (with wines they had not seen before) are the
+    relevant items. For every mode the top K wines of each test user are
+    compared with those items: precision@K, recall@K, NDCG@K, hit rate and
+    catalog coverage. Users are scored in parallel with a process pool;
+    workers only need the model and the users' preferences, never the
+    database.
+    """
+
+    def __init__(self, k=10, test_fraction=0.2, workers=None):
+        """
+        :param k: Recommendations per user
+        :param test_fraction: Share of the interactions (the newest) held out
+        :param workers: Scoring processes (defaults to the CPU count, 1 scores inline)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.k = k
+        self.test_fraction = test_fraction
+        self.workers = workers or os.cpu_count() or 1
+
+    def split(self, cutoff=None):
+        """
+        Time-based split of UserWineInteraction
+
+        :param cutoff: Split time; defaults to the created_at quantile that
+                       holds out ``test_fraction`` of the interactions
+        :return: (cutoff, {user_id: set of held-out wine ids})
+        """
+        rows = db.session.query(
+            UserWineInteraction.user_id,
+            UserWineInteraction.wine_id,
+            UserWineInteraction.interaction_weight,
+            UserWineInteraction.created_at
+        ).filter(UserWineInteraction.created_at.isnot(None)).all()
+        if not rows:
+            return cutoff, {}
+
+        if cutoff is None:
+            timestamps = np.array(sorted(row[3] for row in rows), dtype='datetime64[us]')
+            cutoff = timestamps[min(int(len(timestamps) * (1 - self.test_fraction)), len(timestamps) - 1)].item()
+
+        seen = {(user_id, wine_id) for user_id, wine_id, _, created_at in rows if created_at < cutoff}
+        held_out = {}
+        for user_id, wine_id, weight, created_at in rows:
+            if created_at >= cutoff and (weight is None or weight > 0) and (user_id, wine_id) not in seen:
+                held_out.setdefault(user_id, set()).add(wine_id)
+        return cutoff, held_out
+
+    def build_model(self, cutoff):
+        """
+        Model from the interactions before ``cutoff``, with ALS factors and
+        an IVF index over them whatever RECOMMENDATION_MODE is
+        """
+        engine = RecommendationEngine()
+        model = engine._build_model(until=cutoff)
+        model.version = f"eval-{cutoff:%Y%m%d%H%M%S}"
+        if model.item_factors is None:
+            als = engine._als().fit(model.interaction_matrix)
+            model.user_factors, model.item_factors = als.user_factors, als.item_factors
+        if model.ann_index is None:
+            model.ann_index = IVFIndex(n_lists=current_app.config.get('RECOMMENDATION_ANN_LISTS'))\
+                .build(model.item_factors)
+        return model
+
+    def evaluate(self, modes=EVALUATION_MODES, cutoff=None, save=True):
+        """
+        Evaluate ``modes`` on a time-based split and record the results
+
+        :param modes: Recommender modes to score (see EVALUATION_MODES)
+        :param cutoff: Split time (see ``split``)
+        :param save: Write one ModelPerformanceMetric row per mode
+        :return: {mode: metrics dict}
+        """
+        cutoff, held_out = self.split(cutoff)
+        if not held_out:
+            self.logger.warning("No held-out interactions to evaluate against")
+            return {}
+
+        start = time.perf_counter()
+        model = self.build_model(cutoff)
+        build_seconds = time.perf_counter() - start
+        users = self._user_inputs(model, held_out)
+        if not users:
+            self.logger.warning("No held-out interactions with known users and wines")
+            return {}
+
+        config = {key: value for key, value in current_app.config.items() if key.startswith('RECOMMENDATION_')}
+        pool = None
+        if self.workers > 1 and len(users) > 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(model, config))
+        else:
+            _worker.update(model=model, engine=RecommendationEngine())
+
+        results = {}
+        try:
+            for mode in modes:
+                start = time.perf_counter()
+                totals = self._score(pool, mode, users)
+                results[mode] = self._metrics(totals, len(users), len(model.wine_ids), time.perf_counter() - start)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if save:
+            self._save(model, cutoff, held_out, build_seconds, results)
+        return results
+
+    def _metrics(self, totals, n_users, n_wines, scoring_seconds):
+        """
+        Averages of the per-user metric totals of one mode
+        """
+        precision = totals['precision'] / n_users
+        recall = totals['recall'] / n_users
+        return {
+            'k': self.k,
+            'users': n_users,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'ndcg': totals['ndcg'] / n_users,
+            'hit_rate': totals['hits'] / n_users,
+            'coverage': len(totals['recommended']) / max(n_wines, 1),
+            'scoring_seconds': round(scoring_seconds, 3),
+            'users_per_second': round(n_users / scoring_seconds, 1) if scoring_seconds else None
+        }
+
+    def _user_inputs(self, model, held_out):
+        """
+        Per test user: (user_id, preferred trait ids, price range, relevant wine indices)
+        """
+        user_ids = sorted(held_out)
+        trait_rows = db.session.query(user_traits.c.user_id, user_traits.c.trait_id)\
+            .filter(user_traits.c.user_id.in_(user_ids)).all()
+        trait_ids = {}
+        for user_id, trait_id in trait_rows:
+            trait_ids.setdefault(user_id, []).append(trait_id)
+        price_ranges = dict(
+            db.session.query(UserPreference.user_id, UserPreference.preferred_price_range)
+            .filter(UserPreference.user_id.in_(user_ids)).all()
+        )
+        existing = {row[0] for row in db.session.query(User.id).filter(User.id.in_(user_ids)).all()}
+
+        users = []
+        for user_id in user_ids:
+            relevant = [model.wine_id_to_index[wine_id] for wine_id in held_out[user_id] if wine_id in model.wine_id_to_index]
+            if user_id in existing and relevant:
+                users.append((user_id, trait_ids.get(user_id, []), price_ranges.get(user_id), relevant))
+        return users
+
+    def _score(self, pool, mode, users):
+        """
+        Metric totals for one mode, scored in the pool's workers (or inline
+        without a pool)
+        """
+        if pool is None:
+            return _score_users(mode, self.k, users)
+
+        n_chunks = min(len(users), self.workers * 4)
+        chunks = [users[index::n_chunks] for index in range(n_chunks)]
+        totals = _empty_totals()
+        for chunk_totals in pool.map(_score_users, [mode] * n_chunks, [self.k] * n_chunks, chunks):
+            for key in ('precision', 'recall', 'ndcg', 'hits'):
+                totals[key] += chunk_totals[key]
+            totals['recommended'].update(chunk_totals['recommended'])
+        return totals
+
+    def _save(self, model, cutoff, held_out, build_seconds, results):
+        """
+        One ModelPerformanceMetric row per mode
+
+        ``accuracy`` holds the hit rate (users with at least one relevant
+        wine in their top K); NDCG, coverage and the split details go into
+        ``training_environment``.
+        """
+        try:
+            for mode, metrics in results.items():
+                db.session.add(ModelPerformanceMetric(
+                    model_name=f"recommendation:{mode}",
+                    accuracy=metrics['hit_rate'],
+                    precision=metrics['precision'],
+                    recall=metrics['recall'],
+                    f1_score=metrics['f1_score'],
+                    model_version=model.version,
+                    training_dataset_size=int(model.interaction_matrix.nnz),
+                    training_environment={
+                        'k': metrics['k'],
+                        'ndcg': metrics['ndcg'],
+                        'coverage': metrics['coverage'],
+                        'users': metrics['users'],
+                        'cutoff': cutoff.isoformat(),
+                        'test_interactions': sum(len(wine_ids) for wine_ids in held_out.values()),
+                        'build_seconds': round(build_seconds, 3),
+                        'scoring_seconds': metrics['scoring_seconds'],
+                        'workers': self.workers
+                    }
+                ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"Saving recommendation evaluation failed: {e}")
+            raise
+
+
+def _init_worker(model, config):
+    """
+    Give a scoring process the model and a database-free app context for
+    the engine's RECOMMENDATION_* settings
+    """
+    app = Flask(__name__)
+    app.config.update(config)
+    app.app_context().push()
+    _worker.update(model=model, engine=RecommendationEngine())
+
+
+def _empty_totals():
+    return {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'hits': 0, 'recommended': set()}
+
+
+def _rank(engine, model, mode, k, user_id, trait_ids, price_range):
+    """
+    Top k wine indices of one user, as the engine ranks them in ``mode``
+    """
+    config = current_app.config
+    ranked = None
+    if mode in ('als', 'als_ann'):
+        ranked = engine._rank_by_factors(model, user_id, k)
+    elif mode == 'content':
+        ranked = engine._rank_by_content(model, user_id, k)
+    elif mode == 'neighbours':
+        ranked = engine._rank_by_neighbours(
+            model, trait_ids, user_id, k,
+            neighbourhood_size=config.get('RECOMMENDATION_NEIGHBOURHOOD_SIZE', 5),
+            metric=config.get('RECOMMENDATION_NEIGHBOUR_METRIC', 'jaccard')
+        )
+    elif mode == 'hybrid':
+        ranked, _ = engine._rank_hybrid(model, trait_ids, user_id, price_range=price_range, limit=k)
+    if ranked is None and (mode == 'popularity' or not trait_ids):
+        ranked = engine._rank_by_popularity(model, None, user_id, k)
+    if ranked is None:
+        # Same fallback as get_personalized_wine_ids
+        ranked = engine._rank_by_traits(model, trait_ids, user_id, k)
+    return np.asarray(ranked)[:k]
+
+
+def _score_users(mode, k, users):
+    """
+    Metric totals of ``users`` for one mode (runs in a pool worker)
+    """
+    engine, model = _worker['engine'], _worker['model']
+    if mode == 'als' and model.ann_index is not None:
+        # Exact ALS: the same model without the IVF index
+        model = model.copy()
+        model.ann_index = None
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    totals = _empty_totals()
+    for user_id, trait_ids, price_range, relevant in users:
+        ranked = _rank(engine, model, mode, k, user_id, trait_ids, price_range)
+        gains = np.isin(ranked, relevant)
+        hits = int(gains.sum())
+        totals['precision'] += hits / k
+        totals['recall'] += hits / len(relevant)
+        totals['ndcg'] += float(discounts[:len(ranked)][gains].sum() / discounts[:min(len(relevant), k)].sum())
+        totals['hits'] += hits > 0
+        totals['recommended'].update(ranked.tolist())
+    return totals
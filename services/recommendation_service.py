@@ -1,22 +1,515 @@
 import logging
+import os
+import threading
+import time
+from datetime import datetime
+
 import numpy as np
 import pandas as pd
+import scipy.sparse as sparse
 from typing import List, Optional, Dict, Any
 
 from flask import current_app
-from sqlalchemy import func, case
+from sqlalchemy import func, or_, select
 
 from extensions import db
+from utils.recommendation_helpers import RecommendationHelper, IVFIndex
+from utils.matrix_factorization import ImplicitALS
+from utils.content_vectorizer import ContentVectorizer
+from utils.snapshot_store import SnapshotStore
+from services.wine_feature_store import wine_feature_store
 from models import (
     Wine, 
     WineReview, 
+    WineStats,
     User, 
     UserWineInteraction, 
     WineVarietal, 
     WineRegion,
-    WineTrait
+    WineTrait,
+    UserPreference,
+    user_traits,
+    wine_traits
 )
 
+WINE_COLUMNS = [
+    'id', 'name', 'type', 'varietal', 'region', 'description',
+    'price', 'alcohol_percentage', 'avg_rating', 'total_reviews'
+]
+WINE_TEXT_COLUMNS = ['name', 'type', 'varietal', 'region', 'description']
+WINE_NUMERIC_DTYPES = {
+    'id': np.int64,
+    'price': np.float64,
+    'alcohol_percentage': np.float64,
+    'avg_rating': np.float64,
+    'total_reviews': np.int64
+}
+WINE_NUMERIC_COLUMNS = list(WINE_NUMERIC_DTYPES)
+
+# Bump when the on-disk snapshot layout changes
+SNAPSHOT_FORMAT = 4
+
+class RecommendationModel:
+    """
+    Immutable snapshot of everything the recommendation engine serves from
+
+    A model is fully built before it is published; the engine swaps its
+    reference in one assignment, so readers always see a complete model.
+    """
+
+    def __init__(self, wine_df=None, interaction_matrix=None, user_ids=None, wine_ids=None,
+                 watermark=None, version=None, built_at=None, build_duration=0.0,
+                 interaction_matrix_csc=None, wine_trait_matrix=None, trait_ids=None,
+                 similar_wines=None, similar_scores=None, user_trait_matrix=None,
+                 user_factors=None, item_factors=None, content_matrix=None, content_vectorizer=None,
+                 ann_index=None, popular_limit=100, price_bands=(20, 50, 100)):
+        self.wine_df = wine_df
+        self.interaction_matrix = interaction_matrix
+        if interaction_matrix_csc is None and interaction_matrix is not None:
+            interaction_matrix_csc = interaction_matrix.tocsc()
+        self.interaction_matrix_csc = interaction_matrix_csc
+        self.user_ids = list(user_ids) if user_ids is not None else []
+        self.wine_ids = list(wine_ids) if wine_ids is not None else []
+        self.user_id_to_index = {user_id: idx for idx, user_id in enumerate(self.user_ids)}
+        self.wine_id_to_index = {wine_id: idx for idx, wine_id in enumerate(self.wine_ids)}
+        # Wine x trait incidence matrix, rows aligned with wine_ids
+        self.wine_trait_matrix = wine_trait_matrix
+        self.trait_ids = list(trait_ids) if trait_ids is not None else []
+        self.trait_id_to_index = {trait_id: idx for idx, trait_id in enumerate(self.trait_ids)}
+        # User x trait preference matrix, rows aligned with user_ids
+        self.user_trait_matrix = user_trait_matrix
+        # Implicit ALS factors (float32), rows aligned with user_ids/wine_ids
+        # as of the last full build
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        # Optional IVFIndex over item_factors for approximate ALS ranking
+        self.ann_index = ann_index
+        # L2-normalized TF-IDF rows over description + trait names, aligned
+        # with wine_ids, and the vectorizer that produced them
+        self.content_matrix = content_matrix
+        self.content_vectorizer = content_vectorizer
+        # Packed trait bitsets, derived from wine_trait_matrix
+        self.trait_bitsets = self._pack_trait_bitsets(wine_trait_matrix)
+        self._columns = {}
+        # Best-first wine indices per (segment, value), e.g. ('type', 'Red'),
+        # plus ('all', None); see compute_popular_segments
+        self.popular_segments = {}
+        self.popular_limit = popular_limit
+        self.price_bands = list(price_bands)
+        # Precomputed top-k neighbours per wine index (int32 indices, -1 = none)
+        self.similar_wines = similar_wines
+        self.similar_scores = similar_scores
+        self.watermark = watermark
+        self.version = version
+        self.built_at = built_at
+        self.build_duration = build_duration
+
+    def copy(self):
+        """
+        Copy the snapshot for patching; index lists and maps are duplicated,
+        arrays and frames are shared until replaced
+        """
+        model = RecommendationModel.__new__(RecommendationModel)
+        model.__dict__.update(self.__dict__)
+        model.user_ids = list(self.user_ids)
+        model.wine_ids = list(self.wine_ids)
+        model.user_id_to_index = dict(self.user_id_to_index)
+        model.wine_id_to_index = dict(self.wine_id_to_index)
+        model.trait_ids = list(self.trait_ids)
+        model.trait_id_to_index = dict(self.trait_id_to_index)
+        model._columns = {}
+        return model
+
+    @staticmethod
+    def _pack_trait_bitsets(wine_trait_matrix):
+        """
+        Pack the wine x trait matrix into word-major uint64 bitsets
+
+        The result has shape (n_words, n_wines): each 64-trait word is one
+        contiguous array over the catalog, so a query only touches the words
+        its traits fall in.
+        """
+        if wine_trait_matrix is None:
+            return None
+        return np.ascontiguousarray(RecommendationHelper.pack_bitsets(wine_trait_matrix).T)
+
+    def wine_column(self, column):
+        """
+        A wine_df column as an array aligned with ``wine_ids`` (cached)
+
+        Wines missing from wine_df get NaN.
+        """
+        if column not in self._columns:
+            if self.wine_df is None:
+                self._columns[column] = np.full(len(self.wine_ids), np.nan, dtype=np.float32)
+            else:
+                self._columns[column] = self.wine_df[column].reindex(self._wine_index())\
+                    .to_numpy(dtype=np.float32, na_value=np.nan)
+        return self._columns[column]
+
+    def rating_tiebreak(self):
+        """
+        Average rating / 10 per wine index (cached), -inf for wines missing
+        from wine_df
+
+        Ratings are at most 5, so adding this to an integer score only
+        orders wines with equal scores.
+        """
+        if 'rating_tiebreak' not in self._columns:
+            tiebreak = self.wine_column('avg_rating') / np.float32(10)
+            tiebreak[np.isnan(tiebreak)] = -np.inf
+            self._columns['rating_tiebreak'] = tiebreak
+        return self._columns['rating_tiebreak']
+
+    def _wine_index(self):
+        """``wine_ids`` as a pandas Index (cached), for aligning wine_df columns"""
+        if 'wine_index' not in self._columns:
+            self._columns['wine_index'] = pd.Index(self.wine_ids)
+        return self._columns['wine_index']
+
+    def wine_labels(self, column):
+        """
+        A wine_df text column as a str array aligned with ``wine_ids`` (cached)
+        """
+        key = f'labels:{column}'
+        if key not in self._columns:
+            self._columns[key] = self.wine_df[column].reindex(self._wine_index())\
+                .fillna('Unknown').astype(str).to_numpy()
+        return self._columns[key]
+
+    def price_band_labels(self):
+        """
+        Price band of every wine index, e.g. '20-50' or '100+'
+        """
+        names = self.price_band_names()
+        bands = np.digitize(self.wine_column('price'), self.price_bands)
+        labels = np.asarray([name for name, _, _ in names], dtype=object)[bands]
+        labels[np.isnan(self.wine_column('price'))] = 'Unknown'
+        return labels
+
+    def price_band_names(self):
+        """
+        (label, low, high) of every price band
+        """
+        bounds = [0] + list(self.price_bands) + [np.inf]
+        return [
+            (f'{low:g}-{high:g}' if np.isfinite(high) else f'{low:g}+', low, high)
+            for low, high in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def popularity_scores(self):
+        """
+        Positive interactions plus reviews per wine index (cached), with the
+        average rating / 10 as tie-breaker; -inf for wines missing from wine_df
+        """
+        if 'popularity' not in self._columns:
+            n_wines = len(self.wine_ids)
+            counts = np.zeros(n_wines, dtype=np.float32)
+            matrix = self.interaction_matrix_csc
+            if matrix is not None:
+                positive = np.concatenate([[0], np.cumsum(matrix.data > 0)])
+                counts[:matrix.shape[1]] = positive[matrix.indptr[1:]] - positive[matrix.indptr[:-1]]
+            reviews = self.wine_column('total_reviews')
+            self._columns['popularity'] = counts + np.nan_to_num(reviews) + self.rating_tiebreak()
+        return self._columns['popularity']
+
+    def compute_popular_segments(self, wine_indices=None):
+        """
+        Precompute the ``popular_limit`` most popular wines per segment
+
+        Segments are wine type, region and price band, plus the whole
+        catalog. Wines are grouped by one lexsort on (segment value,
+        -popularity) and each group's head becomes its table. With
+        ``wine_indices`` only the tables those wines belong to (now or
+        before) are rebuilt, sorting just the members of those groups.
+
+        :param wine_indices: Wines whose counts or attributes changed; None rebuilds everything
+        """
+        scores = self.popularity_scores()
+        ranked = np.flatnonzero(np.isfinite(scores))
+        ranked = ranked[RecommendationHelper.top_k(scores[ranked], self.popular_limit)]
+        tables = {} if wine_indices is None else dict(self.popular_segments)
+        tables[('all', None)] = ranked
+
+        segments = {
+            'type': self.wine_labels('type'),
+            'region': self.wine_labels('region'),
+            'price_band': self.price_band_labels()
+        }
+        for segment, labels in segments.items():
+            codes, values = pd.factorize(labels)
+            members = np.flatnonzero(np.isfinite(scores))
+            if wine_indices is not None:
+                # Groups the changed wines are in now, or were in before
+                changed = np.asarray(wine_indices, dtype=np.int64)
+                is_changed = np.zeros(len(scores), dtype=bool)
+                is_changed[changed] = True
+                stale = [
+                    value for (name, value), table in tables.items()
+                    if name == segment and is_changed[table].any()
+                ]
+                for value in stale:
+                    del tables[(segment, value)]
+                affected = np.union1d(codes[changed], pd.Index(values).get_indexer(stale))
+                members = members[np.isin(codes[members], affected)]
+
+            order = members[np.lexsort((-scores[members], codes[members]))]
+            group_codes, starts = np.unique(codes[order], return_index=True)
+            for code, start in zip(group_codes.tolist(), starts.tolist()):
+                group = order[start:start + self.popular_limit]
+                tables[(segment, values[code])] = group[codes[group] == code]
+        self.popular_segments = tables
+        return self
+
+    def trait_match_counts(self, trait_ids):
+        """
+        Count how many of ``trait_ids`` every wine has
+
+        The traits are packed into the same bitset layout as the wines, so
+        scoring the whole catalog is one AND and one popcount per non-empty
+        query word.
+
+        :param trait_ids: Trait ids to match
+        :return: uint8 array of matches per wine index
+        """
+        columns = [self.trait_id_to_index[trait_id] for trait_id in trait_ids if trait_id in self.trait_id_to_index]
+        bits = np.zeros(len(self.trait_bitsets) * 64, dtype=bool)
+        bits[columns] = True
+        query = np.packbits(bits, bitorder='little').view(np.uint64)
+
+        counts = np.zeros(self.trait_bitsets.shape[1], dtype=np.uint8)
+        for word in np.flatnonzero(query):
+            counts += RecommendationHelper.popcount(self.trait_bitsets[word] & query[word])
+        return counts
+
+    def interacted_wine_indices(self, user_id):
+        """
+        Column indices of the wines a user has interacted with
+        """
+        row = self.user_id_to_index.get(user_id)
+        if row is None or self.interaction_matrix is None:
+            return np.empty(0, dtype=np.int32)
+        matrix = self.interaction_matrix
+        return matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+
+    def compute_similar_wines(self, k=20, trait_weight=0.5, max_block_elements=2 ** 25):
+        """
+        Precompute the top-k most similar wines for every wine
+
+        Each wine is described by its column of the interaction matrix and
+        its row of the trait matrix; both parts are L2-normalized and
+        weighted so the cosine of the stacked vectors blends interaction
+        and trait similarity. Neighbours are found with blocked sparse
+        products (see ``RecommendationHelper.top_k_similar``).
+
+        :param k: Neighbours to keep per wine
+        :param trait_weight: Share of trait similarity in the blend (0..1)
+        :param max_block_elements: Memory bound for one similarity block
+        """
+        n_wines = len(self.wine_ids)
+        parts = []
+        if self.interaction_matrix_csc is not None and trait_weight < 1:
+            interactions = RecommendationHelper.normalize_rows(self.interaction_matrix_csc.T)
+            parts.append(interactions * np.float32(np.sqrt(1 - trait_weight)))
+        if self.wine_trait_matrix is not None and trait_weight > 0:
+            traits = RecommendationHelper.normalize_rows(self.wine_trait_matrix)
+            parts.append(traits * np.float32(np.sqrt(trait_weight)))
+        vectors = sparse.hstack(parts, format='csr') if parts else sparse.csr_matrix((n_wines, 0), dtype=np.float32)
+
+        self.similar_wines, self.similar_scores = RecommendationHelper.top_k_similar(
+            vectors, k=k, max_block_elements=max_block_elements
+        )
+        return self
+
+    def similar_wine_ids(self, wine_id, limit=None):
+        """
+        Look up precomputed neighbours of a wine
+
+        :param wine_id: Wine id
+        :param limit: Maximum number of neighbours
+        :return: List of (wine_id, score) pairs, best first
+        """
+        idx = self.wine_id_to_index.get(wine_id)
+        if self.similar_wines is None or idx is None or idx >= len(self.similar_wines):
+            return []
+        neighbours = self.similar_wines[idx, :limit]
+        scores = self.similar_scores[idx, :limit]
+        return [
+            (self.wine_ids[neighbour], float(score))
+            for neighbour, score in zip(neighbours.tolist(), scores.tolist())
+            if neighbour >= 0
+        ]
+
+    def to_dict(self):
+        """Summarize the snapshot for status endpoints and logs"""
+        return {
+            'version': self.version,
+            'built_at': self.built_at.isoformat() if self.built_at else None,
+            'build_duration': round(self.build_duration, 3),
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'wines': len(self.wine_df) if self.wine_df is not None else 0,
+            'users': len(self.user_ids),
+            'interactions': int(self.interaction_matrix.nnz) if self.interaction_matrix is not None else 0,
+            'traits': len(self.trait_ids),
+            'similar_wines_k': int(self.similar_wines.shape[1]) if self.similar_wines is not None else 0,
+            'factors': int(self.item_factors.shape[1]) if self.item_factors is not None else 0,
+            'ann_lists': len(self.ann_index.centroids) if self.ann_index is not None else 0,
+            'content_terms': int(self.content_matrix.shape[1]) if self.content_matrix is not None else 0
+        }
+
+    def save(self, directory):
+        """
+        Persist the snapshot as flat .npy files under ``directory/<version>``
+
+        The sparse matrices, id arrays and numeric wine features are written
+        as individual .npy files so workers can memory-map them; text columns
+        go into one compressed .npz. ``directory/CURRENT`` is switched to the
+        new snapshot with an atomic rename once every file is written.
+
+        :param directory: Snapshot root directory
+        :return: Path of the written snapshot
+        """
+        arrays = {
+            'user_ids': np.asarray(self.user_ids, dtype=np.int64),
+            'wine_ids': np.asarray(self.wine_ids, dtype=np.int64),
+            'trait_ids': np.asarray(self.trait_ids, dtype=np.int64)
+        }
+        wine_trait_matrix = self.wine_trait_matrix
+        if wine_trait_matrix is None:
+            wine_trait_matrix = sparse.csr_matrix((len(self.wine_ids), len(self.trait_ids)), dtype=np.float32)
+        user_trait_matrix = self.user_trait_matrix
+        if user_trait_matrix is None:
+            user_trait_matrix = sparse.csr_matrix((len(self.user_ids), len(self.trait_ids)), dtype=np.float32)
+        for prefix, matrix in (('csr', self.interaction_matrix), ('csc', self.interaction_matrix_csc),
+                               ('wine_traits', wine_trait_matrix), ('user_traits', user_trait_matrix)):
+            arrays[f'{prefix}_data'] = matrix.data
+            arrays[f'{prefix}_indices'] = matrix.indices
+            arrays[f'{prefix}_indptr'] = matrix.indptr
+        for column in WINE_NUMERIC_COLUMNS:
+            arrays[f'wine_{column}'] = np.asarray(self.wine_df[column], dtype=WINE_NUMERIC_DTYPES[column])
+        if self.similar_wines is not None:
+            arrays['similar_wines'] = np.asarray(self.similar_wines, dtype=np.int32)
+            arrays['similar_scores'] = np.asarray(self.similar_scores, dtype=np.float32)
+        if self.content_matrix is not None:
+            arrays['content_data'] = self.content_matrix.data
+            arrays['content_indices'] = self.content_matrix.indices
+            arrays['content_indptr'] = self.content_matrix.indptr
+            arrays['content_idf'] = np.asarray(self.content_vectorizer.idf)
+            arrays['content_vocabulary'] = np.asarray(self.content_vectorizer.vocabulary, dtype=str)
+        if self.item_factors is not None:
+            arrays['user_factors'] = np.asarray(self.user_factors, dtype=np.float32)
+            arrays['item_factors'] = np.asarray(self.item_factors, dtype=np.float32)
+
+        with SnapshotStore.write(directory, self.version) as staging:
+            SnapshotStore.save_arrays(staging, arrays)
+            if self.ann_index is not None:
+                self.ann_index.save(staging, prefix='ann')
+            np.savez_compressed(
+                os.path.join(staging, 'wine_text.npz'),
+                **{column: self.wine_df[column].fillna('').astype(str).to_numpy(dtype=str) for column in WINE_TEXT_COLUMNS}
+            )
+            SnapshotStore.write_manifest(staging, {
+                'format': SNAPSHOT_FORMAT,
+                'version': self.version,
+                'built_at': self.built_at.isoformat() if self.built_at else None,
+                'build_duration': self.build_duration,
+                'watermark': self.watermark.isoformat() if self.watermark else None,
+                'shape': list(self.interaction_matrix.shape),
+                'wine_traits_shape': list(wine_trait_matrix.shape),
+                'user_traits_shape': list(user_trait_matrix.shape),
+                'similar_wines': self.similar_wines is not None,
+                'factors': self.item_factors is not None,
+                'ann_index': self.ann_index is not None,
+                'popular_limit': self.popular_limit,
+                'price_bands': self.price_bands,
+                'content_shape': list(self.content_matrix.shape) if self.content_matrix is not None else None
+            })
+        return os.path.join(directory, self.version)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load the snapshot ``directory/CURRENT`` points to
+
+        Arrays are opened with ``np.load(mmap_mode=...)`` so every worker
+        shares the same pages through the OS page cache.
+
+        :param directory: Snapshot root directory
+        :param mmap_mode: numpy memory-map mode, None to read into memory
+        :return: RecommendationModel, or None if no snapshot exists
+        """
+        path, meta = SnapshotStore.open(directory, SNAPSHOT_FORMAT, 'recommendation snapshot')
+        if path is None:
+            return None
+
+        def array(name):
+            return SnapshotStore.load_array(path, name, mmap_mode)
+
+        shape = tuple(meta['shape'])
+        csr = sparse.csr_matrix((array('csr_data'), array('csr_indices'), array('csr_indptr')), shape=shape, copy=False)
+        csc = sparse.csc_matrix((array('csc_data'), array('csc_indices'), array('csc_indptr')), shape=shape, copy=False)
+        wine_trait_matrix = sparse.csr_matrix(
+            (array('wine_traits_data'), array('wine_traits_indices'), array('wine_traits_indptr')),
+            shape=tuple(meta['wine_traits_shape']),
+            copy=False
+        )
+        user_trait_matrix = sparse.csr_matrix(
+            (array('user_traits_data'), array('user_traits_indices'), array('user_traits_indptr')),
+            shape=tuple(meta['user_traits_shape']),
+            copy=False
+        )
+
+        content_matrix = content_vectorizer = None
+        if meta.get('content_shape'):
+            content_matrix = sparse.csr_matrix(
+                (array('content_data'), array('content_indices'), array('content_indptr')),
+                shape=tuple(meta['content_shape']),
+                copy=False
+            )
+            content_vectorizer = ContentVectorizer(
+                vocabulary=SnapshotStore.load_array(path, 'content_vocabulary', None).tolist(),
+                idf=SnapshotStore.load_array(path, 'content_idf', None)
+            )
+
+        with np.load(os.path.join(path, 'wine_text.npz')) as text:
+            columns = {column: text[column] for column in WINE_TEXT_COLUMNS}
+        columns.update({column: array(f'wine_{column}') for column in WINE_NUMERIC_COLUMNS})
+        wine_df = pd.DataFrame(columns, columns=WINE_COLUMNS)
+        wine_df.index = pd.Index(wine_df['id'].values)
+
+        model = cls(
+            wine_df=wine_df,
+            interaction_matrix=csr,
+            interaction_matrix_csc=csc,
+            user_ids=array('user_ids').tolist(),
+            wine_ids=array('wine_ids').tolist(),
+            wine_trait_matrix=wine_trait_matrix,
+            user_trait_matrix=user_trait_matrix,
+            trait_ids=array('trait_ids').tolist(),
+            similar_wines=array('similar_wines') if meta.get('similar_wines') else None,
+            similar_scores=array('similar_scores') if meta.get('similar_wines') else None,
+            user_factors=array('user_factors') if meta.get('factors') else None,
+            item_factors=array('item_factors') if meta.get('factors') else None,
+            content_matrix=content_matrix,
+            content_vectorizer=content_vectorizer,
+            ann_index=IVFIndex.load(path, prefix='ann', mmap_mode=mmap_mode) if meta.get('ann_index') else None,
+            popular_limit=meta['popular_limit'],
+            price_bands=meta['price_bands'],
+            watermark=datetime.fromisoformat(meta['watermark']) if meta.get('watermark') else None,
+            version=meta['version'],
+            built_at=datetime.fromisoformat(meta['built_at']) if meta.get('built_at') else None,
+            build_duration=meta.get('build_duration', 0.0)
+        )
+        # Derived from counts already in the snapshot, so recomputed rather than stored
+        return model.compute_popular_segments()
+
+    @staticmethod
+    def prune(directory, keep=3):
+        """
+        Delete all but the ``keep`` newest snapshots, never the CURRENT one
+        """
+        SnapshotStore.prune(directory, keep)
+
 class RecommendationEngine:
     _instance = None
 
@@ -24,146 +517,1118 @@ class RecommendationEngine:
         if not cls._instance:
             cls._instance = super(RecommendationEngine, cls).__new__(cls)
             cls._instance.logger = logging.getLogger(__name__)
-            cls._instance.wine_df = None
-            cls._instance.interaction_matrix = None
+            cls._instance.model = RecommendationModel()
             cls._instance.initialized = False
+            cls._instance._build_lock = threading.Lock()
+            cls._instance.last_error = None
+            cls._instance.last_failure_at = None
+            cls._instance.failures = 0
         return cls._instance
 
+    # Read-only views of the current snapshot, kept for existing callers
+    wine_df = property(lambda self: self.model.wine_df)
+    interaction_matrix = property(lambda self: self.model.interaction_matrix)
+    interaction_matrix_csc = property(lambda self: self.model.interaction_matrix_csc)
+    user_ids = property(lambda self: self.model.user_ids)
+    wine_ids = property(lambda self: self.model.wine_ids)
+    user_id_to_index = property(lambda self: self.model.user_id_to_index)
+    wine_id_to_index = property(lambda self: self.model.wine_id_to_index)
+    watermark = property(lambda self: self.model.watermark)
+
     def initialize(self):
         """
         Initialize recommendation engine
+
+        Loads the persisted snapshot from RECOMMENDATION_SNAPSHOT_DIR when
+        one exists (memory-mapped, shared between workers) and only falls
+        back to building from the database otherwise.
         """
         try:
             with current_app.app_context():
-                self._load_wine_data()
-                self._create_interaction_matrix()
-                self.initialized = True
+                if not self.load_snapshot():
+                    self.rebuild()
                 self.logger.info("Recommendation engine initialized successfully")
         except Exception as e:
             self.logger.error(f"Recommendation engine initialization failed: {e}")
-            self.initialized = False
         return self
 
+    def rebuild(self, incremental=False, since=None):
+        """
+        Build a new model snapshot and publish it atomically
+
+        Concurrent rebuilds are skipped rather than queued; readers keep
+        serving the current snapshot until the new one is swapped in.
+
+        :param incremental: Apply changes since the current watermark instead
+                            of reloading everything
+        :param since: Override the watermark for an incremental build
+        :return: The published model, or None if a build was already running
+        """
+        if not self._build_lock.acquire(blocking=False):
+            self.logger.info("Recommendation model build already in progress")
+            return None
+        try:
+            start = time.perf_counter()
+            if incremental and self.initialized:
+                model = self._build_incremental_model(self.model, since=since)
+            else:
+                model = self._build_model()
+            model.built_at = datetime.utcnow()
+            model.version = model.built_at.strftime('%Y%m%d%H%M%S%f')
+            model.build_duration = time.perf_counter() - start
+            self._publish(model)
+            self.last_error, self.failures = None, 0
+            return model
+        except Exception as e:
+            self.last_error = str(e)
+            self.last_failure_at = datetime.utcnow()
+            self.failures += 1
+            raise
+        finally:
+            self._build_lock.release()
+
+    def retry_due(self):
+        """
+        Whether an automatic build may start: immediately before the first
+        failure, then after RECOMMENDATION_REBUILD_RETRY_SECONDS doubled per
+        consecutive failure (capped at 32x)
+        """
+        if not self.failures:
+            return True
+        delay = current_app.config.get('RECOMMENDATION_REBUILD_RETRY_SECONDS', 60) * 2 ** min(self.failures - 1, 5)
+        return (datetime.utcnow() - self.last_failure_at).total_seconds() >= delay
+
+    def rebuild_async(self, app=None, incremental=False):
+        """
+        Rebuild the model in a background thread
+
+        :param app: Flask application, defaults to the current one
+        :param incremental: See ``rebuild``
+        :return: The started thread
+        """
+        app = app or current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    self.rebuild(incremental=incremental)
+                except Exception as e:
+                    self.logger.error(f"Background recommendation rebuild failed: {e}")
+                finally:
+                    db.session.remove()
+
+        thread = threading.Thread(target=run, name='recommendation-rebuild', daemon=True)
+        thread.start()
+        return thread
+
+    def _publish(self, model):
+        """
+        Swap in a fully built model with a single reference assignment
+        """
+        self.model = model
+        self.initialized = True
+        self.logger.info(f"Published recommendation model {model.to_dict()}")
+
+    def load_snapshot(self, directory=None):
+        """
+        Publish the persisted snapshot from ``directory``
+
+        :param directory: Snapshot root, defaults to RECOMMENDATION_SNAPSHOT_DIR
+        :return: The loaded model, or None if there is no snapshot
+        """
+        directory = directory or current_app.config.get('RECOMMENDATION_SNAPSHOT_DIR')
+        if not directory:
+            return None
+        try:
+            model = RecommendationModel.load(directory)
+        except Exception as e:
+            self.logger.error(f"Failed to load recommendation snapshot from {directory}: {e}")
+            return None
+        if model is not None:
+            self._publish(model)
+        return model
+
+    def save_snapshot(self, directory=None, keep=3):
+        """
+        Persist the current model so other workers can memory-map it
+
+        :param directory: Snapshot root, defaults to RECOMMENDATION_SNAPSHOT_DIR
+        :param keep: Number of snapshots to retain
+        :return: Path of the written snapshot
+        """
+        directory = directory or current_app.config['RECOMMENDATION_SNAPSHOT_DIR']
+        path = self.model.save(directory)
+        RecommendationModel.prune(directory, keep=keep)
+        return path
+
+    def model_info(self):
+        """
+        Describe the model currently being served
+        """
+        info = self.model.to_dict()
+        info['initialized'] = self.initialized
+        info['rebuilding'] = self._build_lock.locked()
+        info['last_error'] = self.last_error
+        info['last_failure_at'] = self.last_failure_at.isoformat() if self.last_failure_at else None
+        return info
+
+    def _build_model(self, until=None):
+        """
+        Build a complete model snapshot from the database
+
+        :param until: Only use data from before this time (for offline
+                      evaluation on a time-based split): interactions and
+                      the reviews behind avg_rating/total_reviews created
+                      before it, and the trait preferences of users who
+                      signed up before it. Trait preferences are not
+                      versioned, so those users' current ones stand in.
+        """
+        watermark = datetime.utcnow()
+        wine_df = self._load_wine_data()
+        interaction_filters, user_trait_filters = [], []
+        if until is not None:
+            wine_df = self._review_stats_until(wine_df, until)
+            interaction_filters.append(UserWineInteraction.created_at < until)
+            user_trait_filters.append(user_traits.c.user_id.in_(select(User.id).where(User.created_at < until)))
+        interaction_matrix, user_ids, wine_ids = self._create_interaction_matrix(wine_df, *interaction_filters)
+        wine_trait_matrix, trait_ids = self._create_wine_trait_matrix(wine_ids)
+        user_col, trait_col = self._query_user_trait_columns(*user_trait_filters)
+        model = RecommendationModel(
+            wine_df=wine_df,
+            interaction_matrix=interaction_matrix,
+            user_ids=user_ids,
+            wine_ids=wine_ids,
+            wine_trait_matrix=wine_trait_matrix,
+            user_trait_matrix=RecommendationHelper.build_incidence_matrix(user_col, trait_col, user_ids, trait_ids),
+            trait_ids=trait_ids,
+            watermark=watermark,
+            popular_limit=current_app.config.get('RECOMMENDATION_POPULAR_LIMIT', 100),
+            price_bands=current_app.config.get('RECOMMENDATION_PRICE_BANDS', (20, 50, 100))
+        )
+        model.compute_popular_segments()
+
+        similar_k = current_app.config.get('RECOMMENDATION_SIMILAR_WINES_K', 20)
+        if similar_k:
+            model.compute_similar_wines(
+                k=similar_k,
+                trait_weight=current_app.config.get('RECOMMENDATION_SIMILARITY_TRAIT_WEIGHT', 0.5)
+            )
+        self._build_content_matrix(model)
+        if current_app.config.get('RECOMMENDATION_MODE') == 'als':
+            als = self._als().fit(interaction_matrix)
+            model.user_factors, model.item_factors = als.user_factors, als.item_factors
+            if current_app.config.get('RECOMMENDATION_ANN_INDEX'):
+                model.ann_index = IVFIndex(n_lists=current_app.config.get('RECOMMENDATION_ANN_LISTS'))\
+                    .build(model.item_factors)
+        return model
+
+    def _build_content_matrix(self, model):
+        """
+        Fit TF-IDF over every wine's description and trait names
+        """
+        vectorizer = ContentVectorizer(max_features=current_app.config.get('RECOMMENDATION_CONTENT_MAX_FEATURES'))
+        try:
+            model.content_matrix = vectorizer.fit_transform(self._wine_documents(model, model.wine_ids))
+            model.content_vectorizer = vectorizer
+        except ValueError as e:
+            self.logger.warning(f"Content model skipped: {e}")
+
+    def _wine_documents(self, model, wine_ids):
+        """
+        Text of each wine for the content model: description + trait names
+        """
+        names = dict(db.session.query(WineTrait.id, WineTrait.name).all())
+        trait_names = [names.get(trait_id) or '' for trait_id in model.trait_ids]
+        descriptions = model.wine_df['description'].reindex(wine_ids).fillna('').astype(str).tolist()
+        traits = model.wine_trait_matrix
+
+        documents = []
+        for description, wine_id in zip(descriptions, wine_ids):
+            row = model.wine_id_to_index[wine_id]
+            columns = traits.indices[traits.indptr[row]:traits.indptr[row + 1]] if row < traits.shape[0] else ()
+            documents.append(' '.join([description] + [trait_names[column] for column in columns]))
+        return documents
+
+    def _als(self, model=None):
+        """
+        ImplicitALS configured from RECOMMENDATION_ALS_*, optionally bound to
+        a model's trained item factors
+        """
+        config = current_app.config
+        als = ImplicitALS(
+            factors=config.get('RECOMMENDATION_ALS_FACTORS', 32),
+            regularization=config.get('RECOMMENDATION_ALS_REGULARIZATION', 0.1),
+            alpha=config.get('RECOMMENDATION_ALS_ALPHA', 20.0),
+            iterations=config.get('RECOMMENDATION_ALS_ITERATIONS', 10)
+        )
+        if model is not None:
+            als.factors = model.item_factors.shape[1]
+            als.user_factors, als.item_factors = model.user_factors, model.item_factors
+        return als
+
     def _load_wine_data(self):
         """
         Load comprehensive wine data
+
+        Numeric attributes, type and region come from the shared wine
+        feature store (refreshed incrementally first, so review statistics
+        are not re-aggregated on every build); only the text columns are
+        read from the database, with a single query.
         """
-        wines = Wine.query.all()
-        
-        self.wine_df = pd.DataFrame([
-            {
-                'id': wine.id,
-                'name': wine.name,
-                'type': wine.type,
-                'varietal': wine.varietal.name if wine.varietal else 'Unknown',
-                'region': wine.region.name if wine.region else 'Unknown',
-                'description': wine.description or '',
-                'price': wine.price,
-                'alcohol_percentage': wine.alcohol_percentage,
-                'avg_rating': self._calculate_average_rating(wine),
-                'total_reviews': WineReview.query.filter_by(wine_id=wine.id).count()
-            } for wine in wines
-        ])
+        features = wine_feature_store.refresh()
+        rows = db.session.query(
+            Wine.id,
+            Wine.name,
+            WineVarietal.name.label('varietal'),
+            Wine.description
+        ).outerjoin(WineVarietal, Wine.varietal_id == WineVarietal.id)\
+         .order_by(Wine.id)\
+         .all()
+
+        text = pd.DataFrame(rows, columns=['id', 'name', 'varietal', 'description'])
+        positions = features.index_of(text['id'].to_numpy(dtype=np.int64))
+        known = positions >= 0
+
+        def numeric(feature):
+            values = features.column(feature)[np.maximum(positions, 0)].astype(np.float64)
+            values[~known] = np.nan
+            return values
+
+        wine_df = pd.DataFrame({
+            'id': text['id'].to_numpy(dtype=np.int64),
+            'name': text['name'],
+            'type': features.decode('type', positions),
+            'varietal': text['varietal'].fillna('Unknown'),
+            'region': pd.Series(features.decode('region', positions)).fillna('Unknown'),
+            'description': text['description'].fillna(''),
+            'price': numeric('price'),
+            'alcohol_percentage': numeric('alcohol_percentage'),
+            'avg_rating': np.round(np.nan_to_num(numeric('avg_rating')), 2),
+            'total_reviews': np.nan_to_num(numeric('review_count')).astype(np.int64)
+        }, columns=WINE_COLUMNS)
+        wine_df.index = pd.Index(wine_df['id'].values)
+        return wine_df
+
+    def _review_stats_until(self, wine_df, until):
+        """
+        Copy of ``wine_df`` whose avg_rating and total_reviews only count
+        reviews created before ``until``
+        """
+        rows = db.session.query(WineReview.wine_id, func.avg(WineReview.rating), func.count(WineReview.id))\
+            .filter(WineReview.created_at < until)\
+            .group_by(WineReview.wine_id)\
+            .all()
+        avg_ratings = {wine_id: avg_rating for wine_id, avg_rating, _ in rows}
+        counts = {wine_id: count for wine_id, _, count in rows}
+        wine_df = wine_df.copy()
+        wine_df['avg_rating'] = wine_df['id'].map(avg_ratings).fillna(0).astype(float).round(2)
+        wine_df['total_reviews'] = wine_df['id'].map(counts).fillna(0).astype(np.int64)
+        return wine_df
+
+    def _query_wine_frame(self, *filters):
+        """
+        Query wines (optionally filtered) into a DataFrame indexed by wine id
+        """
+        query = db.session.query(
+            Wine.id,
+            Wine.name,
+            Wine.type,
+            WineVarietal.name.label('varietal'),
+            WineRegion.name.label('region'),
+            Wine.description,
+            Wine.price,
+            Wine.alcohol_percentage,
+            WineStats.avg_rating,
+            WineStats.rating_count.label('total_reviews')
+        ).outerjoin(WineVarietal, Wine.varietal_id == WineVarietal.id)\
+         .outerjoin(WineRegion, Wine.region_id == WineRegion.id)\
+         .outerjoin(WineStats, WineStats.wine_id == Wine.id)
+
+        if filters:
+            query = query.filter(*filters)
+
+        rows = query.order_by(Wine.id).all()
+
+        wine_df = pd.DataFrame(rows, columns=WINE_COLUMNS)
+        wine_df['varietal'] = wine_df['varietal'].fillna('Unknown')
+        wine_df['region'] = wine_df['region'].fillna('Unknown')
+        wine_df['description'] = wine_df['description'].fillna('')
+        wine_df['avg_rating'] = wine_df['avg_rating'].fillna(0).astype(float).round(2)
+        wine_df['total_reviews'] = wine_df['total_reviews'].fillna(0).astype(int)
+        wine_df.index = pd.Index(wine_df['id'].values)
+        return wine_df
 
     def _calculate_average_rating(self, wine):
         """
-        Calculate average rating for a wine
-        """
-        avg_rating = db.session.query(func.avg(WineReview.rating))\
-            .filter(WineReview.wine_id == wine.id)\
-            .scalar() or 0
-        return round(avg_rating, 2)
-
-    def _create_interaction_matrix(self):
-        """
-        Create user-wine interaction matrix
-        """
-        interactions = UserWineInteraction.query.all()
-        
-        # Create interaction matrix
-        user_ids = sorted(set(interaction.user_id for interaction in interactions))
-        wine_ids = sorted(set(interaction.wine_id for interaction in interactions))
-        
-        interaction_matrix = np.zeros((len(user_ids), len(wine_ids)))
-        
-        user_id_to_index = {user_id: idx for idx, user_id in enumerate(user_ids)}
-        wine_id_to_index = {wine_id: idx for idx, wine_id in enumerate(wine_ids)}
-        
-        for interaction in interactions:
-            user_idx = user_id_to_index[interaction.user_id]
-            wine_idx = wine_id_to_index[interaction.wine_id]
-            interaction_matrix[user_idx, wine_idx] = interaction.interaction_weight
+        Average rating of a wine, from its stats row
+        """
+        return round(wine.avg_rating, 2)
 
-        self.interaction_matrix = interaction_matrix
-        self.user_ids = user_ids
-        self.wine_ids = wine_ids
+    def _create_interaction_matrix(self, wine_df, *filters):
+        """
+        Create sparse user-wine interaction matrix
+
+        Interactions are read with a single columnar query and stored as a
+        CSR matrix (user rows); the model keeps a CSC copy for wine column
+        access. Columns cover every catalog wine, including ones nobody has
+        interacted with yet.
+
+        :return: (CSR matrix, row user ids, column wine ids)
+        """
+        user_col, wine_col, weight_col = self._query_interaction_columns(*filters)
+
+        catalog_wine_ids = wine_df['id'].values if wine_df is not None and not wine_df.empty else None
+        interaction_matrix, user_ids, wine_ids = RecommendationHelper.build_interaction_matrix(
+            user_col, wine_col, weight_col, catalog_wine_ids=catalog_wine_ids
+        )
+        return interaction_matrix, user_ids.tolist(), wine_ids.tolist()
+
+    def _create_wine_trait_matrix(self, wine_ids, trait_ids=None):
+        """
+        Create the sparse wine x trait incidence matrix
+
+        The association table is read with one query; rows follow
+        ``wine_ids`` and columns follow ``trait_ids`` (all traits by default).
+
+        :return: (CSR matrix, column trait ids)
+        """
+        if trait_ids is None:
+            trait_ids = [row[0] for row in db.session.query(WineTrait.id).order_by(WineTrait.id).all()]
+        wine_col, trait_col = self._query_wine_trait_columns()
+        matrix = RecommendationHelper.build_incidence_matrix(wine_col, trait_col, wine_ids, trait_ids)
+        return matrix, list(trait_ids)
+
+    def _query_wine_trait_columns(self, *filters):
+        """
+        Query (wine_id, trait_id) columns of the wine/trait association table
+        """
+        query = db.session.query(wine_traits.c.wine_id, wine_traits.c.trait_id)
+        if filters:
+            query = query.filter(*filters)
+        rows = query.all()
+        return tuple(zip(*rows)) if rows else ((), ())
+
+    def _query_user_trait_columns(self, *filters):
+        """
+        Query (user_id, trait_id) columns of the user preference table
+        """
+        query = db.session.query(user_traits.c.user_id, user_traits.c.trait_id)
+        if filters:
+            query = query.filter(*filters)
+        rows = query.all()
+        return tuple(zip(*rows)) if rows else ((), ())
+
+    def _query_interaction_columns(self, *filters):
+        """
+        Query (user_id, wine_id, weight) columns of UserWineInteraction
+        """
+        query = db.session.query(
+            UserWineInteraction.user_id,
+            UserWineInteraction.wine_id,
+            UserWineInteraction.interaction_weight
+        )
+        if filters:
+            query = query.filter(*filters)
+        rows = query.order_by(UserWineInteraction.id).all()
+
+        user_col, wine_col, weight_col = zip(*rows) if rows else ((), (), ())
+        weight_col = [1.0 if weight is None else weight for weight in weight_col]
+        return user_col, wine_col, weight_col
+
+    def apply_updates(self, since=None):
+        """
+        Incrementally update the model with changes since a watermark
+
+        Only wines updated or reviewed after ``since`` and interactions
+        written after it are read, so a periodic refresh costs O(delta)
+        database work instead of a full reload. The user and wine index maps
+        grow as new ids appear. The patched model is published like a full
+        rebuild.
+
+        :param since: Watermark timestamp, defaults to the last build/update
+        :return: Summary of the published model, or None if a build was running
+        """
+        model = self.rebuild(incremental=True, since=since)
+        return model.to_dict() if model else None
+
+    def _build_incremental_model(self, current, since=None):
+        """
+        Build a new model by applying database changes on top of ``current``
+
+        The current model is never mutated: the matrix merge produces new
+        arrays, and wine_df and the index maps are copied before patching.
+        """
+        since = since or current.watermark
+        watermark = datetime.utcnow()
+
+        # Stats rows move on every review insert, edit and delete
+        reviewed_wine_ids = db.session.query(WineStats.wine_id)\
+            .filter(WineStats.updated_at > since)
+        changed_wines = self._query_wine_frame(
+            or_(Wine.updated_at > since, Wine.id.in_(reviewed_wine_ids))
+        )
+        user_col, wine_col, weight_col = self._query_interaction_columns(
+            UserWineInteraction.updated_at > since
+        )
+
+        model = current.copy()
+        model.watermark = watermark
+
+        self._apply_wine_updates(model, changed_wines)
+        self._apply_interaction_updates(model, user_col, wine_col, weight_col)
+        user_trait_columns = self._query_user_trait_columns()
+        self._grow_trait_index(model, user_trait_columns[1])
+        self._apply_trait_updates(model, changed_wines['id'].tolist())
+        self._apply_user_trait_updates(model, *user_trait_columns)
+        self._apply_content_updates(model, changed_wines['id'].tolist())
+        model.compute_popular_segments(
+            wine_indices=[model.wine_id_to_index[wine_id] for wine_id in set(changed_wines['id'].tolist()) | set(wine_col)]
+        )
+
+        self.logger.info(
+            f"Recommendation model delta: {len(changed_wines)} wines, "
+            f"{len(user_col)} interactions"
+        )
+        return model
+
+    def _apply_wine_updates(self, model, changed_wines):
+        """
+        Patch changed wine_df rows and append new wines
+        """
+        if changed_wines.empty:
+            return
+
+        wine_df = model.wine_df.copy()
+        existing = changed_wines.index.isin(wine_df.index)
+        if existing.any():
+            wine_df.loc[changed_wines.index[existing], WINE_COLUMNS] = changed_wines.loc[existing, WINE_COLUMNS]
+        if (~existing).any():
+            wine_df = pd.concat([wine_df, changed_wines.loc[~existing]])
+        model.wine_df = wine_df
+
+        self._grow_wine_index(model, changed_wines['id'].tolist())
+
+    def _apply_interaction_updates(self, model, user_col, wine_col, weight_col):
+        """
+        Patch interaction weights into the sparse matrix, growing it as needed
+        """
+        for user_id in user_col:
+            if user_id not in model.user_id_to_index:
+                model.user_id_to_index[user_id] = len(model.user_ids)
+                model.user_ids.append(user_id)
+        self._grow_wine_index(model, wine_col)
+
+        shape = (len(model.user_ids), len(model.wine_ids))
+        if not user_col and shape == model.interaction_matrix.shape:
+            return
+
+        rows = [model.user_id_to_index[user_id] for user_id in user_col]
+        cols = [model.wine_id_to_index[wine_id] for wine_id in wine_col]
+        model.interaction_matrix = RecommendationHelper.update_interaction_matrix(
+            model.interaction_matrix,
+            rows,
+            cols,
+            weight_col,
+            shape=shape
+        )
+        model.interaction_matrix_csc = model.interaction_matrix.tocsc()
+
+    def _apply_trait_updates(self, model, changed_wine_ids):
+        """
+        Re-read the traits of changed wines and grow the trait matrix
+
+        The precomputed similar-wines table is carried over unchanged; new
+        wines get neighbours with the next full build.
+        """
+        matrix = model.wine_trait_matrix
+        if matrix is None:
+            matrix = sparse.csr_matrix((0, len(model.trait_ids)), dtype=np.float32)
+        if not changed_wine_ids and matrix.shape == (len(model.wine_ids), len(model.trait_ids)):
+            return
+
+        wine_col, trait_col = self._query_wine_trait_columns(
+            wine_traits.c.wine_id.in_(changed_wine_ids)
+        ) if changed_wine_ids else ((), ())
+        self._grow_trait_index(model, trait_col)
+
+        n_wines, n_traits = len(model.wine_ids), len(model.trait_ids)
+        grown = sparse.csr_matrix(
+            (matrix.data, matrix.indices,
+             np.concatenate([matrix.indptr, np.full(n_wines - matrix.shape[0], matrix.indptr[-1])])),
+            shape=(n_wines, n_traits)
+        )
+        keep = np.ones(n_wines, dtype=np.float32)
+        keep[RecommendationHelper.index_of(model.wine_ids, changed_wine_ids)] = 0
+        delta = RecommendationHelper.build_incidence_matrix(wine_col, trait_col, model.wine_ids, model.trait_ids)
+        model.wine_trait_matrix = sparse.csr_matrix(sparse.diags(keep).dot(grown) + delta, dtype=np.float32)
+        model.trait_bitsets = RecommendationModel._pack_trait_bitsets(model.wine_trait_matrix)
+
+    def _apply_content_updates(self, model, changed_wine_ids):
+        """
+        Re-vectorize changed and new wines with the fitted vocabulary
+
+        The vocabulary and idf weights are kept until the next full build,
+        so terms that first appear in new descriptions are ignored until then.
+        """
+        if model.content_matrix is None:
+            return
+        n_wines = len(model.wine_ids)
+        if not changed_wine_ids and model.content_matrix.shape[0] == n_wines:
+            return
+
+        wine_ids = list(dict.fromkeys(
+            list(changed_wine_ids) + model.wine_ids[model.content_matrix.shape[0]:]
+        ))
+        model.content_matrix = RecommendationHelper.replace_rows(
+            model.content_matrix,
+            RecommendationHelper.index_of(model.wine_ids, wine_ids),
+            model.content_vectorizer.transform(self._wine_documents(model, wine_ids)),
+            n_rows=n_wines
+        )
+
+    def _apply_user_trait_updates(self, model, user_col, trait_col):
+        """
+        Rebuild the user x trait matrix for the (possibly grown) user index
+
+        Preferences have no change timestamp and the table is small (a few
+        traits per user), so it is re-read in full.
+        """
+        model.user_trait_matrix = RecommendationHelper.build_incidence_matrix(
+            user_col, trait_col, model.user_ids, model.trait_ids
+        )
+
+    def _grow_trait_index(self, model, trait_ids):
+        """
+        Register new trait ids as trait matrix columns
+        """
+        for trait_id in trait_ids:
+            if trait_id not in model.trait_id_to_index:
+                model.trait_id_to_index[trait_id] = len(model.trait_ids)
+                model.trait_ids.append(trait_id)
+
+    def _grow_wine_index(self, model, wine_ids):
+        """
+        Register new wine ids as interaction matrix columns
+        """
+        for wine_id in wine_ids:
+            if wine_id not in model.wine_id_to_index:
+                model.wine_id_to_index[wine_id] = len(model.wine_ids)
+                model.wine_ids.append(wine_id)
+
+    def get_similar_wines(self, wine_id, limit=6):
+        """
+        Get the precomputed most similar wines to ``wine_id``
+
+        Served from the model's top-k table and wine_df, without touching
+        the database.
+
+        :return: List of wine summaries with a ``similarity`` score
+        """
+        model = self.model
+        return self._wine_summaries(model, model.similar_wine_ids(wine_id, limit=limit))
+
+    def get_content_similar_wines(self, wine_id, limit=6):
+        """
+        Get wines described like ``wine_id`` (TF-IDF cosine over description
+        and trait names)
+
+        :return: List of wine summaries with a ``similarity`` score
+        """
+        model = self.model
+        idx = model.wine_id_to_index.get(wine_id)
+        if model.content_matrix is None or idx is None or idx >= model.content_matrix.shape[0]:
+            return []
+        scores = model.content_matrix.dot(model.content_matrix[idx].T).toarray().ravel()
+        scores[idx] = 0
+        return self._wine_summaries(model, self._top_scored(model, scores, limit))
+
+    def search_by_taste(self, text, limit=10):
+        """
+        Rank wines against a free-text taste query, e.g. "dry red with cherry"
+
+        :return: List of wine summaries with a ``similarity`` score
+        """
+        model = self.model
+        if model.content_matrix is None or not text:
+            return []
+        query = model.content_vectorizer.transform([text])
+        scores = model.content_matrix.dot(query.T).toarray().ravel()
+        return self._wine_summaries(model, self._top_scored(model, scores, limit))
+
+    def _top_scored(self, model, scores, limit):
+        """
+        (wine_id, score) pairs of the ``limit`` best positive scores
+        """
+        candidates = np.flatnonzero(scores > 0)
+        ranked = candidates[RecommendationHelper.top_k(scores[candidates], limit)]
+        return [(model.wine_ids[idx], float(scores[idx])) for idx in ranked]
+
+    def _wine_summaries(self, model, scored, score_key='similarity'):
+        """
+        Wine summaries from wine_df for (wine_id, score) pairs, in order
+        """
+        scored = [(wine_id, score) for wine_id, score in scored if wine_id in model.wine_df.index]
+        if not scored:
+            return []
+        rows = model.wine_df.loc[[wine_id for wine_id, _ in scored]]
+        return [
+            {
+                'id': int(row['id']),
+                'name': row['name'],
+                'type': row['type'],
+                'varietal': row['varietal'],
+                'region': row['region'],
+                'price': float(row['price']) if pd.notna(row['price']) else None,
+                'avg_rating': float(row['avg_rating']),
+                score_key: round(score, 4)
+            }
+            for (_, row), (_, score) in zip(rows.iterrows(), scored)
+        ]
 
     def get_personalized_recommendations(self, user_id, limit=10):
         """
         Get personalized wine recommendations for a user based on their preferences and interactions
+
+        With RECOMMENDATION_MODE = 'als', users with interactions are scored
+        from the implicit ALS factors (see ``_rank_by_factors``); with
+        'content', by TF-IDF similarity to the wines they liked (see
+        ``_rank_by_content``). Otherwise, and for users without interactions,
+        every wine is scored by the number of the user's preferred traits it
+        has, using the model's packed trait bitsets (AND + popcount over the
+        whole catalog), with the average rating as a tie-breaker. Users
+        with no preferred traits get the precomputed popularity ranking of
+        their preferred wine types, regions and price range (or of the whole
+        catalog), see ``_rank_by_popularity``. Wines the user has already
+        interacted with are excluded and the top ``limit`` are selected with
+        argpartition; only those are loaded from the database.
+        """
+        wine_ids = self.get_personalized_wine_ids(user_id, limit)
+        wines = {wine.id: wine for wine in Wine.query.filter(Wine.id.in_(wine_ids)).all()} if wine_ids else {}
+        return [wines[wine_id] for wine_id in wine_ids if wine_id in wines]
+
+    def get_personalized_wine_ids(self, user_id, limit=10):
+        """
+        Ids of the wines ``get_personalized_recommendations`` would return
         """
         user = User.query.get(user_id)
-        if not user:
+        model = self.model
+        if not user or model.trait_bitsets is None:
             return []
-        
-        # Get user's preferred traits
-        user_traits = set(user.preferred_traits)
-        
-        # Base query for wines
-        query = Wine.query
-        
-        if user_traits:
-            # Join with wine traits and count matches with user preferences
-            query = query.outerjoin(wine_traits)\
-                .outerjoin(WineTrait)\
-                .group_by(Wine.id)\
-                .order_by(
-                    func.count(case([(WineTrait.id.in_([t.id for t in user_traits]), 1)], else_=0)).desc()
-                )
-        
-        # Get wines the user has already interacted with
-        interacted_wines = db.session.query(UserWineInteraction.wine_id)\
-            .filter_by(user_id=user_id).all()
-        interacted_wine_ids = [w[0] for w in interacted_wines]
-        
-        # Exclude wines the user has already interacted with
-        if interacted_wine_ids:
-            query = query.filter(~Wine.id.in_(interacted_wine_ids))
-        
-        return query.limit(limit).all()
+
+        ranked = None
+        mode = current_app.config.get('RECOMMENDATION_MODE')
+        if mode == 'als':
+            ranked = self._rank_by_factors(model, user_id, limit)
+        elif mode == 'content':
+            ranked = self._rank_by_content(model, user_id, limit)
+        trait_ids = [trait.id for trait in user.preferred_traits]
+        if ranked is None and not trait_ids:
+            ranked = self._rank_by_popularity(model, self._user_segments(model, user_id), user_id, limit)
+        if ranked is None:
+            ranked = self._rank_by_traits(model, trait_ids, user_id, limit)
+        return [model.wine_ids[idx] for idx in ranked]
+
+    def get_popular_wine_ids(self, limit=10, segments=None):
+        """
+        Most popular wine ids, optionally within segments
+
+        :param segments: (segment, value) pairs such as ('type', 'Red'),
+                         ('region', 'Napa') or ('price_band', '20-50')
+        """
+        model = self.model
+        return [model.wine_ids[idx] for idx in self._rank_by_popularity(model, segments, limit=limit)]
+
+    def _rank_by_popularity(self, model, segments=None, user_id=None, limit=10):
+        """
+        Rank wine indices from the precomputed popularity tables
+
+        Candidates are the union of the segments' tables (each at most
+        ``popular_limit`` wines), topped up from the catalog-wide table, so
+        the cost does not depend on the catalog size.
+
+        :return: Wine indices, best first
+        """
+        tables = model.popular_segments
+        overall = tables.get(('all', None), np.empty(0, dtype=np.int64))
+        candidates = [tables[segment] for segment in segments or () if segment in tables] or [overall]
+        candidates = np.unique(np.concatenate(candidates))
+        excluded = model.interacted_wine_indices(user_id)
+        candidates = candidates[~np.isin(candidates, excluded)]
+
+        scores = model.popularity_scores()
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')][:limit]
+        if len(ranked) < limit:
+            extra = overall[~np.isin(overall, np.concatenate([ranked, excluded]))]
+            ranked = np.concatenate([ranked, extra[:limit - len(ranked)]])
+        return ranked
+
+    def _user_segments(self, model, user_id):
+        """
+        Popularity segments matching a user's UserPreference: preferred wine
+        types, regions and the price bands overlapping the preferred range
+        """
+        preference = UserPreference.query.filter_by(user_id=user_id).first()
+        if not preference:
+            return []
+        segments = [('type', wine_type) for wine_type in preference.preferred_wine_types or []]
+        segments += [('region', region) for region in preference.preferred_regions or []]
+
+        low, high = self._price_bounds(preference.preferred_price_range)
+        if low is not None or high is not None:
+            low = float(low) if low is not None else 0.0
+            high = float(high) if high is not None else np.inf
+            segments += [
+                ('price_band', name) for name, band_low, band_high in model.price_band_names()
+                if band_low < high and band_high > low
+            ]
+        return segments
+
+    def recommend_batch(self, user_ids, k=10, max_block_elements=2 ** 24):
+        """
+        Recommend wines for many users, streaming results as they are scored
+
+        Users are scored in blocks against the model with matrix products
+        instead of one ``get_personalized_recommendations`` call per user:
+        per block, one query loads the users' preferred traits, the block's
+        user x trait matrix is multiplied with the wine x trait matrix (or,
+        depending on the mode, the ALS user factors with the item factors or
+        the content profiles with the TF-IDF matrix), interacted wines are
+        masked and argpartition picks each row's top k. Scores match the
+        single-user path; blocks are always scored exactly, even when the
+        single-user ALS path uses the ANN index, and users without preferred
+        traits get the catalog-wide popularity ranking rather than their
+        segments'. Block size is bounded by
+        ``max_block_elements`` dense scores.
+
+        :param user_ids: Iterable of user ids
+        :param k: Recommendations per user
+        :return: Generator of (user_id, [wine_id, ...]) for existing users
+        """
+        model = self.model
+        if model.wine_trait_matrix is None:
+            return
+        user_ids = list(user_ids)
+        block_size = max(1, max_block_elements // max(len(model.wine_ids), 1))
+
+        for start in range(0, len(user_ids), block_size):
+            block = user_ids[start:start + block_size]
+            existing = {row[0] for row in db.session.query(User.id).filter(User.id.in_(block)).all()}
+            block = [user_id for user_id in block if user_id in existing]
+            if not block:
+                continue
+
+            scores = self._score_batch(model, block)
+            top = RecommendationHelper.top_k(scores, k)
+            for position, user_id in enumerate(block):
+                ranked = top[position][np.isfinite(scores[position, top[position]])]
+                yield user_id, [model.wine_ids[idx] for idx in ranked]
+
+    def _score_batch(self, model, user_ids):
+        """
+        Dense (len(user_ids), n_wines) float32 scores for a block of users
+        """
+        user_col, trait_col = self._query_user_trait_columns(user_traits.c.user_id.in_(user_ids))
+        preferences = RecommendationHelper.build_incidence_matrix(user_col, trait_col, user_ids, model.trait_ids)
+        scores = preferences.dot(model.wine_trait_matrix.T).toarray().astype(np.float32)
+        scores += model.rating_tiebreak()
+        # Users without preferred traits: catalog-wide popularity
+        scores[np.diff(preferences.indptr) == 0] = model.popularity_scores()
+
+        if current_app.config.get('RECOMMENDATION_MODE') == 'als' and model.item_factors is not None:
+            # Users with interactions are scored from their ALS factors
+            als = self._als(model)
+            n_items = len(model.item_factors)
+            known = [
+                (position, model.user_id_to_index[user_id]) for position, user_id in enumerate(user_ids)
+                if user_id in model.user_id_to_index
+            ]
+            if known:
+                positions = [position for position, _ in known]
+                vectors = np.stack([
+                    model.user_factors[row] if row < len(model.user_factors)
+                    else als.fold_in(model.interaction_matrix[row, :n_items])
+                    for _, row in known
+                ])
+                scores[positions, :n_items] = vectors.dot(model.item_factors.T)
+                scores[positions, n_items:] = -np.inf
+
+        if current_app.config.get('RECOMMENDATION_MODE') == 'content' and model.content_matrix is not None:
+            # Users with positive interactions are scored by taste profile
+            profiles = self._content_profiles(model, user_ids)
+            positions = np.flatnonzero(np.diff(profiles.indptr))
+            if len(positions):
+                n_content = model.content_matrix.shape[0]
+                similarities = profiles[positions].dot(model.content_matrix.T).toarray()
+                similarities[similarities <= 0] = -np.inf
+                scores[positions, :n_content] = similarities
+                scores[positions, n_content:] = -np.inf
+
+        for position, user_id in enumerate(user_ids):
+            scores[position, model.interacted_wine_indices(user_id)] = -np.inf
+        return scores
+
+    def _content_profiles(self, model, user_ids):
+        """
+        TF-IDF taste profiles: each user's positively weighted interactions
+        times the content matrix (rows of users without any are empty)
+        """
+        rows = np.array([model.user_id_to_index.get(user_id, -1) for user_id in user_ids], dtype=np.int64)
+        known = np.flatnonzero(rows >= 0)
+        selector = sparse.csr_matrix(
+            (np.ones(len(known), dtype=np.float32), (known, rows[known])),
+            shape=(len(user_ids), model.interaction_matrix.shape[0])
+        )
+        interactions = selector.dot(model.interaction_matrix)[:, :model.content_matrix.shape[0]]
+        positive = sparse.csr_matrix(interactions.multiply(interactions > 0), dtype=np.float32)
+        return positive.dot(model.content_matrix)
+
+    def _rank_by_content(self, model, user_id, limit=10):
+        """
+        Rank wine indices by TF-IDF similarity to the user's taste profile
+
+        :return: Wine indices best first, or None without positive interactions
+        """
+        if model.content_matrix is None:
+            return None
+        profile = self._content_profiles(model, [user_id])
+        if not profile.nnz:
+            return None
+        scores = model.content_matrix.dot(profile.T).toarray().ravel()
+        scores[model.interacted_wine_indices(user_id)] = 0
+        candidates = np.flatnonzero(scores > 0)
+        return candidates[RecommendationHelper.top_k(scores[candidates], limit)]
+
+    def _rank_by_factors(self, model, user_id, limit=10):
+        """
+        Rank wine indices by ALS score: one item-factor matrix-vector product
+
+        Users added by incremental updates since the last full build are
+        folded in against the trained item factors; wines added since then
+        have no factors and are not ranked until the next build. With an
+        ANN index only the closest RECOMMENDATION_ANN_PROBES lists are
+        scanned instead of every item.
+
+        :return: Wine indices best first, or None without factors for the user
+        """
+        row = model.user_id_to_index.get(user_id)
+        if model.item_factors is None or row is None:
+            return None
+
+        als = self._als(model)
+        n_items = len(model.item_factors)
+        if row < len(model.user_factors):
+            user_vector = model.user_factors[row]
+        else:
+            user_vector = als.fold_in(model.interaction_matrix[row, :n_items])
+
+        interacted = model.interacted_wine_indices(user_id)
+        if model.ann_index is not None:
+            ranked, _ = model.ann_index.query(
+                user_vector, limit, n_probe=current_app.config.get('RECOMMENDATION_ANN_PROBES'), exclude=interacted
+            )
+        else:
+            ranked, _ = als.recommend(user_vector, exclude=interacted[interacted < n_items], k=limit)
+        return ranked
+
+    def _rank_by_traits(self, model, trait_ids, user_id=None, limit=10):
+        """
+        Rank wine indices by preferred-trait matches
+
+        :return: Wine indices, best first
+        """
+        scores = model.trait_match_counts(trait_ids) + model.rating_tiebreak()
+        if user_id is not None:
+            scores[model.interacted_wine_indices(user_id)] = -np.inf
+
+        ranked = RecommendationHelper.top_k(scores, limit)
+        return ranked[np.isfinite(scores[ranked])]
 
     def get_similar_user_recommendations(self, user_id, limit=6):
         """
         Get recommendations based on similar users' preferences
+
+        The user's preferred traits are compared with every user row of the
+        model's user x trait matrix in one sparse product (Jaccard or cosine,
+        per RECOMMENDATION_NEIGHBOUR_METRIC). The
+        RECOMMENDATION_NEIGHBOURHOOD_SIZE most similar users are picked with
+        argpartition and their positive interactions are blended, weighted
+        by similarity. Wines the user already interacted with are excluded.
         """
         user = User.query.get(user_id)
-        if not user:
+        model = self.model
+        if not user or model.user_trait_matrix is None:
+            return []
+
+        ranked = self._rank_by_neighbours(
+            model,
+            [trait.id for trait in user.preferred_traits],
+            user_id,
+            limit,
+            neighbourhood_size=current_app.config.get('RECOMMENDATION_NEIGHBOURHOOD_SIZE', 5),
+            metric=current_app.config.get('RECOMMENDATION_NEIGHBOUR_METRIC', 'jaccard')
+        )
+        wine_ids = [model.wine_ids[idx] for idx in ranked]
+        wines = {wine.id: wine for wine in Wine.query.filter(Wine.id.in_(wine_ids)).all()}
+        return [wines[wine_id] for wine_id in wine_ids if wine_id in wines]
+
+    def _rank_by_neighbours(self, model, trait_ids, user_id=None, limit=6, neighbourhood_size=5, metric='jaccard'):
+        """
+        Rank wine indices by similarity-weighted neighbour interactions
+
+        :return: Wine indices, best first
+        """
+        scores = self._neighbour_scores(model, trait_ids, user_id, neighbourhood_size, metric)
+        if user_id is not None:
+            scores[model.interacted_wine_indices(user_id)] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        return candidates[RecommendationHelper.top_k(scores[candidates], limit)]
+
+    def _neighbour_scores(self, model, trait_ids, user_id=None, neighbourhood_size=5, metric='jaccard'):
+        """
+        Sum of the positive interactions of the ``neighbourhood_size`` users
+        with the most similar trait preferences, weighted by similarity
+
+        :return: float array over the interaction matrix's wine columns
+        """
+        query = RecommendationHelper.build_incidence_matrix(
+            [0] * len(trait_ids), trait_ids, [0], model.trait_ids
+        )
+        if metric == 'cosine':
+            similarities = RecommendationHelper.cosine_similarities(model.user_trait_matrix, query)
+        else:
+            similarities = RecommendationHelper.jaccard_similarities(model.user_trait_matrix, query)
+        own_row = model.user_id_to_index.get(user_id)
+        if own_row is not None:
+            similarities[own_row] = 0
+
+        # Most users share no trait with the query; selecting among the
+        # matching ones also keeps argpartition away from mass ties at 0
+        candidates = np.flatnonzero(similarities > 0)
+        neighbours = candidates[RecommendationHelper.top_k(similarities[candidates], neighbourhood_size)]
+
+        interactions = model.interaction_matrix[neighbours]
+        positive = interactions.multiply(interactions > 0)
+        return np.asarray(positive.T.dot(similarities[neighbours]), dtype=np.float32).ravel()
+
+    def get_hybrid_recommendations(self, user_id, limit=10, weights=None):
+        """
+        Recommend wines by blending several signals with per-request weights
+
+        Every signal is a float array over the whole catalog: preferred-trait
+        matches, a collaborative score (ALS factors when trained, otherwise
+        the similar-user neighbourhood), popularity (log interaction count),
+        average rating and fit to the user's preferred price range. They are
+        normalized and blended in one pass by
+        ``RecommendationHelper.blend_scores``; wines the user interacted
+        with are masked out.
+
+        :param user_id: User id
+        :param limit: Number of wines
+        :param weights: Signal name -> weight, overriding
+                        RECOMMENDATION_HYBRID_WEIGHTS per request
+        :return: List of wine summaries with a ``score``
+        """
+        user = User.query.get(user_id)
+        model = self.model
+        if not user or model.trait_bitsets is None:
             return []
-        
-        # Get users with similar trait preferences
-        similar_users = User.query\
-            .join(user_traits)\
-            .filter(User.id != user_id)\
-            .filter(WineTrait.id.in_([t.id for t in user.preferred_traits]))\
-            .group_by(User.id)\
-            .order_by(func.count(WineTrait.id).desc())\
-            .limit(5)\
-            .all()
-        
-        # Get wines that similar users have interacted with positively
-        similar_user_ids = [u.id for u in similar_users]
-        recommended_wines = Wine.query\
-            .join(UserWineInteraction)\
-            .filter(
-                UserWineInteraction.user_id.in_(similar_user_ids),
-                UserWineInteraction.interaction_weight > 0
-            )\
-            .group_by(Wine.id)\
-            .order_by(func.avg(UserWineInteraction.interaction_weight).desc())\
-            .limit(limit)\
-            .all()
-        
-        return recommended_wines
+
+        preference = UserPreference.query.filter_by(user_id=user_id).first()
+        ranked, scores = self._rank_hybrid(
+            model, [trait.id for trait in user.preferred_traits], user_id,
+            price_range=preference.preferred_price_range if preference else None,
+            limit=limit, weights=weights
+        )
+        return self._wine_summaries(
+            model, [(model.wine_ids[idx], float(score)) for idx, score in zip(ranked, scores)], score_key='score'
+        )
+
+    def _rank_hybrid(self, model, trait_ids, user_id=None, price_range=None, limit=10, weights=None):
+        """
+        Rank wine indices by blended hybrid score
+
+        :return: (wine indices, blended scores), best first
+        """
+        blend = dict(current_app.config.get('RECOMMENDATION_HYBRID_WEIGHTS', {}))
+        blend.update(weights or {})
+        signals = self._hybrid_signals(
+            model, trait_ids, user_id, price_range, [name for name, weight in blend.items() if weight]
+        )
+
+        exclude = np.zeros(len(model.wine_ids), dtype=bool)
+        exclude[model.interacted_wine_indices(user_id)] = True
+        return RecommendationHelper.blend_scores(signals, blend, exclude=exclude, k=limit)
+
+    def _hybrid_signals(self, model, trait_ids, user_id, price_range, names):
+        """
+        The requested hybrid signals as float32 arrays aligned with wine_ids
+        """
+        n_wines = len(model.wine_ids)
+
+        def aligned(values):
+            # Wines added since the last full build may be missing at the end
+            padded = np.zeros(n_wines, dtype=np.float32)
+            padded[:len(values)] = values
+            return padded
+
+        signals = {}
+        if 'traits' in names:
+            signals['traits'] = model.trait_match_counts(trait_ids).astype(np.float32)
+        if 'collaborative' in names:
+            if model.item_factors is not None and user_id in model.user_id_to_index:
+                row = model.user_id_to_index[user_id]
+                user_vector = model.user_factors[row] if row < len(model.user_factors) \
+                    else self._als(model).fold_in(model.interaction_matrix[row, :len(model.item_factors)])
+                signals['collaborative'] = aligned(model.item_factors.dot(user_vector))
+            else:
+                signals['collaborative'] = aligned(self._neighbour_scores(
+                    model, trait_ids, user_id,
+                    neighbourhood_size=current_app.config.get('RECOMMENDATION_NEIGHBOURHOOD_SIZE', 5),
+                    metric=current_app.config.get('RECOMMENDATION_NEIGHBOUR_METRIC', 'jaccard')
+                ))
+        if 'popularity' in names:
+            signals['popularity'] = aligned(np.log1p(np.diff(model.interaction_matrix_csc.indptr)))
+        if 'rating' in names:
+            signals['rating'] = model.wine_column('avg_rating')
+        if 'price' in names:
+            signals['price'] = self._price_fit(model.wine_column('price'), price_range)
+        return signals
+
+    @staticmethod
+    def _price_bounds(price_range):
+        """
+        (low, high) of a UserPreference.preferred_price_range
+
+        :param price_range: {'min': x, 'max': y} or [min, max]; either bound may be missing
+        :return: Bounds, None where missing
+        """
+        if isinstance(price_range, dict):
+            return price_range.get('min'), price_range.get('max')
+        if isinstance(price_range, (list, tuple)) and len(price_range) == 2:
+            return tuple(price_range)
+        return None, None
+
+    @staticmethod
+    def _price_fit(prices, price_range):
+        """
+        1 for prices inside the preferred range, decaying with the distance
+        outside it relative to the range width; 0 without a range or price
+
+        :param price_range: See ``_price_bounds``
+        """
+        low, high = RecommendationEngine._price_bounds(price_range)
+        bounds = [float(bound) for bound in (low, high) if bound is not None]
+        if not bounds:
+            return np.zeros(len(prices), dtype=np.float32)
+        low = float(low) if low is not None else -np.inf
+        high = float(high) if high is not None else np.inf
+        # Open-ended or single-price ranges use the bound itself as the scale
+        width = high - low if len(bounds) == 2 and high > low else max(max(bounds), 1.0)
+        distance = np.maximum(low - prices, 0) + np.maximum(prices - high, 0)
+        fit = 1 / (1 + distance / np.float32(width))
+        fit[np.isnan(prices)] = 0
+        return fit.astype(np.float32)
 
 def create_recommendation_engine():
     """
@@ -183,8 +1648,16 @@ recommendation_engine = None
 def get_recommendation_engine():
     """
     Get or create recommendation engine instance
+
+    Never builds in the calling (request) thread: if no model has been
+    published yet, a background build is started and the engine is returned
+    immediately. After a failed build the next one waits for the retry
+    backoff (see ``RecommendationEngine.retry_due``).
     """
     global recommendation_engine
     if recommendation_engine is None:
-        recommendation_engine = create_recommendation_engine()
+        recommendation_engine = RecommendationEngine()
+    if not recommendation_engine.initialized and not recommendation_engine._build_lock.locked() \
+            and recommendation_engine.retry_due():
+        recommendation_engine.rebuild_async()
     return recommendation_engine
\ No newline at end of file
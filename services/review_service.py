@@ -1,7 +1,6 @@
 # services/review_service.py
-from models import WineReview, Wine
+from models import WineReview, Wine, WineStats
 from extensions import db
-from sqlalchemy import func
 
 class WineReviewService:
     @classmethod
@@ -15,9 +14,11 @@ class WineReviewService:
             wine_id=wine_id
         ).first()
 
+        # WineStats is adjusted in the same transaction by the flush listener
         if existing_review:
-            existing_review.rating = rating
-            existing_review.comment = comment
+            review = existing_review
+            review.rating = rating
+            review.comment = comment
         else:
             review = WineReview(
                 user_id=user_id,
@@ -49,14 +50,11 @@ class WineReviewService:
     @classmethod
     def calculate_wine_rating(cls, wine_id):
         """
-        Calculate average rating for a wine
+        Average rating and review count of a wine, from its stats row
         """
-        rating_data = db.session.query(
-            func.avg(WineReview.rating).label('avg_rating'),
-            func.count(WineReview.id).label('review_count')
-        ).filter_by(wine_id=wine_id).first()
+        stats = db.session.get(WineStats, wine_id)
 
         return {
-            'average_rating': rating_data.avg_rating or 0,
-            'review_count': rating_data.review_count or 0
+            'average_rating': stats.avg_rating if stats else 0,
+            'review_count': stats.rating_count if stats else 0
         }
\ No newline at end of file
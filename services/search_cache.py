@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from extensions import cache
+from services.local_search_service import local_search_service
+
+# Free-text parameters (compared lower-cased, whitespace collapsed)
+TEXT_PARAMS = ('q', 'query')
+# Multi-value filters, given as lists or comma-separated strings
+LIST_PARAMS = ('traits', 'type', 'region', 'grape_variety')
+PRICE_PARAMS = ('price_min', 'price_max', 'min_price', 'max_price')
+PAGE_DEFAULTS = {'page': 1, 'per_page': 20}
+
+
+def canonical_query(query_params):
+    """
+    Canonical form of search parameters, equal for equivalent requests
+
+    Text is lower-cased with collapsed whitespace, list filters are sorted
+    and de-duplicated, prices are floats rounded to cents, empty values
+    are dropped and page/per_page defaults are filled in.
+    """
+    canonical = dict(PAGE_DEFAULTS)
+    for key, value in query_params.items():
+        if value is None or value == '' or value == []:
+            continue
+        if key in TEXT_PARAMS:
+            value = ' '.join(str(value).lower().split())
+            if not value:
+                continue
+        elif key in LIST_PARAMS:
+            items = value.split(',') if isinstance(value, str) else value
+            value = sorted({str(item).strip() for item in items if str(item).strip()})
+            if not value:
+                continue
+        elif key in PRICE_PARAMS:
+            value = round(float(value), 2)
+        elif key in PAGE_DEFAULTS:
+            value = int(value)
+        canonical[key] = value
+    return canonical
+
+
+class SearchCache:
+    """
+    Shared cache of advanced_search results
+
+    Entries live in the application cache under a hash of the canonical
+    query parameters and the current index version, so identical searches
+    (the facet-heavy first pages that dominate traffic) skip the search
+    backend. The version of the Elasticsearch index is a token in the
+    application cache that reindexing and search sync replace
+    (``bump_version``); the local backend uses its index version. A new
+    version turns every older entry into a miss without a flush, and
+    SEARCH_CACHE_TIMEOUT bounds how long any entry is served.
+    """
+
+    KEY_PREFIX = 'search:results:'
+    VERSION_KEY = 'search:index_version'
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, query_params, version):
+        digest = hashlib.sha1(
+            json.dumps(canonical_query(query_params), sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        return f"{self.KEY_PREFIX}{version}:{digest}"
+
+    def version(self):
+        """
+        Version of the index searches are currently answered from
+        """
+        if current_app.config.get('SEARCH_BACKEND') == 'local':
+            return f"local-{local_search_service.get().version}"
+        try:
+            version = cache.get(self.VERSION_KEY)
+        except Exception as e:
+            self.logger.error(f"Search cache version read failed: {e}")
+            return None
+        return version or self.bump_version()
+
+    def bump_version(self, version=None):
+        """
+        Start a new index version, invalidating every cached result
+
+        :param version: Token to use (e.g. the new index name), defaults to a timestamp
+        :return: The new version
+        """
+        version = version or datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        try:
+            cache.set(self.VERSION_KEY, version, timeout=0)
+        except Exception as e:
+            self.logger.error(f"Search cache version write failed: {e}")
+            return None
+        return version
+
+    def fetch(self, query_params, search):
+        """
+        Cached results of ``search(query_params)``, searching on a miss
+
+        Results are not cached while the index version is unknown (the
+        cache backend is failing).
+        """
+        version = self.version()
+        key = self.key(query_params, version) if version else None
+        if key:
+            try:
+                results = cache.get(key)
+            except Exception as e:
+                self.logger.error(f"Search cache read failed: {e}")
+                results = None
+            if results is not None:
+                self._count(hit=True)
+                return results
+
+        self._count(hit=False)
+        results = search(query_params)
+        if key:
+            try:
+                cache.set(key, results, timeout=current_app.config.get('SEARCH_CACHE_TIMEOUT', 300))
+            except Exception as e:
+                self.logger.error(f"Search cache write failed: {e}")
+        return results
+
+    def stats(self):
+        """
+        Hit rate of this process
+        """
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None
+        }
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+
+search_cache = SearchCache()
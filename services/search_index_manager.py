@@ -0,0 +1,147 @@
+import logging
+from datetime import datetime
+
+from flask import current_app
+
+from extensions import db
+from models import Wine, WineStats
+from services.search_indexer import BulkIndexer, iter_wine_documents
+
+# Settings of an index while it is bulk loaded: no replicas to copy to and
+# no periodic refreshes; both are restored before the alias moves
+LOAD_SETTINGS = {'number_of_replicas': 0, 'refresh_interval': '-1'}
+
+
+class SearchIndexManager:
+    """
+    Zero-downtime reindexing behind a read alias
+
+    Readers and incremental writers address an alias (e.g. ``wine_index``).
+    ``reindex`` loads the whole catalog into a new ``<alias>-<timestamp>``
+    index with replicas and refresh disabled, restores them, refreshes,
+    re-sends wines that changed and drops wines deleted while it loaded,
+    and then moves the alias in one ``update_aliases`` call, so searches
+    see either the complete old index or the complete new one. A legacy concrete index named like the
+    alias is replaced in the same atomic call. Older versions beyond
+    ``keep`` are deleted afterwards.
+    """
+
+    def __init__(self, es):
+        self.es = es
+        self.logger = logging.getLogger(__name__)
+
+    def reindex(self, alias, mappings=None, fields=None, keep=2, **options):
+        """
+        Build a new version of ``alias`` and switch the alias to it
+
+        :param mappings: Index mappings of the new version
+        :param fields: Document keys to index, defaults to all
+        :param keep: Versions to keep, including the new one
+        :param options: BulkIndexer settings (chunk_bytes, workers, ...)
+        :return: Dict with the new index, the previous ones, the deleted
+                 ones and the bulk stats
+        :raises RuntimeError: if documents failed to index (the alias is
+                              left untouched and the new index dropped)
+        """
+        config = current_app.config
+        started = datetime.utcnow()
+        name = f"{alias}-{started.strftime('%Y%m%d%H%M%S%f')}"
+
+        body = {'settings': {'index': dict(LOAD_SETTINGS)}}
+        if mappings:
+            body['mappings'] = mappings
+        self.es.indices.create(index=name, body=body)
+
+        try:
+            indexer = BulkIndexer(self.es, name, fields=fields, **options)
+            loaded = set()
+            batches = iter_wine_documents(batch_size=indexer.batch_size)
+            stats = indexer.index_documents(self._recording(batches, loaded))
+            if stats['failed']:
+                raise RuntimeError(f"{stats['failed']} wines could not be indexed into {name}")
+
+            self.es.indices.put_settings(index=name, body={'index': {
+                'number_of_replicas': config.get('SEARCH_INDEX_REPLICAS', 1),
+                'refresh_interval': config.get('SEARCH_INDEX_REFRESH_INTERVAL', '1s')
+            }})
+            self.es.indices.refresh(index=name)
+            stats['caught_up'] = self._catch_up(indexer, started, loaded)
+        except Exception:
+            self.es.indices.delete(index=name)
+            raise
+
+        previous = self.current_indices(alias)
+        self.swap(alias, name, previous)
+        deleted = self.collect_garbage(alias, keep)
+        self.logger.info(f"Alias {alias} now points to {name} (previously {previous}), deleted {deleted}")
+        return {'index': name, 'previous': previous, 'deleted': deleted, 'stats': stats}
+
+    @staticmethod
+    def _recording(batches, wine_ids):
+        """
+        Pass document batches through, adding their ids to ``wine_ids``
+        """
+        for batch in batches:
+            wine_ids.update(document['id'] for document in batch)
+            yield batch
+
+    def _catch_up(self, indexer, since, loaded):
+        """
+        Re-send wines edited or reviewed after ``since`` and delete loaded
+        wines that no longer exist (these changes may only have reached the
+        old index while the new one was loading)
+
+        :param since: When the load started
+        :param loaded: Ids of the wines the load indexed
+        :return: Number of wines re-sent or deleted
+        """
+        wine_ids = sorted(
+            {wine_id for (wine_id,) in db.session.query(Wine.id).filter(Wine.updated_at >= since)} |
+            {wine_id for (wine_id,) in db.session.query(WineStats.wine_id).filter(WineStats.updated_at >= since)}
+        )
+        deleted_ids = sorted(loaded - {wine_id for (wine_id,) in db.session.query(Wine.id)})
+        if wine_ids or deleted_ids:
+            indexer.index_documents(iter_wine_documents(wine_ids, indexer.batch_size), deleted_ids=deleted_ids)
+        return len(wine_ids) + len(deleted_ids)
+
+    def current_indices(self, alias):
+        """
+        Indices ``alias`` points to, or [alias] when it is a concrete index
+        """
+        if self.es.indices.exists_alias(name=alias):
+            return sorted(self.es.indices.get_alias(name=alias))
+        if self.es.indices.exists(index=alias):
+            return [alias]
+        return []
+
+    def swap(self, alias, index, previous=None):
+        """
+        Atomically point ``alias`` at ``index`` alone
+        """
+        previous = self.current_indices(alias) if previous is None else previous
+        actions = []
+        for old in previous:
+            if old == alias:
+                # A legacy index occupies the alias name; drop it in the same call
+                actions.append({'remove_index': {'index': old}})
+            elif old != index:
+                actions.append({'remove': {'index': old, 'alias': alias}})
+        actions.append({'add': {'index': index, 'alias': alias}})
+        self.es.indices.update_aliases(body={'actions': actions})
+
+    def collect_garbage(self, alias, keep=2):
+        """
+        Delete all but the ``keep`` newest versions of ``alias``, never one
+        the alias points to
+
+        :return: Names of the deleted indices
+        """
+        active = set(self.current_indices(alias))
+        versions = sorted(
+            name for name in self.es.indices.get(index=f'{alias}-*')
+            if name[len(alias) + 1:].isdigit()
+        )
+        deleted = [name for name in (versions[:-keep] if keep else versions) if name not in active]
+        for name in deleted:
+            self.es.indices.delete(index=name)
+        return deleted
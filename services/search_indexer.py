@@ -0,0 +1,227 @@
+import json
+import logging
+import resource
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from elasticsearch.exceptions import ConnectionError as ElasticsearchConnectionError
+from flask import current_app
+
+from extensions import db
+from models import Wine, WineVarietal
+from services.wine_feature_store import wine_feature_store
+
+# Bulk responses worth retrying: rejected (queue full) or temporarily unavailable
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+
+def iter_wine_documents(wine_ids=None, batch_size=1000):
+    """
+    Search documents of the catalog (or of ``wine_ids``) in id order, one
+    list per batch
+
+    Text columns are streamed with ``yield_per`` (a server-side cursor
+    where the driver supports it), so only one batch of rows is held at a
+    time; type, region, price, ratings and traits come from the shared
+    wine feature arrays.
+    """
+    query = db.session.query(Wine.id, Wine.name, Wine.description, WineVarietal.name)\
+        .outerjoin(WineVarietal, Wine.varietal_id == WineVarietal.id)
+    if wine_ids is not None:
+        query = query.filter(Wine.id.in_(list(wine_ids)))
+    features = wine_feature_store.get()
+
+    batch = []
+    for row in query.order_by(Wine.id).yield_per(batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield _documents(batch, features)
+            batch = []
+    if batch:
+        yield _documents(batch, features)
+
+
+def wine_documents(wine_ids=None):
+    """
+    All search documents of the catalog (or of ``wine_ids``), in id order
+    """
+    return [document for batch in iter_wine_documents(wine_ids) for document in batch]
+
+
+def _documents(rows, features):
+    records = features.records([row[0] for row in rows])
+    return [
+        {
+            'id': wine_id,
+            'name': name,
+            'type': feature['type'],
+            'region': feature['region'],
+            'varietal': varietal,
+            'description': description,
+            'price': feature['price'],
+            'alcohol_percentage': feature['alcohol_percentage'],
+            'traits': feature['traits'],
+            'average_rating': feature['avg_rating'],
+            'review_count': feature['review_count']
+        } for (wine_id, name, description, varietal), feature in zip(rows, records)
+    ]
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class BulkIndexer:
+    """
+    Streams wine documents into an Elasticsearch index with parallel bulk
+    requests
+
+    Documents are serialized once into NDJSON action/source lines and
+    grouped into bodies of at most ``chunk_bytes``; ``workers`` threads
+    send them while the next batch is read from the database. At most two
+    chunks per worker are in flight, so memory stays bounded however large
+    the catalog. Rejected chunks (connection errors, 429/5xx) and rejected
+    items are retried with exponential backoff; items that still fail are
+    counted and logged.
+    """
+
+    def __init__(self, es, index_name, chunk_bytes=None, workers=None, batch_size=None,
+                 max_retries=None, backoff=None, fields=None):
+        """
+        :param es: Elasticsearch client (thread-safe)
+        :param fields: Document keys to send, defaults to all
+        Other settings default to the SEARCH_BULK_* config values.
+        """
+        config = current_app.config
+        self.es = es
+        self.index_name = index_name
+        self.chunk_bytes = chunk_bytes or config.get('SEARCH_BULK_CHUNK_BYTES', 5 * 1024 * 1024)
+        self.workers = workers or config.get('SEARCH_BULK_WORKERS', 4)
+        self.batch_size = batch_size or config.get('SEARCH_BULK_BATCH_SIZE', 1000)
+        self.max_retries = config.get('SEARCH_BULK_MAX_RETRIES', 3) if max_retries is None else max_retries
+        self.backoff = config.get('SEARCH_BULK_BACKOFF', 0.5) if backoff is None else backoff
+        self.fields = fields
+        self.logger = logging.getLogger(__name__)
+
+    def index_wines(self, wine_ids=None):
+        """
+        Index the catalog (or ``wine_ids``)
+
+        :return: Stats dict with indexed, failed, chunks, retries, bytes,
+                 seconds, docs_per_second and peak_rss_mb
+        """
+        return self.index_documents(iter_wine_documents(wine_ids, self.batch_size))
+
+    def index_documents(self, batches, deleted_ids=()):
+        """
+        Index an iterable of document lists and delete ``deleted_ids``
+
+        :return: Stats dict (see index_wines)
+        """
+        start = time.perf_counter()
+        stats = {'indexed': 0, 'failed': 0, 'chunks': 0, 'retries': 0, 'bytes': 0}
+        pending = set()
+
+        def collect(done):
+            for future in done:
+                indexed, failed, retries = future.result()
+                stats['indexed'] += indexed
+                stats['failed'] += failed
+                stats['retries'] += retries
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for chunk in self.chunks(batches, deleted_ids):
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                stats['chunks'] += 1
+                stats['bytes'] += sum(len(line) for line in chunk)
+                pending.add(executor.submit(self._send, chunk))
+            collect(wait(pending)[0])
+
+        stats['seconds'] = time.perf_counter() - start
+        stats['docs_per_second'] = stats['indexed'] / stats['seconds'] if stats['seconds'] else None
+        stats['peak_rss_mb'] = peak_rss_mb()
+        self.logger.info(
+            f"Indexed {stats['indexed']} wines into {self.index_name} in {stats['seconds']:.2f}s "
+            f"({stats['docs_per_second'] or 0:.0f} docs/s, {stats['chunks']} chunks, "
+            f"{stats['failed']} failed, peak RSS {stats['peak_rss_mb']:.0f} MiB)"
+        )
+        return stats
+
+    def chunks(self, batches, deleted_ids=()):
+        """
+        Group documents (then deletes) into lists of NDJSON action lines of
+        at most ``chunk_bytes`` (a single larger document gets its own chunk)
+        """
+        chunk, size = [], 0
+        for line in self._lines(batches, deleted_ids):
+            if chunk and size + len(line) > self.chunk_bytes:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line)
+        if chunk:
+            yield chunk
+
+    def _lines(self, batches, deleted_ids):
+        for batch in batches:
+            for document in batch:
+                yield self._action_line(document)
+        for wine_id in deleted_ids:
+            yield (json.dumps({'delete': {'_index': self.index_name, '_id': wine_id}}) + '\n').encode('utf-8')
+
+    def _action_line(self, document):
+        source = document if self.fields is None else {field: document.get(field) for field in self.fields}
+        action = {'index': {'_index': self.index_name, '_id': document['id']}}
+        return (json.dumps(action) + '\n' + json.dumps(source) + '\n').encode('utf-8')
+
+    def _send(self, chunk):
+        """
+        Send one chunk, retrying it (or just its rejected items) with backoff
+
+        :return: (indexed, failed, retries)
+        """
+        indexed = failed = retries = 0
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = self.es.bulk(body=b''.join(chunk))
+            except Exception as e:
+                if not self._retryable(e):
+                    self.logger.error(f"Bulk request of {len(chunk)} wines failed: {e}")
+                    return indexed, failed + len(chunk), retries
+                self.logger.warning(f"Bulk request of {len(chunk)} wines failed, retrying: {e}")
+                continue
+
+            if not response['errors']:
+                return indexed + len(chunk), failed, retries
+            # Deleting a document that is already gone counts as done
+            statuses = [
+                201 if operation == 'delete' and result.get('status') == 404 else result.get('status', 500)
+                for operation, result in (next(iter(item.items())) for item in response['items'])
+            ]
+            rejected = sum(1 for status in statuses if status >= 300 and status not in RETRYABLE_STATUSES)
+            if rejected:
+                self.logger.error(f"{rejected} wines were rejected by {self.index_name}")
+            chunk = [line for line, status in zip(chunk, statuses) if status in RETRYABLE_STATUSES]
+            indexed += len(statuses) - len(chunk) - rejected
+            failed += rejected
+            if not chunk:
+                return indexed, failed, retries
+
+        self.logger.error(f"Giving up on {len(chunk)} wines after {self.max_retries} retries")
+        return indexed, failed + len(chunk), retries
+
+    @staticmethod
+    def _retryable(error):
+        return isinstance(error, ElasticsearchConnectionError) or \
+            getattr(error, 'status_code', None) in RETRYABLE_STATUSES
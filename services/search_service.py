@@ -1,58 +1,113 @@
 # services/search_service.py
 from extensions import db
 from models import Wine, WineReview
+from services.local_search_service import local_search_service
+from services.search_indexer import BulkIndexer
+from services.search_index_manager import SearchIndexManager
+from services.search_cache import search_cache
 from sqlalchemy import func, or_
 from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import ConnectionError as ElasticsearchConnectionError
+from flask import current_app
 import json
+import logging
 
 class SearchService:
+    # Mapping of wine_index, matching the fields advanced_search and
+    # suggest_wines query
+    INDEX_MAPPINGS = {
+        "properties": {
+            "name": {"type": "text", "fields": {"suggest": {"type": "completion"}}},
+            "description": {"type": "text"},
+            "type": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+            "region": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+            "varietal": {"type": "keyword"},
+            "traits": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+            "price": {"type": "float"},
+            "alcohol_percentage": {"type": "float"},
+            "average_rating": {"type": "float"},
+            "review_count": {"type": "integer"}
+        }
+    }
+
     def __init__(self):
         # Initialize Elasticsearch connection
         self.es = Elasticsearch(['http://localhost:9200'])
         self.index_name = 'wine_index'
+        self.logger = logging.getLogger(__name__)
+
+    def _use_local(self):
+        """
+        Whether SEARCH_BACKEND selects the in-process index
+        """
+        return current_app.config.get('SEARCH_BACKEND', 'elasticsearch') == 'local'
+
+    def _fallback(self, error):
+        """
+        Whether to answer from the local index after ``error``
+        """
+        if not current_app.config.get('SEARCH_LOCAL_FALLBACK', True):
+            return False
+        self.logger.warning(f"Elasticsearch unavailable, searching the local index: {error}")
+        return True
 
     def index_wines(self):
         """
-        Index wines in Elasticsearch for advanced search
+        Index wines in Elasticsearch for advanced search (or rebuild the
+        local index when that backend is selected)
         """
-        # Fetch all wines
-        wines = Wine.query.all()
-        
-        for wine in wines:
-            # Prepare wine document for indexing
-            wine_doc = {
-                'id': wine.id,
-                'name': wine.name,
-                'type': wine.type,
-                'region': wine.region,
-                'description': wine.description,
-                'price': wine.price,
-                'alcohol_percentage': wine.alcohol_percentage,
-                'traits': wine.traits or [],
-                'average_rating': self._calculate_average_rating(wine),
-                'review_count': len(wine.reviews)
-            }
-            
-            # Index document
-            self.es.index(
-                index=self.index_name, 
-                id=wine.id, 
-                body=wine_doc
-            )
+        if self._use_local():
+            index = local_search_service.index_wines()
+            return {'indexed': len(index), 'failed': 0}
+
+        # Stream the catalog through parallel bulk requests
+        stats = BulkIndexer(self.es, self.index_name).index_wines()
         
         # Refresh index
         self.es.indices.refresh(index=self.index_name)
+        search_cache.bump_version()
+        return stats
+
+    def reindex(self, keep=2, **options):
+        """
+        Rebuild wine_index into a new version behind the wine_index alias
+        (see SearchIndexManager.reindex)
+        """
+        result = SearchIndexManager(self.es).reindex(self.index_name, mappings=self.INDEX_MAPPINGS, keep=keep, **options)
+        search_cache.bump_version(result['index'])
+        return result
 
     def _calculate_average_rating(self, wine):
         """
-        Calculate average rating for a wine
+        Average rating of a wine, from its stats row
         """
-        ratings = [review.rating for review in wine.reviews]
-        return sum(ratings) / len(ratings) if ratings else 0
+        return wine.avg_rating
 
     def advanced_search(self, query_params):
         """
         Perform advanced search with multiple filters
+
+        Results are cached per canonical query and index version (see
+        SearchCache).
+        """
+        return search_cache.fetch(query_params, self._search)
+
+    def _search(self, query_params):
+        """
+        advanced_search against the configured backend
+        """
+        if self._use_local():
+            return local_search_service.advanced_search(query_params)
+        try:
+            return self._elasticsearch_search(query_params)
+        except ElasticsearchConnectionError as e:
+            if not self._fallback(e):
+                raise
+            return local_search_service.advanced_search(query_params)
+
+    def _elasticsearch_search(self, query_params):
+        """
+        advanced_search against the Elasticsearch index
         """
         # Prepare Elasticsearch query
         es_query = {
@@ -158,6 +213,16 @@ class SearchService:
         """
         Provide wine suggestions based on partial input
         """
+        if self._use_local():
+            return local_search_service.get().suggest(query)
+        try:
+            return self._elasticsearch_suggest(query)
+        except ElasticsearchConnectionError as e:
+            if not self._fallback(e):
+                raise
+            return local_search_service.get().suggest(query)
+
+    def _elasticsearch_suggest(self, query):
         suggest_query = {
             "suggest": {
                 "wine-suggest": {
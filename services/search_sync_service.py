@@ -0,0 +1,266 @@
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import SearchOutbox, Wine, WineReview, WineTrait, wine_traits
+from services.elasticsearch_service import ElasticsearchService
+from services.local_search_service import local_search_service
+from services.search_cache import search_cache
+from services.search_indexer import BulkIndexer, wine_documents
+from services.search_service import SearchService
+from services.wine_feature_store import wine_feature_store
+
+
+class SearchSyncService:
+    """
+    Applies queued search_outbox rows to the search indices
+
+    Each ``flush`` claims the oldest batch of rows, coalesces them to the
+    last operation per wine, sends one set of bulk requests per index
+    (SearchService's wine_index and ElasticsearchService's wine_search:
+    upserts of the wines that still exist, deletes of the others) and
+    deletes the rows once both indices have accepted them. Failed batches stay queued and
+    are retried on the next flush; re-sending a document is idempotent.
+    The work per flush is proportional to the changed wines, not the
+    catalog. ``start`` runs flushes from a background thread.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.search_service = None
+        self.elasticsearch_service = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self, batch_size=None):
+        """
+        Apply one batch of queued changes
+
+        :param batch_size: Outbox rows to claim, defaults to SEARCH_SYNC_BATCH_SIZE
+        :return: Stats dict (wines upserted/deleted, outbox rows applied and
+                 the bulk stats per index), or None when the outbox is empty
+        """
+        batch_size = batch_size or current_app.config.get('SEARCH_SYNC_BATCH_SIZE', 1000)
+        try:
+            # Concurrent flushers skip each other's rows where the database supports it
+            rows = db.session.query(SearchOutbox.id, SearchOutbox.wine_id, SearchOutbox.operation)\
+                .order_by(SearchOutbox.id)\
+                .limit(batch_size)\
+                .with_for_update(skip_locked=True)\
+                .all()
+            if not rows:
+                db.session.rollback()
+                return None
+
+            latest = {}
+            for _, wine_id, operation in rows:
+                latest[wine_id] = operation
+            upserts = sorted(wine_id for wine_id, operation in latest.items() if operation == 'upsert')
+            existing = {
+                wine_id for (wine_id,) in db.session.query(Wine.id).filter(Wine.id.in_(upserts))
+            } if upserts else set()
+            deletes = sorted(set(latest) - existing)
+
+            stats = self._apply(sorted(existing), deletes)
+            stats.update(upserted=len(existing), deleted=len(deletes), applied=len(rows))
+            if stats['failed']:
+                db.session.rollback()
+                self.logger.warning(f"Search sync left {len(rows)} outbox rows queued: {stats['failed']} failed")
+                return stats
+
+            db.session.query(SearchOutbox)\
+                .filter(SearchOutbox.id.in_([row.id for row in rows]))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+            # Cached results may include the old documents
+            search_cache.bump_version()
+            return stats
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"Search sync failed: {e}")
+            raise
+
+    def run_pending(self, batch_size=None):
+        """
+        Flush until the outbox is empty or a batch fails
+
+        :return: Total wines upserted and deleted, outbox rows applied
+        """
+        totals = {'upserted': 0, 'deleted': 0, 'applied': 0}
+        while True:
+            stats = self.flush(batch_size)
+            if stats is None:
+                return totals
+            for key in totals:
+                totals[key] += stats[key]
+            if stats['failed']:
+                return totals
+
+    def _apply(self, wine_ids, deleted_ids):
+        """
+        Send the current documents of ``wine_ids`` and delete ``deleted_ids``
+
+        :return: Documents indexed and failed (summed over the indices) and
+                 the bulk stats per index
+        """
+        # Re-read these wines' features: trait link changes need not move
+        # their timestamps
+        wine_feature_store.refresh(wine_ids=wine_ids)
+
+        if current_app.config.get('SEARCH_BACKEND') == 'local':
+            # The in-process index is immutable, so republish it
+            local_search_service.index_wines()
+            return {'indexed': len(wine_ids), 'failed': 0}
+
+        # A flush covers at most SEARCH_SYNC_BATCH_SIZE wines, so build the documents once
+        documents = wine_documents(wine_ids)
+        stats = {'indexed': 0, 'failed': 0, 'indices': {}}
+        for service in self._services():
+            indexer = BulkIndexer(service.es, service.index_name, fields=getattr(service, 'INDEX_FIELDS', None))
+            index_stats = indexer.index_documents([documents], deleted_ids)
+            stats['indexed'] += index_stats['indexed']
+            stats['failed'] += index_stats['failed']
+            stats['indices'][service.index_name] = index_stats
+        return stats
+
+    def _services(self):
+        """
+        The services whose indices are kept in sync
+        """
+        if self.search_service is None:
+            self.search_service = SearchService()
+        if self.elasticsearch_service is None:
+            self.elasticsearch_service = ElasticsearchService(
+                hosts=[current_app.config.get('ELASTICSEARCH_HOST', 'http://localhost:9200')]
+            )
+        return [self.search_service, self.elasticsearch_service]
+
+    def start(self, app=None, interval=None):
+        """
+        Flush the outbox every ``interval`` seconds from a daemon thread
+
+        :param app: Flask application, defaults to the current one
+        :param interval: Defaults to SEARCH_SYNC_INTERVAL
+        :return: The started thread (or the running one)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        app = app or current_app._get_current_object()
+        interval = interval or app.config.get('SEARCH_SYNC_INTERVAL', 5)
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                with app.app_context():
+                    try:
+                        self.run_pending()
+                    except Exception as e:
+                        self.logger.error(f"Background search sync failed: {e}")
+                    finally:
+                        db.session.remove()
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name='search-sync', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """
+        Stop the background thread after its current flush
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def register_search_sync():
+    """
+    Queue a search_outbox row for every wine whose search document changes:
+    wine inserts, updates and deletes, review writes (ratings and counts)
+    and trait renames or deletes. Trait association changes flush the
+    owning wine as dirty, so they arrive as wine updates.
+    """
+    if event.contains(Session, 'after_flush', _write_outbox):
+        return
+    for operation in ('after_insert', 'after_update'):
+        event.listen(Wine, operation, _wine_changed)
+        event.listen(WineReview, operation, _review_changed)
+    event.listen(Wine, 'after_delete', _wine_deleted)
+    event.listen(WineReview, 'after_delete', _review_changed)
+    event.listen(WineTrait, 'after_update', _trait_changed)
+    event.listen(WineTrait, 'before_delete', _trait_changed)
+    event.listen(Session, 'after_flush', _write_outbox)
+    event.listen(Session, 'after_rollback', _discard_outbox)
+
+
+def queue_wines(wine_ids, operation='upsert'):
+    """
+    Queue search_outbox rows for wines written with Core statements (bulk
+    imports), which the mapper events above never see. The rows join the
+    caller's transaction.
+
+    :return: Number of rows queued
+    """
+    wine_ids = sorted(set(wine_ids))
+    if not wine_ids or not current_app.config.get('SEARCH_SYNC_ENABLED', True):
+        return 0
+    db.session.execute(SearchOutbox.__table__.insert(), [
+        {'wine_id': wine_id, 'operation': operation} for wine_id in wine_ids
+    ])
+    return len(wine_ids)
+
+
+def _queue(target, wine_id, operation='upsert'):
+    session = object_session(target)
+    if session is None or wine_id is None:
+        return
+    pending = session.info.setdefault('search_outbox', {})
+    # A delete in the same flush wins over any update
+    if pending.get(wine_id) != 'delete':
+        pending[wine_id] = operation
+
+
+def _wine_changed(mapper, connection, wine):
+    _queue(wine, wine.id)
+
+
+def _wine_deleted(mapper, connection, wine):
+    _queue(wine, wine.id, 'delete')
+
+
+def _review_changed(mapper, connection, review):
+    _queue(review, review.wine_id)
+    # A review moved to another wine changes both documents
+    history = inspect(review).attrs.wine_id.history
+    for wine_id in history.deleted or ():
+        _queue(review, wine_id)
+
+
+def _trait_changed(mapper, connection, trait):
+    wine_ids = connection.execute(
+        select(wine_traits.c.wine_id).where(wine_traits.c.trait_id == trait.id)
+    ).scalars()
+    for wine_id in wine_ids:
+        _queue(trait, wine_id)
+
+
+def _write_outbox(session, flush_context):
+    pending = session.info.pop('search_outbox', None)
+    if not pending:
+        return
+    session.execute(SearchOutbox.__table__.insert(), [
+        {'wine_id': wine_id, 'operation': operation} for wine_id, operation in sorted(pending.items())
+    ])
+
+
+def _discard_outbox(session):
+    session.info.pop('search_outbox', None)
+
+
+# Global service instance
+search_sync_service = SearchSyncService()
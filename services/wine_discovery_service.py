@@ -3,6 +3,8 @@ from models import Wine, WineReview, UserInteraction, UserPreference
 from extensions import db
 from sqlalchemy import func, or_
 from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import ConnectionError as ElasticsearchConnectionError
+from services.local_search_service import local_search_service
 import logging
 import os
 
@@ -101,8 +103,12 @@ class WineDiscoveryService:
         """
         Advanced wine search with multiple filters and error handling
         """
+        if current_app.config.get('SEARCH_BACKEND', 'elasticsearch') == 'local':
+            return self._local_search(query_params)
         if not self.es:
             self.logger.error("Elasticsearch not connected")
+            if current_app.config.get('SEARCH_LOCAL_FALLBACK', True):
+                return self._local_search(query_params)
             return {'total': 0, 'wines': []}
 
         try:
@@ -168,10 +174,32 @@ class WineDiscoveryService:
                 'wines': [hit['_source'] for hit in results['hits']['hits']]
             }
         
+        except ElasticsearchConnectionError as e:
+            self.logger.error(f"Elasticsearch unavailable during advanced search: {e}")
+            if current_app.config.get('SEARCH_LOCAL_FALLBACK', True):
+                return self._local_search(query_params)
+            return {'total': 0, 'wines': []}
+
         except Exception as e:
             self.logger.error(f"Error in advanced search: {e}")
             return {'total': 0, 'wines': []}
 
+    def _local_search(self, query_params):
+        """
+        advanced_search answered by the in-process index, ranked like the
+        Elasticsearch query (name^3, description^2, traits^2) and, without
+        a text query, by popularity
+        """
+        try:
+            params = dict(query_params, fields={'name': 3.0, 'description': 2.0, 'traits': 2.0})
+            if not params.get('query'):
+                params['sort'] = 'popularity'
+            results = local_search_service.advanced_search(params)
+            return {'total': results['total'], 'wines': results['wines']}
+        except Exception as e:
+            self.logger.error(f"Error in local advanced search: {e}")
+            return {'total': 0, 'wines': []}
+
 # Global function to create service
 def create_wine_discovery_service(app=None):
     """
@@ -0,0 +1,514 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Wine, WineRegion, WineStats, WineTrait, wine_traits
+from utils.recommendation_helpers import RecommendationHelper
+from utils.snapshot_store import SnapshotStore
+
+# Numeric feature columns and their on-disk dtypes
+NUMERIC_FEATURES = {
+    'price': np.float64,
+    'alcohol_percentage': np.float64,
+    'avg_rating': np.float64,
+    'review_count': np.int32
+}
+# Categorical features, stored as int32 codes into a label list (-1 when unknown)
+CODED_FEATURES = ('type', 'region')
+
+# Bump when the on-disk layout changes
+FEATURE_STORE_FORMAT = 1
+
+
+class WineFeatures:
+    """
+    Immutable columnar snapshot of per-wine attributes
+
+    One NumPy array per attribute, aligned with the ascending ``wine_ids``:
+    price, alcohol, average rating and review count, type and region codes,
+    and a uint64 bitset per wine with bit ``j`` set when the wine has
+    ``trait_ids[j]``. Loaded snapshots are memory-mapped, so ``column``
+    hands out the mapped arrays themselves and every process shares one
+    copy through the page cache. ``source`` names the database the
+    features were read from.
+    """
+
+    def __init__(self, wine_ids, columns, labels, trait_ids, trait_names, trait_bitsets,
+                 watermark=None, version=None, source=None):
+        self.wine_ids = wine_ids
+        self.columns = columns
+        self.labels = labels
+        self.trait_ids = trait_ids
+        self.trait_names = trait_names
+        self.trait_bitsets = trait_bitsets
+        self.watermark = watermark
+        self.version = version
+        self.source = source
+
+    def __len__(self):
+        return len(self.wine_ids)
+
+    def column(self, name):
+        """
+        The array of one feature (a view, never a copy)
+        """
+        if name == 'trait_bitsets':
+            return self.trait_bitsets
+        return self.columns[name]
+
+    def index_of(self, wine_ids):
+        """
+        Positions of ``wine_ids`` in the feature arrays (-1 for unknown wines)
+        """
+        wine_ids = np.asarray(wine_ids, dtype=np.int64)
+        if not len(self.wine_ids):
+            return np.full(len(wine_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.wine_ids, wine_ids), len(self.wine_ids) - 1)
+        return np.where(self.wine_ids[positions] == wine_ids, positions, -1)
+
+    def decode(self, name, positions=None):
+        """
+        Labels of a coded feature (None where unknown)
+
+        :param name: 'type' or 'region'
+        :param positions: Positions to decode (-1 allowed), defaults to all wines
+        :return: object array of labels
+        """
+        codes = self.columns[name] if positions is None else np.where(
+            np.asarray(positions) >= 0, self.columns[name][np.maximum(positions, 0)], -1
+        )
+        labels = np.array(self.labels[name] + [None], dtype=object)
+        return labels[codes]
+
+    def frame(self, columns=None):
+        """
+        DataFrame of feature columns indexed by wine id
+
+        Numeric columns wrap the arrays without copying (where pandas allows);
+        coded columns are decoded to labels.
+        """
+        columns = columns or list(NUMERIC_FEATURES) + list(CODED_FEATURES)
+        data = {
+            name: self.decode(name) if name in CODED_FEATURES else self.columns[name]
+            for name in columns
+        }
+        return pd.DataFrame(data, index=pd.Index(self.wine_ids, name='id'), copy=False)
+
+    def trait_mask(self, trait_ids, match='any'):
+        """
+        Wines having any (or all) of ``trait_ids``, as a bool array over the catalog
+        """
+        bits = np.zeros(self.trait_bitsets.shape[1] * 64, dtype=bool)
+        positions = RecommendationHelper.index_of(self.trait_ids, trait_ids)
+        bits[positions[positions >= 0]] = True
+        query = np.packbits(bits, bitorder='little').view(np.uint64)
+        overlap = self.trait_bitsets & query
+        if match == 'all':
+            return (overlap == query).all(axis=1) & bool((positions >= 0).all())
+        return overlap.any(axis=1)
+
+    def wine_trait_names(self, positions):
+        """
+        Trait names of the wines at ``positions`` (empty for -1)
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        rows = np.unpackbits(
+            self.trait_bitsets[np.maximum(positions, 0)].view(np.uint8), axis=1, bitorder='little'
+        )[:, :len(self.trait_ids)]
+        return [
+            [self.trait_names[j] for j in np.flatnonzero(row)] if position >= 0 else []
+            for position, row in zip(positions.tolist(), rows)
+        ]
+
+    def records(self, wine_ids):
+        """
+        Feature dicts of ``wine_ids`` for document builders such as the
+        search indexers (None values for unknown wines or missing numbers)
+        """
+        positions = self.index_of(wine_ids)
+        known = positions >= 0
+        decoded = {name: self.decode(name, positions) for name in CODED_FEATURES}
+        numbers = {}
+        for name in NUMERIC_FEATURES:
+            values = self.columns[name][np.maximum(positions, 0)].astype(np.float64)
+            values[~known] = np.nan
+            numbers[name] = [None if np.isnan(value) else value for value in values.tolist()]
+        traits = self.wine_trait_names(positions)
+        return [
+            {
+                'type': decoded['type'][i],
+                'region': decoded['region'][i],
+                'price': numbers['price'][i],
+                'alcohol_percentage': numbers['alcohol_percentage'][i],
+                'avg_rating': numbers['avg_rating'][i] or 0.0,
+                'review_count': int(numbers['review_count'][i] or 0),
+                'traits': traits[i]
+            } for i in range(len(positions))
+        ]
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'wines': len(self.wine_ids),
+            'traits': len(self.trait_ids),
+            'types': len(self.labels['type']),
+            'regions': len(self.labels['region'])
+        }
+
+    def save(self, directory):
+        """
+        Persist the features as .npy files under ``directory/<version>``
+
+        ``directory/CURRENT`` is switched to the new version with an atomic
+        rename once every file is written.
+
+        :return: Path of the written snapshot
+        """
+        with SnapshotStore.write(directory, self.version) as staging:
+            SnapshotStore.save_arrays(
+                staging,
+                dict(self.columns, wine_ids=self.wine_ids, trait_ids=self.trait_ids, trait_bitsets=self.trait_bitsets)
+            )
+            SnapshotStore.write_manifest(staging, {
+                'format': FEATURE_STORE_FORMAT,
+                'version': self.version,
+                'source': self.source,
+                'watermark': self.watermark.isoformat() if self.watermark else None,
+                'labels': self.labels,
+                'trait_names': self.trait_names
+            })
+        return os.path.join(directory, self.version)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load the snapshot ``directory/CURRENT`` points to, memory-mapped
+
+        :return: WineFeatures, or None if no snapshot exists
+        """
+        path, meta = SnapshotStore.open(directory, FEATURE_STORE_FORMAT, 'wine feature store')
+        if path is None:
+            return None
+
+        def array(name):
+            return SnapshotStore.load_array(path, name, mmap_mode)
+
+        return cls(
+            wine_ids=array('wine_ids'),
+            columns={name: array(name) for name in list(NUMERIC_FEATURES) + list(CODED_FEATURES)},
+            labels=meta['labels'],
+            trait_ids=array('trait_ids'),
+            trait_names=meta['trait_names'],
+            trait_bitsets=array('trait_bitsets'),
+            watermark=datetime.fromisoformat(meta['watermark']) if meta.get('watermark') else None,
+            version=meta['version'],
+            source=meta.get('source')
+        )
+
+    @staticmethod
+    def prune(directory, keep=2):
+        """
+        Delete all but the ``keep`` newest snapshots, never the CURRENT one
+        """
+        SnapshotStore.prune(directory, keep)
+
+
+class WineFeatureStore:
+    """
+    Process-wide holder of the current WineFeatures snapshot
+
+    ``get`` loads the persisted snapshot from WINE_FEATURE_STORE_DIR (or
+    builds one from the database) on first use, then keeps it fresh with
+    incremental refreshes: only wines updated or reviewed since the
+    watermark are re-read. Refreshes never mutate the published snapshot;
+    the new one is swapped in with a single assignment.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.features = None
+        self._lock = threading.Lock()
+
+    def get(self, max_age=None):
+        """
+        The current features, refreshed if older than ``max_age`` seconds
+
+        :param max_age: Defaults to WINE_FEATURE_STORE_MAX_AGE (None never refreshes)
+        """
+        if max_age is None:
+            max_age = current_app.config.get('WINE_FEATURE_STORE_MAX_AGE', 60)
+        features = self.features
+        if features is None or features.source != self._source():
+            with self._lock:
+                if self.features is None or self.features.source != self._source():
+                    self.features = self.load() or self.build()
+            features = self.features
+        if max_age is not None and features.watermark is not None and \
+                (datetime.utcnow() - features.watermark).total_seconds() > max_age:
+            features = self.refresh()
+        return features
+
+    def load(self, directory=None):
+        """
+        Load the persisted snapshot (memory-mapped) without publishing it
+
+        :return: WineFeatures, or None if there is none, it is unreadable or
+                 it was built from another database
+        """
+        directory = directory or current_app.config.get('WINE_FEATURE_STORE_DIR')
+        if not directory:
+            return None
+        try:
+            features = WineFeatures.load(directory)
+        except Exception as e:
+            self.logger.error(f"Failed to load wine features from {directory}: {e}")
+            return None
+        if features is not None and features.source != self._source():
+            self.logger.warning(f"Ignoring wine features in {directory} built from {features.source}")
+            return None
+        return features
+
+    def save(self, directory=None, keep=2):
+        """
+        Persist the current snapshot so other processes can memory-map it
+
+        :return: Path of the written snapshot
+        """
+        directory = directory or current_app.config['WINE_FEATURE_STORE_DIR']
+        features = self.features if self.features is not None else self.get()
+        path = features.save(directory)
+        WineFeatures.prune(directory, keep=keep)
+        return path
+
+    def build(self):
+        """
+        Build a complete snapshot from the database (not published)
+        """
+        start = time.perf_counter()
+        watermark = datetime.utcnow()
+        rows = self._query_rows()
+        labels = {name: sorted({row[name] for row in rows if row[name] is not None}) for name in CODED_FEATURES}
+        trait_ids, trait_names = self._query_traits()
+        n_words = max(1, -(-len(trait_ids) // 64))
+        features = WineFeatures(
+            wine_ids=np.array([row['id'] for row in rows], dtype=np.int64),
+            columns=self._columns(rows, labels),
+            labels=labels,
+            trait_ids=np.asarray(trait_ids, dtype=np.int64),
+            trait_names=trait_names,
+            trait_bitsets=np.zeros((len(rows), n_words), dtype=np.uint64),
+            watermark=watermark,
+            version=watermark.strftime('%Y%m%d%H%M%S%f'),
+            source=self._source()
+        )
+        self._set_traits(features, features.wine_ids, *self._query_trait_pairs())
+        self.logger.info(f"Built wine features {features.to_dict()} in {time.perf_counter() - start:.2f}s")
+        return features
+
+    def refresh(self, since=None, wine_ids=None):
+        """
+        Apply database changes since the watermark and publish the result
+
+        Only wines updated or reviewed after ``since`` are read; their rows
+        are patched into copies of the arrays and new wines are merged in
+        id order. Trait link changes count as updates (see
+        ``register_wine_trait_tracking``). Deleted wines are dropped when
+        the catalog count no longer matches. Label lists and the trait
+        vocabulary only ever grow, so existing codes and bit positions stay
+        valid.
+
+        :param since: Override the current watermark
+        :param wine_ids: Wines to re-read whatever their timestamps (e.g.
+                         the ones a search sync is about to send)
+        :return: The published WineFeatures
+        """
+        with self._lock:
+            current = self.features
+            if current is None or current.source != self._source():
+                current = self.load()
+            if current is None:
+                self.features = self.build()
+                return self.features
+
+            since = since or current.watermark
+            watermark = datetime.utcnow()
+            reviewed_wine_ids = db.session.query(WineStats.wine_id).filter(WineStats.updated_at > since)
+            changed = [Wine.updated_at > since, Wine.id.in_(reviewed_wine_ids)]
+            if wine_ids:
+                changed.append(Wine.id.in_(list(wine_ids)))
+            rows = self._query_rows(or_(*changed))
+            trait_ids, trait_names = self._query_traits()
+            n_wines = db.session.query(func.count(Wine.id)).scalar()
+            if not rows and n_wines == len(current) and \
+                    trait_ids == current.trait_ids.tolist() and trait_names == current.trait_names:
+                # Nothing changed: share the arrays, only the watermark moves
+                self.features = WineFeatures(
+                    current.wine_ids, current.columns, current.labels, current.trait_ids, current.trait_names,
+                    current.trait_bitsets, watermark=watermark, version=current.version, source=current.source
+                )
+                return self.features
+
+            labels = {name: list(current.labels[name]) for name in CODED_FEATURES}
+            for name in CODED_FEATURES:
+                known = set(labels[name])
+                labels[name].extend(sorted({row[name] for row in rows if row[name] is not None} - known))
+
+            known_traits = set(current.trait_ids.tolist())
+            names_by_id = dict(zip(trait_ids, trait_names))
+            all_trait_ids = current.trait_ids.tolist() + [trait_id for trait_id in trait_ids if trait_id not in known_traits]
+
+            changed_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+            positions = current.index_of(changed_ids)
+            new_ids = changed_ids[positions < 0]
+            wine_ids = np.concatenate([current.wine_ids, new_ids])
+            order = np.argsort(wine_ids, kind='stable')
+            if len(wine_ids) != n_wines:
+                # Some wines were deleted: keep only the ones still in the catalog
+                live = np.array([wine_id for (wine_id,) in db.session.query(Wine.id)], dtype=np.int64)
+                order = order[np.isin(wine_ids[order], live)]
+
+            changed = self._columns(rows, labels)
+            columns = {}
+            for name, array in current.columns.items():
+                merged = np.concatenate([array, changed[name][positions < 0]])
+                merged[positions[positions >= 0]] = changed[name][positions >= 0]
+                columns[name] = merged[order]
+
+            n_words = max(1, -(-len(all_trait_ids) // 64))
+            bitsets = np.zeros((len(wine_ids), n_words), dtype=np.uint64)
+            bitsets[:len(current.wine_ids), :current.trait_bitsets.shape[1]] = current.trait_bitsets
+
+            features = WineFeatures(
+                wine_ids=wine_ids[order],
+                columns=columns,
+                labels=labels,
+                trait_ids=np.asarray(all_trait_ids, dtype=np.int64),
+                trait_names=[names_by_id.get(trait_id, '') for trait_id in all_trait_ids],
+                trait_bitsets=bitsets[order],
+                watermark=watermark,
+                version=watermark.strftime('%Y%m%d%H%M%S%f'),
+                source=self._source()
+            )
+            if len(changed_ids):
+                self._set_traits(features, changed_ids, *self._query_trait_pairs(wine_traits.c.wine_id.in_(changed_ids.tolist())))
+            self.features = features
+            self.logger.info(
+                f"Wine features delta: {len(changed_ids)} wines ({len(new_ids)} new, "
+                f"{len(current.wine_ids) + len(new_ids) - len(features.wine_ids)} deleted)"
+            )
+            return features
+
+    @staticmethod
+    def _source():
+        """
+        The database the features are read from (password masked)
+        """
+        return repr(db.engine.url)
+
+    @staticmethod
+    def _columns(rows, labels):
+        """
+        Feature arrays (in row order) from queried rows
+        """
+        columns = {
+            name: np.array([row[name] if row[name] is not None else np.nan for row in rows], dtype=np.float64)
+            for name in NUMERIC_FEATURES
+        }
+        columns['review_count'] = np.nan_to_num(columns['review_count']).astype(NUMERIC_FEATURES['review_count'])
+        for name in CODED_FEATURES:
+            codes = {label: code for code, label in enumerate(labels[name])}
+            columns[name] = np.array([codes.get(row[name], -1) for row in rows], dtype=np.int32)
+        return columns
+
+    @staticmethod
+    def _set_traits(features, wine_ids, wine_col, trait_col):
+        """
+        Overwrite the trait bits of ``wine_ids`` with the (wine, trait) pairs
+        """
+        rows = features.index_of(wine_ids)
+        features.trait_bitsets[rows[rows >= 0]] = 0
+        incidence = RecommendationHelper.build_incidence_matrix(
+            wine_col, trait_col, features.wine_ids, features.trait_ids
+        )
+        touched = np.flatnonzero(np.diff(incidence.indptr))
+        if len(touched):
+            packed = RecommendationHelper.pack_bitsets(incidence[touched])
+            features.trait_bitsets[touched, :packed.shape[1]] = packed
+
+    @staticmethod
+    def _query_rows(*filters):
+        """
+        One grouped query for the features of all (or the filtered) wines
+        """
+        query = db.session.query(
+            Wine.id,
+            Wine.price,
+            Wine.alcohol_percentage,
+            Wine.type,
+            WineRegion.name.label('region'),
+            WineStats.avg_rating,
+            WineStats.rating_count.label('review_count')
+        ).outerjoin(WineRegion, Wine.region_id == WineRegion.id)\
+         .outerjoin(WineStats, WineStats.wine_id == Wine.id)
+        if filters:
+            query = query.filter(*filters)
+        rows = query.order_by(Wine.id).all()
+        return [row._asdict() for row in rows]
+
+    @staticmethod
+    def _query_traits():
+        """
+        (trait ids, trait names) in id order
+        """
+        rows = db.session.query(WineTrait.id, WineTrait.name).order_by(WineTrait.id).all()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    @staticmethod
+    def _query_trait_pairs(*filters):
+        query = db.session.query(wine_traits.c.wine_id, wine_traits.c.trait_id)
+        if filters:
+            query = query.filter(*filters)
+        rows = query.all()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+
+
+def register_wine_trait_tracking():
+    """
+    Give wines a new updated_at when only their trait links change (a
+    trait added or removed, or a linked trait deleted). Such flushes write
+    wine_traits_association rows but no UPDATE of the wine, so readers that
+    pick up changes by Wine.updated_at (this store, incremental
+    recommendation builds, reindex catch-up) would miss them.
+    """
+    if event.contains(Session, 'before_flush', _touch_wines_with_changed_traits):
+        return
+    event.listen(Session, 'before_flush', _touch_wines_with_changed_traits)
+
+
+def _touch_wines_with_changed_traits(session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in session.dirty:
+        if isinstance(obj, Wine) and inspect(obj).attrs.traits.history.has_changes():
+            obj.updated_at = now
+
+    deleted_trait_ids = [obj.id for obj in session.deleted if isinstance(obj, WineTrait) and obj.id is not None]
+    if deleted_trait_ids:
+        # The links are only removed later in this flush, so they can still be read here
+        linked_wine_ids = select(wine_traits.c.wine_id).where(wine_traits.c.trait_id.in_(deleted_trait_ids))
+        session.execute(
+            Wine.__table__.update().where(Wine.__table__.c.id.in_(linked_wine_ids)).values(updated_at=now)
+        )
+
+
+wine_feature_store = WineFeatureStore()
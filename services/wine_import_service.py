@@ -0,0 +1,328 @@
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Wine, WineCategory, WineRegion, WineTrait, WineVarietal, wine_traits
+from services.search_sync_service import queue_wines
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'df_wine_us_rate.pkl')
+
+# Varietal names recognised at the end of a title, with the wine type they imply
+VARIETAL_TYPES = {
+    **{name: 'Red' for name in (
+        'Pinot Noir', 'Cabernet Sauvignon', 'Cabernet Franc', 'Syrah', 'Shiraz', 'Petite Sirah', 'Zinfandel',
+        'Merlot', 'Grenache', 'Malbec', 'Mourvèdre', 'Sangiovese', 'Tempranillo', 'Barbera', 'Petit Verdot',
+        'Cinsault', 'Primitivo', 'Nebbiolo', 'Tannat', 'Carmenère', 'Carignane', 'Teroldego', 'Charbono',
+        'Dolcetto', 'Graciano', 'Touriga Nacional', 'Mission', 'Lagrein', 'Aglianico', 'Gamay', 'Gamay Noir',
+        'Counoise', 'Lemberger', 'Montepulciano', 'Pinot Meunier', 'Meritage', 'Claret', 'Port'
+    )},
+    **{name: 'White' for name in (
+        'Chardonnay', 'Sauvignon Blanc', 'Fumé Blanc', 'Riesling', 'Viognier', 'Pinot Gris', 'Pinot Grigio',
+        'Pinot Blanc', 'Gewürztraminer', 'Gewurztraminer', 'Roussanne', 'Marsanne', 'Grüner Veltliner',
+        'Albariño', 'Sémillon', 'Semillon', 'Muscat', 'Moscato', 'Chenin Blanc', 'Grenache Blanc', 'Colombard',
+        'Auxerrois', 'Verdelho', 'Vermentino', 'Picpoul', 'Torrontés', 'Malvasia', 'Arneis', 'Fiano'
+    )}
+}
+
+# Generic style words that end a title instead of a varietal: (varietal, type)
+STYLE_VARIETALS = {
+    'Red': ('Red Blend', 'Red'),
+    'White': ('White Blend', 'White'),
+    'Rosé': ('Rosé', 'Rosé'),
+    'Sparkling': ('Sparkling Blend', 'Sparkling'),
+    'G-S-M': ('Rhône-style Red Blend', 'Red')
+}
+
+
+class WineImportService:
+    """
+    Streaming import of wine ratings datasets into the catalog
+
+    The dataset is read in chunks of ``batch_size`` rows. Each title
+    ("Producer 2014 Designation Varietal (Region)") is parsed into a
+    region, a varietal, a wine type and the trait names it mentions; the
+    names are resolved to ids through dicts loaded once per import, so no
+    row is looked up on its own. Missing varietals and regions are created
+    in bulk, wines are written with Core executemany inserts and updates,
+    and each chunk is committed on its own, together with the search
+    outbox rows of the wines it inserted, changed or linked traits to.
+
+    Wines are matched by name. Re-running an import updates wines whose
+    imported columns changed, skips the rest and only links missing
+    traits, so an import is idempotent and an interrupted one can simply
+    be run again.
+    """
+
+    def __init__(self, batch_size=5000, country='US'):
+        """
+        :param batch_size: Rows per chunk (and per bulk statement)
+        :param country: Country of newly created regions
+        """
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = batch_size
+        self.country = country
+        names = sorted(list(VARIETAL_TYPES) + list(STYLE_VARIETALS), key=len, reverse=True)
+        alternatives = '|'.join(re.escape(name) for name in names)
+        # Longest run of hyphen-joined varietals ending the title, e.g. "Cabernet Sauvignon-Syrah"
+        self._varietal_pattern = rf'(?:^|\s)((?:{alternatives})(?:-(?:{alternatives}))*)$'
+        self._varietal_names = re.compile(alternatives, re.IGNORECASE)
+        self._canonical = {name.lower(): name for name in names}
+
+    def read_chunks(self, path=DEFAULT_DATASET):
+        """
+        Yield the dataset as DataFrames of at most ``batch_size`` rows
+
+        CSV files are streamed; pickles are loaded once and sliced.
+
+        :raises ValueError: if the file is not a ratings dataset (the
+                            bundled wine_quality.pkl is a trained model)
+        """
+        if path.endswith('.csv'):
+            yield from pd.read_csv(path, chunksize=self.batch_size)
+            return
+
+        data = pd.read_pickle(path)
+        if not isinstance(data, pd.DataFrame) or 'title' not in data.columns:
+            raise ValueError(f"{path} is not a wine ratings dataset (got {type(data).__name__})")
+        for start in range(0, len(data), self.batch_size):
+            yield data.iloc[start:start + self.batch_size]
+
+    def parse_titles(self, titles):
+        """
+        Split titles into region, varietal and wine type
+
+        :param titles: Series of titles
+        :return: DataFrame with name, region, varietal and type columns
+                 (None where a title does not say)
+        """
+        titles = titles.astype(str).str.strip()
+        # The region is the last parenthesised group and may nest one level: "Columbia Valley (WA)"
+        parts = titles.str.extract(r'^(.*?)\s*\(((?:[^()]|\([^()]*\))*)\)$')
+        base = parts[0].fillna(titles)
+        expressions = base.str.extract(self._varietal_pattern, flags=re.IGNORECASE)[0]
+
+        resolved = {expression: self._resolve_varietal(expression) for expression in expressions.dropna().unique()}
+        varietals = expressions.map(lambda expression: resolved.get(expression, (None, None)))
+        parsed = pd.DataFrame({
+            'name': titles,
+            'base': base,
+            'region': parts[1],
+            'varietal': varietals.str[0],
+            'type': varietals.str[1]
+        }, index=titles.index).astype(object)
+        return parsed.where(parsed.notna(), None)
+
+    def _resolve_varietal(self, expression):
+        """
+        (varietal name, wine type) of a title ending such as "Syrah",
+        "Red" or "Cabernet Sauvignon-Syrah" (a blend of the first
+        component's type)
+        """
+        canonical = self._canonical.get(expression.lower())
+        if canonical in STYLE_VARIETALS:
+            return STYLE_VARIETALS[canonical]
+        if canonical is not None:
+            return canonical, VARIETAL_TYPES[canonical]
+
+        first = self._canonical[self._varietal_names.match(expression).group(0).lower()]
+        wine_type = STYLE_VARIETALS[first][1] if first in STYLE_VARIETALS else VARIETAL_TYPES[first]
+        return f"{wine_type} Blend", wine_type
+
+    @staticmethod
+    def trait_names(text, known):
+        """
+        Names in ``known`` that ``text`` mentions, as words or as
+        underscore-joined word pairs ("black cherry" -> black_cherry)
+        """
+        words = re.findall(r"[^\W\d_]+", text.lower())
+        candidates = set(words) | {f"{first}_{second}" for first, second in zip(words, words[1:])}
+        return candidates & known
+
+    def import_file(self, path=DEFAULT_DATASET, progress=None):
+        """
+        Import a ratings dataset (title, points, taster_name columns)
+
+        :param path: Pickled DataFrame or CSV file
+        :param progress: Optional callable receiving the running stats after each chunk
+        :return: Stats dict (rows, inserted, updated, unchanged, duplicates,
+                 traits_linked, varietals_created, regions_created, seconds, rows_per_second)
+        """
+        start = time.perf_counter()
+        stats = dict.fromkeys(
+            ('rows', 'inserted', 'updated', 'unchanged', 'duplicates', 'traits_linked',
+             'varietals_created', 'regions_created'), 0
+        )
+
+        wine_table = Wine.__table__
+        wines = {}
+        for wine_id, name, description, wine_type, varietal_id, region_id, category_id in db.session.query(
+            wine_table.c.id, wine_table.c.name, wine_table.c.description, wine_table.c.type,
+            wine_table.c.varietal_id, wine_table.c.region_id, wine_table.c.category_id
+        ).order_by(wine_table.c.id):
+            # Duplicate names keep the oldest wine
+            wines.setdefault(name, (wine_id, (description, wine_type, varietal_id, region_id, category_id)))
+        varietals = dict(db.session.query(WineVarietal.name, WineVarietal.id).all())
+        regions = dict(db.session.query(WineRegion.name, WineRegion.id).all())
+        traits = dict(db.session.query(WineTrait.name, WineTrait.id).all())
+        categories = dict(db.session.query(WineCategory.name, WineCategory.id).all())
+        seen = set()
+
+        for chunk in self.read_chunks(path):
+            try:
+                self._import_chunk(chunk, wines, varietals, regions, traits, categories, seen, stats)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.logger.error(f"Wine import failed after {stats['rows']} rows: {e}")
+                raise
+
+            stats['seconds'] = round(time.perf_counter() - start, 3)
+            stats['rows_per_second'] = round(stats['rows'] / stats['seconds'], 1) if stats['seconds'] else None
+            self.logger.info(f"Imported {stats['rows']} rows ({stats['rows_per_second']} rows/s)")
+            if progress is not None:
+                progress(stats)
+
+        stats.setdefault('seconds', round(time.perf_counter() - start, 3))
+        stats.setdefault('rows_per_second', None)
+        return stats
+
+    def _import_chunk(self, chunk, wines, varietals, regions, traits, categories, seen, stats):
+        """
+        Upsert one chunk, updating the name -> id dicts in place
+        """
+        stats['rows'] += len(chunk)
+        chunk = chunk[chunk['title'].notna()]
+        parsed = self.parse_titles(chunk['title'])
+        parsed['points'] = chunk['points'] if 'points' in chunk else None
+        parsed['taster'] = chunk['taster_name'] if 'taster_name' in chunk else None
+
+        # The first row of a title wins, across chunks too, so a re-run writes the same values
+        parsed = parsed[parsed['name'].str.len() > 0]
+        parsed = parsed[~parsed['name'].duplicated() & ~parsed['name'].isin(seen)]
+        stats['duplicates'] += len(chunk) - len(parsed)
+        seen.update(parsed['name'])
+
+        stats['varietals_created'] += self._create_missing(WineVarietal, parsed['varietal'], varietals)
+        stats['regions_created'] += self._create_missing(
+            WineRegion, parsed['region'], regions, country=self.country
+        )
+
+        changed_ids = set()
+        inserts, updates = [], []
+        for row in parsed.itertuples(index=False):
+            values = (
+                self._description(row.points, row.taster),
+                row.type,
+                varietals.get(row.varietal),
+                regions.get(row.region),
+                categories.get(f"{row.type} Wine")
+            )
+            existing = wines.get(row.name)
+            if existing is None:
+                inserts.append(dict(zip(
+                    ('name', 'description', 'type', 'varietal_id', 'region_id', 'category_id'), (row.name,) + values
+                )))
+            elif existing[1] != values:
+                updates.append(dict(zip(
+                    ('b_id', 'b_description', 'b_type', 'b_varietal_id', 'b_region_id', 'b_category_id'),
+                    (existing[0],) + values
+                )))
+                wines[row.name] = (existing[0], values)
+        stats['unchanged'] += len(parsed) - len(inserts) - len(updates)
+
+        wine_table = Wine.__table__
+        if inserts:
+            db.session.execute(wine_table.insert(), inserts)
+            names = [row['name'] for row in inserts]
+            created = db.session.query(wine_table.c.id, wine_table.c.name)\
+                .filter(wine_table.c.name.in_(names)).order_by(wine_table.c.id).all()
+            values_by_name = {row['name']: tuple(row[key] for key in (
+                'description', 'type', 'varietal_id', 'region_id', 'category_id'
+            )) for row in inserts}
+            for wine_id, name in created:
+                wines.setdefault(name, (wine_id, values_by_name[name]))
+                changed_ids.add(wine_id)
+            stats['inserted'] += len(inserts)
+        if updates:
+            db.session.execute(
+                wine_table.update().where(wine_table.c.id == bindparam('b_id')).values(
+                    description=bindparam('b_description'),
+                    type=bindparam('b_type'),
+                    varietal_id=bindparam('b_varietal_id'),
+                    region_id=bindparam('b_region_id'),
+                    category_id=bindparam('b_category_id')
+                ),
+                updates
+            )
+            changed_ids.update(row['b_id'] for row in updates)
+            stats['updated'] += len(updates)
+
+        linked = self._link_traits(parsed, wines, traits)
+        stats['traits_linked'] += len(linked)
+        changed_ids.update(wine_id for wine_id, _ in linked)
+        # Core statements bypass the mapper events that feed the search outbox
+        queue_wines(changed_ids)
+
+    @staticmethod
+    def _description(points, taster):
+        if points is None or pd.isna(points):
+            return None
+        if taster is None or pd.isna(taster):
+            return f"Rated {int(points)} points."
+        return f"Rated {int(points)} points by {taster}."
+
+    def _create_missing(self, model, names, ids, **columns):
+        """
+        Bulk insert the ``names`` missing from ``ids`` and add their new ids
+
+        :return: Number of rows created
+        """
+        missing = sorted({name for name in names.dropna() if name not in ids})
+        if not missing:
+            return 0
+        db.session.execute(model.__table__.insert(), [dict(name=name, **columns) for name in missing])
+        ids.update(db.session.query(model.name, model.id).filter(model.name.in_(missing)).all())
+        return len(missing)
+
+    def _link_traits(self, parsed, wines, traits):
+        """
+        Insert the (wine, trait) pairs the titles mention that are not linked yet
+
+        Only existing traits are linked; the trait vocabulary and its
+        categories are owned by ``flask populate-traits``. Wines that gain
+        a trait get a new updated_at, so incremental readers of the
+        catalog (feature store, recommender) re-read their traits.
+
+        :return: The inserted (wine id, trait id) pairs
+        """
+        if not traits:
+            return []
+        known = set(traits)
+        pairs = {
+            (wines[row.name][0], traits[name])
+            for row in parsed.itertuples(index=False)
+            for name in self.trait_names(row.base, known)
+        }
+        if not pairs:
+            return []
+        wine_ids = sorted({wine_id for wine_id, _ in pairs})
+        linked = set(db.session.query(wine_traits.c.wine_id, wine_traits.c.trait_id)
+                     .filter(wine_traits.c.wine_id.in_(wine_ids)).all())
+        missing = sorted(pairs - linked)
+        if missing:
+            db.session.execute(wine_traits.insert(), [
+                {'wine_id': wine_id, 'trait_id': trait_id} for wine_id, trait_id in missing
+            ])
+            wine_table = Wine.__table__
+            db.session.execute(
+                wine_table.update()
+                .where(wine_table.c.id.in_(sorted({wine_id for wine_id, _ in missing})))
+                .values(updated_at=datetime.utcnow())
+            )
+        return missing
@@ -0,0 +1,214 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import case, event, func, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Wine, WineReview, WineStats
+
+
+class WineStatsService:
+    """
+    Backfill and consistency checks of the denormalized WineStats rows
+
+    Day to day the rows are maintained by the flush listener installed
+    with ``register_wine_stats_tracking``; these operations recompute them
+    from wine_reviews after a migration, a bulk load that bypassed the ORM
+    (Core inserts do not fire the listener) or a detected drift.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def backfill(self):
+        """
+        Recompute every stats row from wine_reviews in one transaction
+
+        :return: Number of stats rows written
+        """
+        return self.recompute()
+
+    def recompute(self, wine_ids=None):
+        """
+        Replace the stats rows of ``wine_ids`` (all wines when None) with
+        aggregates of their reviews
+
+        :return: Number of stats rows written
+        """
+        table = WineStats.__table__
+        aggregates = select(
+            WineReview.wine_id,
+            func.sum(WineReview.rating),
+            func.count(WineReview.id),
+            func.avg(WineReview.rating),
+            literal(datetime.utcnow())
+        ).where(WineReview.wine_id.in_(select(Wine.id)))
+        delete = table.delete()
+        if wine_ids is not None:
+            wine_ids = list(wine_ids)
+            aggregates = aggregates.where(WineReview.wine_id.in_(wine_ids))
+            delete = delete.where(table.c.wine_id.in_(wine_ids))
+        aggregates = aggregates.group_by(WineReview.wine_id)
+
+        try:
+            db.session.execute(delete)
+            result = db.session.execute(table.insert().from_select(
+                ['wine_id', 'rating_sum', 'rating_count', 'avg_rating', 'updated_at'], aggregates
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"Recomputing wine stats failed: {e}")
+            raise
+        db.session.expire_all()
+        return result.rowcount
+
+    def check(self, fix=False, tolerance=1e-6):
+        """
+        Compare every stats row with a fresh aggregate of wine_reviews
+
+        :param fix: Recompute the mismatching rows
+        :param tolerance: Allowed absolute difference of sums and averages
+        :return: List of mismatches, each {'wine_id', 'expected', 'actual'}
+                 with (rating_sum, rating_count, avg_rating) tuples (None for
+                 a missing row)
+        """
+        expected = {
+            wine_id: (float(rating_sum), int(rating_count), float(rating_sum) / rating_count)
+            for wine_id, rating_sum, rating_count in db.session.query(
+                WineReview.wine_id, func.sum(WineReview.rating), func.count(WineReview.id)
+            ).filter(WineReview.wine_id.in_(select(Wine.id))).group_by(WineReview.wine_id)
+        }
+        actual = {
+            wine_id: (float(rating_sum), int(rating_count), float(avg_rating))
+            for wine_id, rating_sum, rating_count, avg_rating in db.session.query(
+                WineStats.wine_id, WineStats.rating_sum, WineStats.rating_count, WineStats.avg_rating
+            )
+        }
+
+        mismatches = []
+        for wine_id in sorted(set(expected) | set(actual)):
+            want, have = expected.get(wine_id), actual.get(wine_id)
+            if want is None and have is not None and have[1] == 0:
+                continue
+            if want is None or have is None or want[1] != have[1] or \
+                    abs(want[0] - have[0]) > tolerance or abs(want[2] - have[2]) > tolerance:
+                mismatches.append({'wine_id': wine_id, 'expected': want, 'actual': have})
+
+        if mismatches:
+            self.logger.warning(f"{len(mismatches)} wine stats rows disagree with wine_reviews")
+            if fix:
+                self.recompute([mismatch['wine_id'] for mismatch in mismatches])
+        return mismatches
+
+
+def register_wine_stats_tracking():
+    """
+    Keep WineStats in step with every flushed review insert, rating or
+    wine change and delete, inside the flushing transaction
+    """
+    if event.contains(Session, 'after_flush', _apply_review_deltas):
+        return
+    event.listen(Session, 'after_flush', _apply_review_deltas)
+    event.listen(Session, 'after_flush_postexec', _expire_changed_stats)
+
+
+def _committed(state, key):
+    """
+    Value of an attribute as loaded from the database, before pending changes
+    """
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.attrs[key].value
+
+
+def _review_deltas(session):
+    """
+    {wine_id: [rating sum delta, count delta]} of the reviews being flushed
+    """
+    deltas = {}
+
+    def add(wine_id, rating, sign):
+        if wine_id is None or rating is None:
+            return
+        delta = deltas.setdefault(wine_id, [0.0, 0])
+        delta[0] += sign * float(rating)
+        delta[1] += sign
+
+    for review in session.new:
+        if isinstance(review, WineReview):
+            add(review.wine_id, review.rating, 1)
+    for review in session.deleted:
+        if isinstance(review, WineReview):
+            state = inspect(review)
+            add(_committed(state, 'wine_id'), _committed(state, 'rating'), -1)
+    for review in session.dirty:
+        if not isinstance(review, WineReview):
+            continue
+        state = inspect(review)
+        if state.attrs.rating.history.has_changes() or state.attrs.wine_id.history.has_changes():
+            add(_committed(state, 'wine_id'), _committed(state, 'rating'), -1)
+            add(review.wine_id, review.rating, 1)
+
+    deleted_wines = {wine.id for wine in session.deleted if isinstance(wine, Wine)}
+    return {
+        wine_id: delta for wine_id, delta in deltas.items()
+        if wine_id not in deleted_wines and (delta[1] or abs(delta[0]) > 1e-12)
+    }
+
+
+def _apply_review_deltas(session, flush_context):
+    deltas = _review_deltas(session)
+    if not deltas:
+        return
+
+    table = WineStats.__table__
+    dialect = session.connection().dialect.name
+    for wine_id, (rating_sum, rating_count) in deltas.items():
+        new_sum = table.c.rating_sum + rating_sum
+        new_count = table.c.rating_count + rating_count
+        values = {
+            'rating_sum': new_sum,
+            'rating_count': new_count,
+            'avg_rating': case((new_count > 0, new_sum / new_count), else_=0.0),
+            'updated_at': datetime.utcnow()
+        }
+        if rating_count > 0 and dialect in ('postgresql', 'sqlite'):
+            # Atomic upsert, so concurrent first reviews of a wine cannot collide
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table).values(
+                wine_id=wine_id,
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                avg_rating=rating_sum / rating_count,
+                updated_at=values['updated_at']
+            )
+            session.execute(insert.on_conflict_do_update(index_elements=[table.c.wine_id], set_=values))
+            continue
+
+        result = session.execute(table.update().where(table.c.wine_id == wine_id).values(**values))
+        if result.rowcount == 0 and rating_count > 0:
+            session.execute(table.insert().values(
+                wine_id=wine_id,
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                avg_rating=rating_sum / rating_count,
+                updated_at=values['updated_at']
+            ))
+    session.info.setdefault('wine_stats_changed', set()).update(deltas)
+
+
+def _expire_changed_stats(session, flush_context):
+    """
+    Make loaded WineStats rows and Wine.stats re-read the updated values
+    """
+    wine_ids = session.info.pop('wine_stats_changed', None)
+    if not wine_ids:
+        return
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, WineStats) and obj.wine_id in wine_ids:
+            session.expire(obj)
+        elif isinstance(obj, Wine) and obj.id in wine_ids:
+            session.expire(obj, ['stats'])
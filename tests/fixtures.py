@@ -0,0 +1,32 @@
+import pytest
+from flask import Flask
+
+from extensions import db
+from services.wine_feature_store import register_wine_trait_tracking, wine_feature_store
+from services.wine_stats_service import register_wine_stats_tracking
+
+
+@pytest.fixture
+def catalog_app(tmp_path):
+    """
+    Minimal app over an empty SQLite catalog, without the services that
+    create_app pulls in
+
+    Review stats and trait link tracking are registered as create_app does;
+    wine features are built in memory (WINE_FEATURE_STORE_DIR is None).
+    Modules import this fixture and seed their own data on top of it.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'catalog.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['WINE_FEATURE_STORE_DIR'] = None
+    db.init_app(app)
+    register_wine_stats_tracking()
+    register_wine_trait_tracking()
+    with app.app_context():
+        db.create_all()
+        wine_feature_store.features = None
+        yield app
+        wine_feature_store.features = None
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from extensions import db
+from models import User, Wine, WineRegion, WineReview, WineTrait, WineVarietal
+from services.local_search_service import LocalSearchIndex, local_search_service, tokenize
+from services.search_service import SearchService
+from services.wine_discovery_service import WineDiscoveryService
+from tests.fixtures import catalog_app
+
+
+@pytest.fixture
+def search_app(catalog_app, tmp_path):
+    """Small catalog searched through the local backend"""
+    catalog_app.config['LOCAL_SEARCH_INDEX_DIR'] = str(tmp_path / 'search')
+    catalog_app.config['SEARCH_BACKEND'] = 'local'
+    oak, cherry = WineTrait(name='oak', category='notes'), WineTrait(name='black_cherry', category='aroma')
+    napa, sonoma = WineRegion(name='Napa Valley'), WineRegion(name='Sonoma')
+    cabernet = WineVarietal(name='Cabernet Sauvignon')
+    user = User(username='taster', email='taster@example.com')
+    wines = [
+        Wine(name='Napa Cabernet', type='Red', price=45.0, region=napa, varietal=cabernet,
+             description='Cabernet with black cherry and cedar', traits=[oak, cherry]),
+        Wine(name='Sonoma Chardonnay', type='White', price=18.0, region=sonoma,
+             description='Buttery chardonnay aged in oak', traits=[oak]),
+        Wine(name='Cabernet Rosé', type='Rosé', price=120.0, region=napa, varietal=cabernet,
+             description='Dry rosé of cabernet'),
+        Wine(name='House Red', type='Red', description='Easy drinking red')
+    ]
+    db.session.add_all(wines + [user])
+    db.session.flush()
+    db.session.add_all([
+        WineReview(user_id=user.id, wine_id=wines[1].id, rating=5),
+        WineReview(user_id=user.id, wine_id=wines[2].id, rating=3)
+    ])
+    db.session.commit()
+    local_search_service.index = None
+    yield catalog_app
+    local_search_service.index = None
+
+
+def names(results):
+    return [wine['name'] for wine in results['wines']]
+
+
+def test_tokenize():
+    assert tokenize('Rosé of Black_Cherry, 2014!') == ['rose', 'of', 'black', 'cherry', '2014']
+
+
+def test_text_search_ranks_boosted_fields(search_app):
+    results = SearchService().advanced_search({'q': 'cabernet'})
+    # Name matches (boost 3) outrank the description-only match
+    assert names(results) == ['Napa Cabernet', 'Cabernet Rosé']
+    assert results['total'] == 2
+    assert names(SearchService().advanced_search({'q': 'cherry'})) == ['Napa Cabernet']
+    assert SearchService().advanced_search({'q': 'zinfandel'})['total'] == 0
+
+
+def test_filters_sort_and_aggregations(search_app):
+    service = SearchService()
+    results = service.advanced_search({'traits': 'oak,black_cherry', 'sort': 'price_asc'})
+    assert names(results) == ['Sonoma Chardonnay', 'Napa Cabernet']
+    assert names(service.advanced_search({'type': 'Red', 'price_min': 40.0})) == ['Napa Cabernet']
+    assert names(service.advanced_search({'sort': 'price_desc'}))[-1] == 'House Red'
+    assert names(service.advanced_search({'sort': 'rating', 'per_page': 2, 'page': 1})) == \
+        ['Sonoma Chardonnay', 'Cabernet Rosé']
+
+    results = service.advanced_search({'page': 2, 'per_page': 3})
+    assert names(results) == ['House Red']
+    assert results['pagination'] == {'page': 2, 'per_page': 3, 'total_pages': 2}
+    assert results['aggregations']['wine_types'] == [
+        {'key': 'Red', 'doc_count': 2}, {'key': 'Rosé', 'doc_count': 1}, {'key': 'White', 'doc_count': 1}
+    ]
+    assert [bucket['doc_count'] for bucket in results['aggregations']['price_ranges']] == [1, 1, 0, 1]
+    assert service.suggest_wines('cab') == ['Cabernet Rosé']
+    assert service.suggest_wines('napa c') == ['Napa Cabernet']
+
+
+def test_discovery_service_falls_back_to_local_index(search_app):
+    search_app.config['SEARCH_BACKEND'] = 'elasticsearch'
+    service = WineDiscoveryService()
+    service.es = None
+    results = service.advanced_search({'query': 'cabernet', 'region': ['Napa Valley'],
+                                       'grape_variety': ['Cabernet Sauvignon'], 'max_price': 100.0})
+    assert results == {'total': 1, 'wines': [local_search_service.get().documents[0]]}
+
+
+def test_index_is_persisted_and_memory_mapped(search_app):
+    built = local_search_service.get()
+    loaded = LocalSearchIndex.load(search_app.config['LOCAL_SEARCH_INDEX_DIR'])
+    assert isinstance(loaded.postings['name']['docs'], np.memmap)
+    assert loaded.version == built.version
+    assert np.allclose(loaded.score('oak cabernet'), built.score('oak cabernet'))
+    assert loaded.search(text='oak')[1] == 2
@@ -0,0 +1,51 @@
+import numpy as np
+import scipy.sparse as sparse
+from utils.matrix_factorization import ImplicitALS
+
+def block_interactions():
+    """Two user groups that each only interact with their own wines"""
+    rng = np.random.default_rng(0)
+    rows, cols = [], []
+    for user in range(20):
+        group = user % 2
+        for item in rng.choice(np.arange(group * 10, group * 10 + 10), 6, replace=False):
+            rows.append(user)
+            cols.append(item)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(20, 20))
+
+def test_als_factors_are_float32_and_learn_groups():
+    """Test ALS recommends unseen wines from the user's own group"""
+    matrix = block_interactions()
+
+    als = ImplicitALS(factors=4, iterations=8).fit(matrix)
+
+    assert als.user_factors.dtype == np.float32 and als.user_factors.shape == (20, 4)
+    assert als.item_factors.dtype == np.float32 and als.item_factors.shape == (20, 4)
+    for user in range(20):
+        seen = matrix[user].indices
+        top, _ = als.recommend(als.user_factors[user], exclude=seen, k=2)
+        assert not set(top) & set(seen)
+        assert all(item // 10 == user % 2 for item in top)
+
+def test_als_half_step_solves_normal_equations():
+    """Test the batched CG solve against a direct solve"""
+    matrix = block_interactions()
+    als = ImplicitALS(factors=3, regularization=0.5, alpha=2.0, iterations=1, cg_steps=20).fit(matrix)
+
+    X = als.user_factors.astype(np.float64)
+    confidence = 1 + 2.0 * matrix.toarray()
+    preference = (matrix.toarray() > 0).astype(np.float64)
+    for item in range(20):
+        A = X.T.dot(X * confidence[:, [item]]) + 0.5 * np.eye(3)
+        b = X.T.dot(confidence[:, item] * preference[:, item])
+        assert np.allclose(np.linalg.solve(A, b), als.item_factors[item], atol=1e-4)
+
+def test_als_fold_in_new_user():
+    """Test folding in a user unseen during training"""
+    matrix = block_interactions()
+    als = ImplicitALS(factors=4, iterations=8).fit(matrix)
+
+    vector = als.fold_in(sparse.csr_matrix(([1.0, 1.0], ([0, 0], [11, 12])), shape=(1, 20)))
+    top, _ = als.recommend(vector, exclude=np.array([11, 12]), k=3)
+
+    assert all(item >= 10 for item in top)
@@ -0,0 +1,54 @@
+import pytest
+from flask import Flask
+
+from extensions import cache
+from services.recommendation_cache import RecommendationCache
+
+class CountingEngine:
+    """Engine double that ranks wine ids by user and counts computations"""
+
+    def __init__(self, version):
+        self.model = type('Model', (), {'version': version})()
+        self.calls = 0
+
+    def get_personalized_wine_ids(self, user_id, limit):
+        self.calls += 1
+        return list(range(user_id * 100, user_id * 100 + limit))
+
+@pytest.fixture
+def cache_app():
+    app = Flask(__name__)
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+    with app.app_context():
+        cache.clear()
+        yield app
+
+def test_cache_hits_smaller_limits_and_model_version(cache_app):
+    """Test entries serve smaller limits and expire with the model version"""
+    recommendations = RecommendationCache()
+    engine = CountingEngine('v1')
+
+    assert recommendations.get_wine_ids(engine, 1, 5) == ([100, 101, 102, 103, 104], False)
+    assert recommendations.get_wine_ids(engine, 1, 3) == ([100, 101, 102], True)
+    assert recommendations.get_wine_ids(engine, 1, 8)[1] is False
+
+    engine.model.version = 'v2'
+    assert recommendations.get_wine_ids(engine, 1, 3)[1] is False
+    assert engine.calls == 3
+
+def test_cache_invalidate_and_stats(cache_app):
+    """Test per-user invalidation and hit rate reporting"""
+    recommendations = RecommendationCache()
+    engine = CountingEngine('v1')
+    recommendations.get_wine_ids(engine, 1, 5)
+    recommendations.get_wine_ids(engine, 2, 5)
+
+    recommendations.invalidate(1)
+
+    assert recommendations.get_wine_ids(engine, 1, 5)[1] is False
+    assert recommendations.get_wine_ids(engine, 2, 5)[1] is True
+    recommendations.record_latency(0.002, True)
+    stats = recommendations.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 3
+    assert stats['hit_rate'] == 0.25
+    assert stats['latency_hit']['p50_ms'] == 2.0
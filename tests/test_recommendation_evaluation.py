@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from extensions import db
+from models import ModelPerformanceMetric, User, UserWineInteraction, Wine, WineReview, WineTrait
+from services.recommendation_evaluation import RecommendationEvaluator, _score_users, _worker
+from services.recommendation_service import RecommendationEngine
+from tests.fixtures import catalog_app
+from tests.test_recommendations import build_test_model
+
+@pytest.fixture
+def evaluation_model():
+    app = Flask(__name__)
+    model = build_test_model()
+    model.wine_df['avg_rating'] = [3.0, 4.0, 1.0]
+    with app.app_context():
+        _worker.update(model=model, engine=RecommendationEngine())
+        yield model
+    _worker.clear()
+
+@pytest.fixture
+def evaluation_app(catalog_app):
+    """Catalog with interactions on both sides of 2024-06-10"""
+    catalog_app.config['RECOMMENDATION_ALS_FACTORS'] = 2
+    catalog_app.config['RECOMMENDATION_ALS_ITERATIONS'] = 2
+    oak = WineTrait(name='oak', category='notes')
+    wines = [Wine(name=f'Wine {i}', type='Red', price=10.0 * i, traits=[oak]) for i in range(1, 5)]
+    users = [User(username=f'taster{i}', email=f'taster{i}@example.com') for i in range(1, 4)]
+    db.session.add_all(wines + users)
+    db.session.flush()
+
+    def interaction(user, wine, day, weight=1.0):
+        return UserWineInteraction(user_id=users[user].id, wine_id=wines[wine].id, interaction_type='like',
+                                   interaction_weight=weight, created_at=datetime(2024, 6, day))
+
+    db.session.add_all([
+        interaction(0, 0, 1), interaction(1, 1, 1), interaction(2, 2, 1), interaction(0, 1, 2),
+        # Held out from 2024-06-10: new positive wines only
+        interaction(0, 2, 10), interaction(0, 0, 11), interaction(1, 3, 12), interaction(2, 3, 12, weight=-1.0)
+    ])
+    db.session.commit()
+    yield catalog_app
+    _worker.clear()
+
+def test_score_users_ranking_metrics(evaluation_model):
+    """Test precision/recall/NDCG totals of trait ranking against held-out wines"""
+    users = [
+        # (user id, preferred traits, price range, held-out wine indices)
+        (3, [10], None, [1]),  # ranked [1, 0]: hit at rank 1
+        (1, [11], None, [1]),  # wines 0 and 2 already seen, ranked [1]
+        (4, [11], None, [1])   # ranked [0, 2]: miss
+    ]
+
+    totals = _score_users('traits', 2, users)
+
+    assert totals['precision'] == pytest.approx(1.0)
+    assert totals['recall'] == pytest.approx(2.0)
+    assert totals['ndcg'] == pytest.approx(2.0)
+    assert totals['hits'] == 2
+    assert totals['recommended'] == {0, 1, 2}
+
+    metrics = RecommendationEvaluator(k=2, workers=1)._metrics(totals, len(users), 3, 0.5)
+    assert metrics['precision'] == pytest.approx(1 / 3)
+    assert metrics['f1_score'] == pytest.approx(2 * (1 / 3) * (2 / 3) / 1)
+    assert metrics['coverage'] == 1.0
+
+def test_split_boundaries(evaluation_app):
+    """Test the cutoff is inclusive and only new, positive interactions are held out"""
+    evaluator = RecommendationEvaluator(k=2, test_fraction=0.5, workers=1)
+
+    cutoff, held_out = evaluator.split(datetime(2024, 6, 10))
+    # User 1 saw wine 1 before the cutoff; user 3's interaction is negative
+    assert cutoff == datetime(2024, 6, 10)
+    assert held_out == {1: {3}, 2: {4}}
+
+    assert evaluator.split(datetime(2024, 6, 11))[1] == {2: {4}}
+    assert evaluator.split(datetime(2024, 7, 1))[1] == {}
+
+    # The default cutoff holds out the newest half of the interactions
+    assert evaluator.split() == (datetime(2024, 6, 10), {1: {3}, 2: {4}})
+
+def test_evaluation_model_only_sees_reviews_before_the_cutoff(evaluation_app):
+    """Test review aggregates of the evaluation model are cut at the split"""
+    db.session.add_all([
+        WineReview(user_id=1, wine_id=1, rating=2, created_at=datetime(2024, 6, 1)),
+        WineReview(user_id=2, wine_id=1, rating=5, created_at=datetime(2024, 6, 11)),
+        WineReview(user_id=3, wine_id=2, rating=5, created_at=datetime(2024, 6, 11))
+    ])
+    db.session.commit()
+
+    model = RecommendationEvaluator(k=2, workers=1).build_model(datetime(2024, 6, 10))
+    assert model.wine_df.loc[[1, 2], 'avg_rating'].tolist() == [2.0, 0.0]
+    assert model.wine_df.loc[[1, 2], 'total_reviews'].tolist() == [1, 0]
+    # The live model still counts every review
+    assert RecommendationEngine()._load_wine_data().loc[1, 'total_reviews'] == 2
+
+def test_evaluate_in_worker_processes_and_save_metrics(evaluation_app):
+    """Test a pooled evaluation run and the metric rows it records"""
+    evaluator = RecommendationEvaluator(k=2, workers=2)
+
+    results = evaluator.evaluate(modes=('popularity', 'traits'), cutoff=datetime(2024, 6, 10))
+
+    assert set(results) == {'popularity', 'traits'}
+    for metrics in results.values():
+        assert metrics['users'] == 2
+        assert 0.0 <= metrics['precision'] <= 1.0
+        assert 0.0 <= metrics['hit_rate'] <= 1.0
+    rows = ModelPerformanceMetric.query.order_by(ModelPerformanceMetric.model_name).all()
+    assert [row.model_name for row in rows] == ['recommendation:popularity', 'recommendation:traits']
+    assert rows[0].model_version == 'eval-20240610000000'
+    assert rows[0].accuracy == results['popularity']['hit_rate']
+    assert rows[0].training_dataset_size == 4
+    assert rows[0].training_environment['test_interactions'] == 2
+    assert rows[0].training_environment['workers'] == 2
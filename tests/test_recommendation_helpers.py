@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+from utils.recommendation_helpers import RecommendationHelper, IVFIndex
+
+def test_build_interaction_matrix_shape_and_values():
+    """Test sparse interaction matrix construction"""
+    matrix, user_ids, wine_ids = RecommendationHelper.build_interaction_matrix(
+        [3, 1, 3], [10, 20, 30], [1.0, 2.0, 3.0]
+    )
+
+    assert list(user_ids) == [1, 3]
+    assert list(wine_ids) == [10, 20, 30]
+    assert matrix.shape == (2, 3)
+    assert matrix.toarray().tolist() == [[0, 2, 0], [1, 0, 3]]
+
+def test_build_interaction_matrix_last_weight_wins():
+    """Test duplicate user/wine pairs keep the latest weight"""
+    matrix, _, _ = RecommendationHelper.build_interaction_matrix(
+        [1, 1, 1], [5, 5, 6], [1.0, 3.0, 2.0]
+    )
+
+    assert matrix.nnz == 2
+    assert matrix[0, 0] == 3.0
+
+def test_build_interaction_matrix_includes_catalog_wines():
+    """Test catalog wines without interactions still get a column"""
+    matrix, _, wine_ids = RecommendationHelper.build_interaction_matrix(
+        [1], [5], [1.0], catalog_wine_ids=[4, 5, 9]
+    )
+
+    assert list(wine_ids) == [4, 5, 9]
+    assert matrix.shape == (1, 3)
+    assert matrix.toarray().tolist() == [[0, 1, 0]]
+
+def test_build_interaction_matrix_empty():
+    """Test building from no interactions"""
+    matrix, user_ids, wine_ids = RecommendationHelper.build_interaction_matrix([], [], [])
+
+    assert matrix.shape == (0, 0)
+    assert len(user_ids) == 0
+
+def test_update_interaction_matrix_overwrites_and_grows():
+    """Test incremental interaction updates"""
+    matrix, _, _ = RecommendationHelper.build_interaction_matrix(
+        [1, 2], [10, 20], [1.0, 2.0]
+    )
+
+    updated = RecommendationHelper.update_interaction_matrix(
+        matrix, [0, 2, 2], [0, 2, 2], [5.0, 1.0, 4.0], shape=(3, 3)
+    )
+
+    assert updated.shape == (3, 3)
+    assert updated.toarray().tolist() == [[5, 0, 0], [0, 2, 0], [0, 0, 4]]
+    assert matrix.shape == (2, 2)
+
+def test_top_k_similar_matches_brute_force():
+    """Test blocked top-k neighbours against a dense cosine computation"""
+    vectors = sparse.random(60, 12, density=0.3, format='csr', random_state=1)
+
+    neighbours, scores = RecommendationHelper.top_k_similar(vectors, k=4, max_block_elements=60 * 7)
+
+    dense = vectors.toarray()
+    dense /= np.maximum(np.linalg.norm(dense, axis=1, keepdims=True), 1e-12)
+    similarity = dense @ dense.T
+    np.fill_diagonal(similarity, -np.inf)
+    expected = np.sort(similarity, axis=1)[:, ::-1][:, :4]
+
+    assert neighbours.dtype == np.int32 and scores.dtype == np.float32
+    assert np.allclose(scores, np.where(expected > 0, expected, 0), atol=1e-5)
+    assert not (neighbours == np.arange(60)[:, None]).any()
+
+def test_build_incidence_matrix_ignores_unknown_ids():
+    """Test binary incidence matrix built from id pairs"""
+    matrix = RecommendationHelper.build_incidence_matrix(
+        [7, 7, 3, 9], [1, 2, 2, 1], row_ids=[7, 3], col_ids=[2, 1]
+    )
+
+    assert matrix.toarray().tolist() == [[1, 1], [1, 0]]
+
+def test_pack_bitsets_and_popcount():
+    """Test packed trait bitsets across a 64-bit word boundary"""
+    incidence = RecommendationHelper.build_incidence_matrix(
+        [1, 1, 1, 2], [0, 63, 64, 64], row_ids=[1, 2], col_ids=range(130)
+    )
+
+    bitsets = RecommendationHelper.pack_bitsets(incidence)
+
+    assert bitsets.dtype == np.uint64 and bitsets.shape == (2, 3)
+    assert RecommendationHelper.popcount(bitsets).sum(axis=1).tolist() == [3, 1]
+    assert RecommendationHelper.popcount(bitsets[0] & bitsets[1]).sum() == 1
+
+def test_vectorized_similarities_match_pairwise_helpers():
+    """Test cosine and Jaccard against the pairwise helpers"""
+    matrix = RecommendationHelper.build_incidence_matrix(
+        [1, 1, 2, 3, 3, 3], [0, 1, 1, 0, 1, 2], row_ids=[1, 2, 3, 4], col_ids=[0, 1, 2]
+    )
+    vector = RecommendationHelper.build_incidence_matrix([0, 0], [1, 2], row_ids=[0], col_ids=[0, 1, 2])
+    dense, query = matrix.toarray(), vector.toarray()[0]
+
+    cosine = RecommendationHelper.cosine_similarities(matrix, vector)
+    jaccard = RecommendationHelper.jaccard_similarities(matrix, vector)
+
+    for row in range(3):
+        assert cosine[row] == pytest.approx(RecommendationHelper.cosine_similarity(dense[row], query))
+        assert jaccard[row] == pytest.approx(RecommendationHelper.jaccard_similarity(set(np.flatnonzero(dense[row])), {1, 2}))
+    assert cosine[3] == 0 and jaccard[3] == 0
+
+def test_replace_rows_grows_and_copies():
+    """Test row replacement leaves the original matrix untouched"""
+    matrix = sparse.csr_matrix(np.array([[1, 0], [0, 2]], dtype=np.float32))
+    new_rows = sparse.csr_matrix(np.array([[3, 3], [0, 4]], dtype=np.float32))
+
+    replaced = RecommendationHelper.replace_rows(matrix, [1, 2], new_rows, n_rows=3)
+
+    assert replaced.toarray().tolist() == [[1, 0], [3, 3], [0, 4]]
+    assert matrix.toarray().tolist() == [[1, 0], [0, 2]]
+
+def test_ivf_index_matches_brute_force_when_probing_every_list(tmp_path):
+    """Test IVF query, exclusion and save/load against exact inner-product search"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 8)).astype(np.float32)
+    query = rng.standard_normal(8).astype(np.float32)
+    index = IVFIndex(n_lists=10).build(vectors)
+    exact = RecommendationHelper.top_k(vectors.dot(query), 5)
+
+    items, scores = index.query(query, 5, n_probe=10)
+    assert items.tolist() == exact.tolist()
+    assert np.allclose(scores, vectors[exact].dot(query))
+    assert sorted(index.list_items.tolist()) == list(range(500))
+
+    excluded, _ = index.query(query, 5, n_probe=10, exclude=exact[:2])
+    assert excluded.tolist() == RecommendationHelper.top_k(
+        np.where(np.isin(np.arange(500), exact[:2]), -np.inf, vectors.dot(query)), 5
+    ).tolist()
+
+    index.save(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path))
+    assert loaded.query(query, 5, n_probe=10)[0].tolist() == exact.tolist()
+
+def test_blend_scores_normalizes_weights_and_masks():
+    """Test vectorized blending against the per-item weighted score"""
+    signals = {
+        'rating': np.array([5.0, 1.0, 3.0, 4.0]),
+        'popularity': np.array([0.0, 100.0, 50.0, np.nan]),
+        'unused': np.array([9.0, 9.0, 9.0, 0.0])
+    }
+    exclude = np.array([False, False, False, True])
+
+    top, scores = RecommendationHelper.blend_scores(signals, {'rating': 1.0, 'popularity': 1.0}, exclude=exclude, k=4)
+
+    # rating over eligible 1..5 -> [1, 0, .5]; popularity 0..100 -> [0, 1, .5]
+    assert sorted(top.tolist()) == [0, 1, 2]
+    assert np.allclose(scores, 1.0)
+    top, _ = RecommendationHelper.blend_scores(signals, {'rating': 0.8, 'popularity': 0.2}, k=2)
+    assert top.tolist() == [0, 3]
@@ -1,5 +1,38 @@
+import numpy as np
+import pandas as pd
 import pytest
-from services.recommendation_service import RecommendationEngine
+from datetime import datetime
+from flask import Flask
+from services.recommendation_service import RecommendationEngine, RecommendationModel, WINE_COLUMNS
+from utils.content_vectorizer import ContentVectorizer
+from utils.recommendation_helpers import RecommendationHelper
+
+def build_test_model():
+    """Build a small in-memory recommendation model"""
+    wine_df = pd.DataFrame([
+        [wine_id, f'Wine {wine_id}', 'Red', 'Merlot', 'Napa', '', 10.0 * wine_id, 13.5, 4.0, 2]
+        for wine_id in (1, 2, 3)
+    ], columns=WINE_COLUMNS)
+    wine_df.index = pd.Index(wine_df['id'].values)
+    matrix, user_ids, wine_ids = RecommendationHelper.build_interaction_matrix(
+        [1, 1, 2], [1, 3, 2], [1.0, 3.0, 2.0], catalog_wine_ids=wine_df['id'].values
+    )
+    return RecommendationModel(
+        wine_df=wine_df,
+        interaction_matrix=matrix,
+        user_ids=user_ids,
+        wine_ids=wine_ids,
+        wine_trait_matrix=RecommendationHelper.build_incidence_matrix(
+            [1, 1, 2, 3], [10, 11, 10, 11], wine_ids, [10, 11]
+        ),
+        user_trait_matrix=RecommendationHelper.build_incidence_matrix(
+            [1, 2, 2], [10, 10, 11], user_ids, [10, 11]
+        ),
+        trait_ids=[10, 11],
+        watermark=datetime(2024, 1, 1),
+        version='20240101000000000000',
+        built_at=datetime(2024, 1, 1)
+    )
 
 def test_recommendation_engine(test_wines):
     """Test recommendation engine functionality"""
@@ -23,4 +56,134 @@ def test_collaborative_filtering(test_wines, test_user):
     
     recommendations = recommendation_engine.collaborative_filter(user_interactions)
     
-    assert len(recommendations) > 0
\ No newline at end of file
+    assert len(recommendations) > 0
+
+def is_memory_mapped(array):
+    """Check whether an array is (a view of) a numpy memmap"""
+    while array is not None and not isinstance(array, np.memmap):
+        array = array.base
+    return array is not None
+
+def test_model_snapshot_round_trip(tmp_path):
+    """Test persisting and memory-mapping a model snapshot"""
+    model = build_test_model()
+    model.save(str(tmp_path))
+
+    loaded = RecommendationModel.load(str(tmp_path))
+
+    assert loaded.version == model.version
+    assert loaded.user_ids == model.user_ids
+    assert loaded.wine_ids == model.wine_ids
+    assert (loaded.interaction_matrix != model.interaction_matrix).nnz == 0
+    assert (loaded.interaction_matrix_csc != model.interaction_matrix_csc).nnz == 0
+    assert is_memory_mapped(loaded.interaction_matrix.data)
+    assert is_memory_mapped(loaded.interaction_matrix_csc.indices)
+    assert loaded.wine_df.equals(model.wine_df)
+    assert loaded.trait_ids == model.trait_ids
+    assert (loaded.wine_trait_matrix != model.wine_trait_matrix).nnz == 0
+    assert (loaded.user_trait_matrix != model.user_trait_matrix).nnz == 0
+
+def test_model_snapshot_missing(tmp_path):
+    """Test loading when no snapshot has been written"""
+    assert RecommendationModel.load(str(tmp_path)) is None
+
+def test_similar_wines_table(tmp_path):
+    """Test precomputed similar-wines lookups survive a snapshot round trip"""
+    model = build_test_model().compute_similar_wines(k=2)
+
+    similar = model.similar_wine_ids(1)
+    assert [wine_id for wine_id, _ in similar] == [3, 2]
+    assert similar[0][1] > similar[1][1]
+    assert model.similar_wine_ids(99) == []
+
+    model.save(str(tmp_path))
+    loaded = RecommendationModel.load(str(tmp_path))
+    assert is_memory_mapped(loaded.similar_wines)
+    assert loaded.similar_wine_ids(1) == similar
+
+def test_rank_by_traits():
+    """Test trait bitset scoring excludes interacted wines"""
+    model = build_test_model()
+
+    assert model.trait_match_counts([10, 11]).tolist() == [2, 1, 1]
+    assert list(RecommendationEngine()._rank_by_traits(model, [10], limit=2)) == [0, 1]
+    # User 1 already interacted with wines 1 and 3
+    assert list(RecommendationEngine()._rank_by_traits(model, [10, 11], user_id=1, limit=3)) == [1]
+
+def test_rank_by_neighbours():
+    """Test neighbour interactions are blended and own wines excluded"""
+    model = build_test_model()
+    engine = RecommendationEngine()
+
+    # A new user preferring trait 11 only matches user 2, who liked wine 2
+    assert list(engine._rank_by_neighbours(model, [11], limit=3)) == [1]
+    # User 2's neighbour is user 1 (wines 1 and 3, weights 1 and 3)
+    assert list(engine._rank_by_neighbours(model, [10, 11], user_id=2, limit=3)) == [2, 0]
+    assert len(engine._rank_by_neighbours(model, [99], limit=3)) == 0
+
+def test_content_vectorizer_restores_without_refit():
+    """Test a vectorizer rebuilt from vocabulary and idf vectorizes identically"""
+    vectorizer = ContentVectorizer()
+    matrix = vectorizer.fit_transform(['dry red cherry oak', 'sweet white apple', 'dry white citrus'])
+    restored = ContentVectorizer(vocabulary=vectorizer.vocabulary, idf=vectorizer.idf)
+
+    assert (restored.transform(['dry red cherry oak', 'sweet white apple', 'dry white citrus']) != matrix).nnz == 0
+    similarities = matrix.dot(restored.transform(['red cherry']).T).toarray().ravel()
+    assert similarities.argmax() == 0 and np.allclose(np.sqrt(matrix.multiply(matrix).sum(axis=1)), 1)
+
+def test_price_fit():
+    """Test price fit inside, outside and without a preferred range"""
+    prices = np.array([10.0, 30.0, 50.0, np.nan], dtype=np.float32)
+
+    fit = RecommendationEngine._price_fit(prices, {'min': 20, 'max': 40})
+    assert fit.tolist() == pytest.approx([2 / 3, 1.0, 2 / 3, 0.0])
+    assert RecommendationEngine._price_fit(prices, [None, 30]).tolist() == pytest.approx([1.0, 1.0, 0.6, 0.0])
+    assert not RecommendationEngine._price_fit(prices, None).any()
+
+def test_popular_segments_and_cold_start_ranking():
+    """Test per-segment popularity tables, incremental refresh and exclusion"""
+    model = build_test_model()
+    model.wine_df['avg_rating'] = [1.0, 3.0, 2.0]
+    model.compute_popular_segments()
+
+    # One interaction and two reviews each, so the rating breaks the tie
+    assert model.popular_segments[('all', None)].tolist() == [1, 2, 0]
+    assert model.popular_segments[('price_band', '0-20')].tolist() == [0]
+    assert model.popular_segments[('price_band', '20-50')].tolist() == [1, 2]
+    assert model.popular_segments[('type', 'Red')].tolist() == [1, 2, 0]
+
+    engine = RecommendationEngine()
+    assert engine._rank_by_popularity(model, [('price_band', '0-20')], limit=2).tolist() == [0, 1]
+    # User 1 already interacted with wines 1 and 3
+    assert engine._rank_by_popularity(model, None, user_id=1, limit=3).tolist() == [1]
+
+    patched = model.copy()
+    patched.wine_df = model.wine_df.copy()
+    patched.wine_df.loc[3, 'price'] = 5.0
+    patched.compute_popular_segments(wine_indices=[2])
+    assert patched.popular_segments[('price_band', '0-20')].tolist() == [2, 0]
+    assert patched.popular_segments[('price_band', '20-50')].tolist() == [1]
+    assert model.popular_segments[('price_band', '20-50')].tolist() == [1, 2]
+
+def test_failed_rebuild_backs_off(monkeypatch):
+    """Test a failing build is remembered and not retried until the backoff passes"""
+    engine = RecommendationEngine()
+    app = Flask(__name__)
+    app.config['RECOMMENDATION_REBUILD_RETRY_SECONDS'] = 60
+
+    def fail():
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(engine, '_build_model', fail)
+    monkeypatch.setattr(engine, 'failures', 0)
+    monkeypatch.setattr(engine, 'last_error', None)
+    monkeypatch.setattr(engine, 'last_failure_at', None)
+    with app.app_context():
+        assert engine.retry_due()
+        with pytest.raises(RuntimeError):
+            engine.rebuild()
+        assert engine.model_info()['last_error'] == 'database unavailable'
+        assert not engine.retry_due()
+
+        engine.last_failure_at = datetime(2000, 1, 1)
+        assert engine.retry_due()
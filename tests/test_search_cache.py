@@ -0,0 +1,54 @@
+import pytest
+from flask import Flask
+
+from extensions import cache
+from services.search_cache import SearchCache, canonical_query, search_cache
+from services.search_service import SearchService
+
+class CountingSearchService(SearchService):
+    """SearchService whose Elasticsearch query is replaced by a counter"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def _elasticsearch_search(self, query_params):
+        self.calls += 1
+        return {'wines': [{'id': self.calls}], 'total': 1}
+
+@pytest.fixture
+def cache_app():
+    app = Flask(__name__)
+    app.config['SEARCH_BACKEND'] = 'elasticsearch'
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+    with app.app_context():
+        cache.clear()
+        yield app
+
+def test_canonical_query_normalizes_equivalent_requests():
+    """Test text, trait, price and paging normalization"""
+    assert canonical_query({'q': '  Black   Cherry ', 'traits': 'oak,black_cherry,oak', 'price_max': 50}) == \
+        canonical_query({'q': 'black cherry', 'traits': ['black_cherry', 'oak'], 'price_max': 50.0,
+                         'page': 1, 'per_page': 20, 'type': ''})
+    assert canonical_query({'price_min': '19.999', 'per_page': '10'}) == \
+        {'page': 1, 'per_page': 10, 'price_min': 20.0}
+    assert canonical_query({'type': 'Red'}) != canonical_query({'type': 'White'})
+
+def test_advanced_search_is_cached_per_index_version(cache_app):
+    """Test identical queries hit until the index version changes"""
+    service = CountingSearchService()
+    first = service.advanced_search({'q': 'Cabernet', 'traits': 'oak,dry'})
+    assert service.advanced_search({'q': 'cabernet ', 'traits': 'dry,oak', 'page': 1}) == first
+    assert service.advanced_search({'q': 'cabernet', 'page': 2})['wines'] == [{'id': 2}]
+    assert service.calls == 2
+
+    search_cache.bump_version('wine_index-20261018000000000000')
+    assert service.advanced_search({'q': 'cabernet', 'traits': 'oak,dry'})['wines'] == [{'id': 3}]
+    assert service.calls == 3
+
+def test_cache_stats(cache_app):
+    """Test hit rate reporting"""
+    searches = SearchCache()
+    searches.fetch({'q': 'merlot'}, lambda params: {'total': 0})
+    searches.fetch({'q': 'Merlot'}, lambda params: {'total': 0})
+    assert searches.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
@@ -0,0 +1,95 @@
+import json
+import threading
+
+import pytest
+
+from extensions import db
+from models import Wine, WineTrait, WineVarietal
+from services.elasticsearch_service import ElasticsearchService
+from services.search_indexer import BulkIndexer
+from tests.fixtures import catalog_app
+
+
+class Unavailable(Exception):
+    status_code = 503
+
+
+class FakeElasticsearch:
+    """Stand-in client recording bulk bodies, with scripted failures"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.bodies = []
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def bulk(self, body):
+        with self.lock:
+            failure = self.failures.pop(0) if self.failures else None
+            if isinstance(failure, Exception):
+                raise failure
+            lines = body.decode('utf-8').splitlines()
+            self.bodies.append(body)
+            items = []
+            for action, source in zip(lines[::2], lines[1::2]):
+                meta = json.loads(action)['index']
+                status = failure(meta['_id']) if failure else 201
+                if status < 300:
+                    self.documents[meta['_id']] = json.loads(source)
+                items.append({'index': {'_id': meta['_id'], 'status': status}})
+            return {'errors': any(item['index']['status'] >= 300 for item in items), 'items': items}
+
+
+@pytest.fixture
+def indexer_app(catalog_app):
+    """Catalog of 50 wines"""
+    oak = WineTrait(name='oak', category='notes')
+    merlot = WineVarietal(name='Merlot')
+    db.session.add_all([
+        Wine(name=f'Wine {i}', description='x' * 100, type='Red', price=10.0 + i,
+             varietal=merlot, traits=[oak] if i % 2 else [])
+        for i in range(50)
+    ])
+    db.session.commit()
+    return catalog_app
+
+
+def test_streams_size_capped_chunks_in_parallel(indexer_app):
+    es = FakeElasticsearch()
+    indexer = BulkIndexer(es, 'wines', chunk_bytes=2000, workers=3, batch_size=7)
+    stats = indexer.index_wines()
+
+    assert (stats['indexed'], stats['failed'], stats['retries']) == (50, 0, 0)
+    assert stats['chunks'] == len(es.bodies) > 1
+    assert all(len(body) <= 2000 for body in es.bodies)
+    assert stats['docs_per_second'] > 0 and stats['peak_rss_mb'] > 0
+    assert sorted(es.documents) == list(range(1, 51))
+    assert es.documents[2]['traits'] == ['oak'] and es.documents[2]['varietal'] == 'Merlot'
+
+
+def test_retries_rejected_requests_and_items(indexer_app):
+    es = FakeElasticsearch(failures=[
+        Unavailable('busy'),
+        lambda wine_id: 429 if wine_id % 2 else 201,
+        lambda wine_id: 400 if wine_id == 3 else 201
+    ])
+    stats = BulkIndexer(es, 'wines', workers=1, backoff=0).index_wines()
+
+    assert (stats['indexed'], stats['failed'], stats['retries']) == (49, 1, 2)
+    assert 3 not in es.documents and len(es.documents) == 49
+
+
+def test_gives_up_after_max_retries(indexer_app):
+    es = FakeElasticsearch(failures=[Unavailable('busy')] * 2)
+    stats = BulkIndexer(es, 'wines', workers=1, max_retries=1, backoff=0).index_wines([1, 2])
+    assert (stats['indexed'], stats['failed'], stats['retries']) == (0, 2, 1)
+
+
+def test_elasticsearch_service_sends_mapped_fields(indexer_app):
+    service = ElasticsearchService(hosts=['http://localhost:9200'])
+    service.es = FakeElasticsearch()
+    stats = service.bulk_index_wines(Wine.query.filter(Wine.id <= 5).all())
+    assert stats['indexed'] == 5
+    assert set(service.es.documents[1]) == {
+        'name', 'description', 'type', 'region', 'price', 'traits', 'alcohol_percentage'
+    }
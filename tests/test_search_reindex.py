@@ -0,0 +1,157 @@
+import json
+
+import pytest
+
+from extensions import db
+from models import Wine
+from services.search_index_manager import SearchIndexManager
+from services.search_service import SearchService
+from tests.fixtures import catalog_app
+
+
+class FakeIndices:
+    """Index and alias APIs of the stand-in cluster"""
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def create(self, index, body):
+        assert index not in self.cluster.store
+        self.cluster.store[index] = {'settings': dict(body['settings']['index']), 'docs': {}}
+
+    def exists(self, index):
+        return index in self.cluster.store or self.exists_alias(index)
+
+    def exists_alias(self, name):
+        return name in self.cluster.aliases.values()
+
+    def get_alias(self, name):
+        return {index: {'aliases': {name: {}}} for index, alias in self.cluster.aliases.items() if alias == name}
+
+    def get(self, index):
+        return {name: {} for name in self.cluster.store if name.startswith(index.rstrip('*'))}
+
+    def put_settings(self, index, body):
+        self.cluster.store[index]['settings'].update(body['index'])
+
+    def refresh(self, index):
+        self.cluster.refreshed.append(index)
+
+    def delete(self, index):
+        del self.cluster.store[index]
+        self.cluster.aliases.pop(index, None)
+
+    def update_aliases(self, body):
+        self.cluster.alias_updates.append(body['actions'])
+        for action in body['actions']:
+            (kind, spec), = action.items()
+            if kind == 'add':
+                self.cluster.aliases[spec['index']] = spec['alias']
+            elif kind == 'remove':
+                del self.cluster.aliases[spec['index']]
+            else:
+                del self.cluster.store[spec['index']]
+
+
+class FakeElasticsearch:
+    """Local stand-in for an Elasticsearch cluster with indices and aliases"""
+
+    def __init__(self):
+        self.store = {}
+        self.aliases = {}
+        self.refreshed = []
+        self.alias_updates = []
+        self.failing = False
+        self.indices = FakeIndices(self)
+
+    def bulk(self, body):
+        lines = iter(body.decode('utf-8').splitlines())
+        items = []
+        for action in lines:
+            (operation, meta), = json.loads(action).items()
+            docs = self.store[meta['_index']]['docs']
+            if operation == 'delete':
+                status = 200 if docs.pop(meta['_id'], None) is not None else 404
+                items.append({'delete': {'_id': meta['_id'], 'status': status}})
+                continue
+            source = json.loads(next(lines))
+            if not self.failing:
+                docs[meta['_id']] = source
+            items.append({'index': {'_id': meta['_id'], 'status': 400 if self.failing else 201}})
+        return {'errors': self.failing or any(item.get('delete', {}).get('status') == 404 for item in items),
+                'items': items}
+
+
+@pytest.fixture
+def reindex_app(catalog_app):
+    """Catalog of three wines"""
+    catalog_app.config['SEARCH_BULK_MAX_RETRIES'] = 0
+    db.session.add_all([Wine(name=f'Wine {i}', price=10.0 * i) for i in range(1, 4)])
+    db.session.commit()
+    return catalog_app
+
+
+def test_reindex_swaps_alias_to_complete_index(reindex_app):
+    es = FakeElasticsearch()
+    manager = SearchIndexManager(es)
+
+    first = manager.reindex('wine_index', mappings=SearchService.INDEX_MAPPINGS)
+    assert first['previous'] == [] and first['stats']['indexed'] == 3
+    name = first['index']
+    assert es.aliases == {name: 'wine_index'}
+    assert len(es.store[name]['docs']) == 3
+    # Replicas and refresh are restored before the alias moves
+    assert es.store[name]['settings'] == {'number_of_replicas': 1, 'refresh_interval': '1s'}
+    assert es.refreshed == [name]
+
+    second = manager.reindex('wine_index', keep=2)
+    third = manager.reindex('wine_index', keep=2)
+    assert third['previous'] == [second['index']]
+    assert third['deleted'] == [name]
+    assert sorted(es.store) == [second['index'], third['index']]
+    assert es.aliases == {third['index']: 'wine_index'}
+    # One atomic call per swap, removing the old version and adding the new
+    assert es.alias_updates[-1] == [
+        {'remove': {'index': second['index'], 'alias': 'wine_index'}},
+        {'add': {'index': third['index'], 'alias': 'wine_index'}}
+    ]
+
+
+def test_reindex_replaces_legacy_concrete_index(reindex_app):
+    es = FakeElasticsearch()
+    es.store['wine_index'] = {'settings': {}, 'docs': {}}
+    result = SearchIndexManager(es).reindex('wine_index')
+    assert es.alias_updates == [[
+        {'remove_index': {'index': 'wine_index'}},
+        {'add': {'index': result['index'], 'alias': 'wine_index'}}
+    ]]
+    assert list(es.store) == [result['index']]
+
+
+def test_failed_load_keeps_the_live_index(reindex_app):
+    es = FakeElasticsearch()
+    manager = SearchIndexManager(es)
+    live = manager.reindex('wine_index')['index']
+
+    es.failing = True
+    with pytest.raises(RuntimeError):
+        manager.reindex('wine_index')
+    assert list(es.store) == [live]
+    assert es.aliases == {live: 'wine_index'}
+
+
+def test_reindex_drops_wines_deleted_during_the_load(reindex_app):
+    es = FakeElasticsearch()
+    put_settings = es.indices.put_settings
+
+    def delete_during_load(index, body):
+        # Runs once the catalog is loaded, before the catch-up
+        db.session.delete(db.session.get(Wine, 2))
+        db.session.commit()
+        put_settings(index, body)
+
+    es.indices.put_settings = delete_during_load
+    result = SearchIndexManager(es).reindex('wine_index')
+
+    assert result['stats']['indexed'] == 3 and result['stats']['caught_up'] == 1
+    assert sorted(es.store[result['index']]['docs']) == [1, 3]
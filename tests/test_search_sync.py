@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from extensions import db
+from models import SearchOutbox, User, Wine, WineReview, WineTrait
+from services.elasticsearch_service import ElasticsearchService
+from services.search_sync_service import SearchSyncService, register_search_sync
+from tests.fixtures import catalog_app
+
+
+class FakeElasticsearch:
+    """Stand-in client applying bulk bodies to a dict of documents"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.requests = 0
+        self.documents = {}
+
+    def bulk(self, body):
+        self.requests += 1
+        lines = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        items = []
+        while lines:
+            operation, meta = next(iter(lines.pop(0).items()))
+            if operation == 'index':
+                source = lines.pop(0)
+                if not self.fail:
+                    self.documents[meta['_id']] = source
+            elif not self.fail:
+                self.documents.pop(meta['_id'], None)
+            items.append({operation: {'_id': meta['_id'], 'status': 400 if self.fail else 200}})
+        return {'errors': self.fail, 'items': items}
+
+
+@pytest.fixture
+def sync_app(catalog_app):
+    """Catalog with change capture and one reviewer"""
+    register_search_sync()
+    db.session.add(User(username='taster', email='taster@example.com'))
+    db.session.commit()
+    return catalog_app
+
+
+def queued():
+    return [(row.wine_id, row.operation) for row in SearchOutbox.query.order_by(SearchOutbox.id)]
+
+
+def sync_service(es, catalog_es=None):
+    service = SearchSyncService()
+    service.search_service = type('Search', (), {'es': es, 'index_name': 'wine_index'})()
+    service.elasticsearch_service = type('Catalog', (), {
+        'es': catalog_es or FakeElasticsearch(),
+        'index_name': 'wine_search',
+        'INDEX_FIELDS': ElasticsearchService.INDEX_FIELDS
+    })()
+    return service
+
+
+def test_changes_are_queued_in_the_writing_transaction(sync_app):
+    oak = WineTrait(name='oak', category='notes')
+    cab, chard = Wine(name='Cab', price=40.0), Wine(name='Chard', price=20.0)
+    db.session.add_all([cab, chard, oak])
+    db.session.commit()
+    assert queued() == [(1, 'upsert'), (2, 'upsert')]
+    SearchOutbox.query.delete()
+    db.session.commit()
+
+    db.session.add(WineReview(user_id=1, wine_id=1, rating=4))
+    chard.traits.append(oak)
+    db.session.commit()
+    oak.name = 'oaky'
+    db.session.commit()
+    db.session.delete(cab)
+    db.session.rollback()
+    assert queued() == [(1, 'upsert'), (2, 'upsert'), (2, 'upsert')]
+
+
+def test_flush_coalesces_changes_into_one_bulk_request(sync_app):
+    es = FakeElasticsearch()
+    service = sync_service(es)
+    wines = [Wine(name=f'Wine {i}', price=10.0 * i) for i in range(1, 4)]
+    db.session.add_all(wines)
+    db.session.commit()
+    wines[0].price = 15.0
+    db.session.add(WineReview(user_id=1, wine_id=2, rating=5))
+    db.session.commit()
+    db.session.delete(wines[2])
+    db.session.commit()
+
+    stats = service.flush()
+    assert (stats['upserted'], stats['deleted'], stats['applied']) == (2, 1, 6)
+    assert es.requests == 1
+    assert sorted(es.documents) == [1, 2]
+    assert es.documents[1]['price'] == 15.0
+    assert (es.documents[2]['average_rating'], es.documents[2]['review_count']) == (5.0, 1)
+    assert queued() == []
+    assert service.flush() is None
+
+
+def test_failed_flush_keeps_changes_queued(sync_app):
+    db.session.add(Wine(name='Cab'))
+    db.session.commit()
+
+    stats = sync_service(FakeElasticsearch(fail=True)).flush()
+    assert stats['failed'] == 1
+    assert queued() == [(1, 'upsert')]
+
+    es = FakeElasticsearch()
+    assert sync_service(es).run_pending() == {'upserted': 1, 'deleted': 0, 'applied': 1}
+    assert es.documents[1]['name'] == 'Cab'
+
+
+def test_trait_links_reach_both_indices(sync_app):
+    es, catalog_es = FakeElasticsearch(), FakeElasticsearch()
+    service = sync_service(es, catalog_es)
+    oak = WineTrait(name='oak', category='notes')
+    cab = Wine(name='Cab', price=40.0)
+    db.session.add_all([cab, oak])
+    db.session.commit()
+    service.flush()
+    assert es.documents[1]['traits'] == catalog_es.documents[1]['traits'] == []
+
+    cab.traits.append(oak)
+    db.session.commit()
+    stats = service.flush()
+    assert sorted(stats['indices']) == ['wine_index', 'wine_search']
+    assert es.documents[1]['traits'] == catalog_es.documents[1]['traits'] == ['oak']
+    assert sorted(catalog_es.documents[1]) == sorted(ElasticsearchService.INDEX_FIELDS)
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+from utils.snapshot_store import SnapshotStore
+
+def publish(directory, version, values):
+    with SnapshotStore.write(directory, version) as staging:
+        SnapshotStore.save_arrays(staging, {'values': np.asarray(values)})
+        SnapshotStore.write_manifest(staging, {'format': 1, 'version': version})
+
+def test_write_publishes_and_switches_current(tmp_path):
+    """Test a written snapshot becomes CURRENT and reads back memory-mapped"""
+    publish(str(tmp_path), 'v1', [1, 2])
+    publish(str(tmp_path), 'v2', [3, 4, 5])
+
+    path, manifest = SnapshotStore.open(str(tmp_path), 1)
+
+    assert SnapshotStore.current(str(tmp_path)) == 'v2'
+    assert manifest['version'] == 'v2'
+    values = SnapshotStore.load_array(path, 'values')
+    assert isinstance(values, np.memmap) and values.tolist() == [3, 4, 5]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.')]
+
+def test_failed_write_keeps_current_snapshot(tmp_path):
+    """Test a write that raises leaves CURRENT alone and removes its staging files"""
+    publish(str(tmp_path), 'v1', [1])
+
+    with pytest.raises(RuntimeError):
+        with SnapshotStore.write(str(tmp_path), 'v2') as staging:
+            SnapshotStore.save_arrays(staging, {'values': np.asarray([2])})
+            raise RuntimeError('build failed')
+
+    assert SnapshotStore.current(str(tmp_path)) == 'v1'
+    assert sorted(os.listdir(tmp_path)) == ['CURRENT', 'v1']
+
+def test_open_rejects_unknown_format(tmp_path):
+    """Test a snapshot in another format is refused, and a missing one is None"""
+    assert SnapshotStore.open(str(tmp_path), 1) == (None, None)
+    publish(str(tmp_path), 'v1', [1])
+
+    with pytest.raises(ValueError):
+        SnapshotStore.open(str(tmp_path), 2, 'test snapshot')
+
+def test_prune_keeps_newest_and_current(tmp_path):
+    """Test pruning keeps the newest versions and never deletes CURRENT"""
+    for version in ('v1', 'v2', 'v3', 'v4'):
+        publish(str(tmp_path), version, [0])
+    with open(tmp_path / 'CURRENT', 'w') as current:
+        current.write('v1')
+
+    SnapshotStore.prune(str(tmp_path), keep=2)
+
+    assert sorted(name for name in os.listdir(tmp_path) if name != 'CURRENT') == ['v1', 'v3', 'v4']
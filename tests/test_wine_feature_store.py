@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from extensions import db
+from models import User, Wine, WineRegion, WineReview, WineTrait
+from services.recommendation_service import RecommendationEngine
+from services.wine_feature_store import WineFeatures, wine_feature_store
+from tests.fixtures import catalog_app
+
+
+@pytest.fixture
+def feature_app(catalog_app, tmp_path):
+    """Small catalog whose feature snapshots are persisted"""
+    catalog_app.config['WINE_FEATURE_STORE_DIR'] = str(tmp_path / 'features')
+    oak, cherry = WineTrait(name='oak', category='notes'), WineTrait(name='cherry', category='aroma')
+    napa = WineRegion(name='Napa')
+    user = User(username='taster', email='taster@example.com')
+    wines = [
+        Wine(name='Cab', type='Red', price=40.0, alcohol_percentage=14.0, region=napa, traits=[oak, cherry]),
+        Wine(name='Chard', type='White', price=20.0, region=napa, traits=[oak]),
+        Wine(name='Mystery')
+    ]
+    db.session.add_all(wines + [user])
+    db.session.flush()
+    db.session.add_all([
+        WineReview(user_id=user.id, wine_id=wines[0].id, rating=4),
+        WineReview(user_id=user.id, wine_id=wines[0].id, rating=5)
+    ])
+    db.session.commit()
+    return catalog_app
+
+
+def feature_rows(features):
+    return features.frame().reset_index().fillna(-1).values.tolist(), \
+        features.wine_trait_names(np.arange(len(features)))
+
+
+def test_build_features(feature_app):
+    features = wine_feature_store.get()
+    assert features.wine_ids.tolist() == [1, 2, 3]
+    assert features.column('avg_rating')[0] == 4.5
+    assert features.column('review_count').tolist() == [2, 0, 0]
+    assert np.isnan(features.column('price')[2])
+    assert features.decode('type').tolist() == ['Red', 'White', None]
+    assert features.wine_trait_names([0, 1, -1]) == [['oak', 'cherry'], ['oak'], []]
+    assert features.trait_mask([1]).tolist() == [True, True, False]
+    assert features.trait_mask([1, 2], match='all').tolist() == [True, False, False]
+    assert features.records([2, 99])[0]['region'] == 'Napa'
+    assert features.records([2, 99])[1]['price'] is None
+
+
+def test_refresh_matches_full_build(feature_app):
+    wine_feature_store.get()
+    spicy = WineTrait(name='spice', category='aroma')
+    chard = db.session.get(Wine, 2)
+    chard.price = 25.0
+    chard.traits = [spicy]
+    db.session.add(Wine(name='Bubbles', type='Sparkling', region=WineRegion(name='Sonoma'), traits=[spicy]))
+    db.session.add(WineReview(user_id=1, wine_id=3, rating=2))
+    db.session.commit()
+
+    refreshed = wine_feature_store.refresh()
+    assert refreshed.labels['type'] == ['Red', 'White', 'Sparkling']
+    assert feature_rows(refreshed) == feature_rows(wine_feature_store.build())
+
+
+def test_refresh_picks_up_trait_links_and_deletions(feature_app):
+    wine_feature_store.get()
+    chard = db.session.get(Wine, 2)
+    chard.traits.append(db.session.get(WineTrait, 2))
+    db.session.commit()
+    assert wine_feature_store.refresh().wine_trait_names([1]) == [['oak', 'cherry']]
+
+    db.session.delete(db.session.get(WineTrait, 1))
+    db.session.delete(db.session.get(Wine, 3))
+    db.session.commit()
+    refreshed = wine_feature_store.refresh()
+    assert refreshed.wine_ids.tolist() == [1, 2]
+    assert feature_rows(refreshed) == feature_rows(wine_feature_store.build())
+
+
+def test_snapshot_is_memory_mapped(feature_app):
+    features = wine_feature_store.get()
+    wine_feature_store.save()
+    loaded = WineFeatures.load(feature_app.config['WINE_FEATURE_STORE_DIR'])
+    assert isinstance(loaded.column('price'), np.memmap)
+    assert np.shares_memory(loaded.frame(['price'])['price'].to_numpy(), loaded.column('price'))
+    assert feature_rows(loaded) == feature_rows(features)
+
+
+def test_engine_wine_data_matches_grouped_query(feature_app):
+    engine = RecommendationEngine()
+    pd.testing.assert_frame_equal(engine._load_wine_data(), engine._query_wine_frame(), check_dtype=False)
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+from extensions import db
+from models import SearchOutbox, Wine, WineCategory, WineRegion, WineTrait, WineVarietal, wine_traits
+from services.wine_import_service import WineImportService
+from tests.fixtures import catalog_app
+
+
+def test_parse_titles():
+    parsed = WineImportService().parse_titles(pd.Series([
+        'Ferrari-Carano 2014 Siena Red (Sonoma County)',
+        'Januik 2013 Cabernet Sauvignon (Columbia Valley (WA))',
+        'Lytle-Barnett 2012 Cabernet Sauvignon-Syrah (Walla Walla Valley (WA))',
+        'Kiona 2013 Estate Bottled Lemberger',
+        'Joseph Filippi NV Oloroso Library Reserve Sherry (Cucamonga Valley)'
+    ]))
+    assert parsed['region'].tolist() == [
+        'Sonoma County', 'Columbia Valley (WA)', 'Walla Walla Valley (WA)', None, 'Cucamonga Valley'
+    ]
+    assert parsed['varietal'].tolist() == ['Red Blend', 'Cabernet Sauvignon', 'Red Blend', 'Lemberger', None]
+    assert parsed['type'].tolist() == ['Red', 'Red', 'Red', 'Red', None]
+
+
+def test_import_is_idempotent(catalog_app, tmp_path):
+    path = str(tmp_path / 'ratings.csv')
+    pd.DataFrame({
+        'taster_name': ['Virginie Boone', 'Paul Gregutt', 'Matt Kettmann', 'Paul Gregutt'],
+        'title': [
+            'Ferrari-Carano 2014 Siena Red (Sonoma County)',
+            'Januik 2013 Dry Riesling (Columbia Valley (WA))',
+            'Ferrari-Carano 2014 Siena Red (Sonoma County)',
+            'Januik 2014 Black Cherry Rosé (Columbia Valley (WA))'
+        ],
+        'points': [88, 90, 91, 89]
+    }).to_csv(path, index=False)
+    db.session.add_all([
+        WineTrait(name='dry', category='taste'),
+        WineTrait(name='black_cherry', category='aroma'),
+        WineCategory(name='Red Wine'),
+        Wine(name='Ferrari-Carano 2014 Siena Red (Sonoma County)', price=30.0)
+    ])
+    db.session.commit()
+
+    service = WineImportService(batch_size=2)
+    stats = service.import_file(path)
+    assert (stats['rows'], stats['inserted'], stats['updated'], stats['duplicates']) == (4, 2, 1, 1)
+    assert stats['traits_linked'] == 2
+    assert WineVarietal.query.count() == 3
+    assert WineRegion.query.count() == 2
+
+    wine = Wine.query.filter_by(name='Ferrari-Carano 2014 Siena Red (Sonoma County)').one()
+    assert wine.price == 30.0
+    assert (wine.type, wine.varietal.name, wine.region.name) == ('Red', 'Red Blend', 'Sonoma County')
+    assert wine.description == 'Rated 88 points by Virginie Boone.'
+    assert wine.category.name == 'Red Wine'
+    assert [trait.name for trait in Wine.query.filter_by(type='Rosé').one().traits] == ['black_cherry']
+    # Every inserted or changed wine is queued for the search index
+    assert {row.wine_id for row in SearchOutbox.query} == {1, 2, 3}
+    queued = SearchOutbox.query.count()
+
+    stats = service.import_file(path)
+    assert (stats['inserted'], stats['updated'], stats['unchanged'], stats['traits_linked']) == (0, 0, 3, 0)
+    assert Wine.query.count() == 3
+    assert db.session.query(wine_traits).count() == 2
+    assert SearchOutbox.query.count() == queued
+
+
+def test_import_rejects_non_ratings_pickle(tmp_path):
+    path = str(tmp_path / 'model.pkl')
+    pd.to_pickle({'not': 'a dataset'}, path)
+    with pytest.raises(ValueError):
+        list(WineImportService().read_chunks(path))
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import event
+
+from blueprints.main import main_bp
+from blueprints.wines import wines_bp
+from extensions import db
+from models import User, Wine, WineCategory, WineRegion, WineReview, WineTrait, WineVarietal
+from tests.fixtures import catalog_app
+
+
+@pytest.fixture
+def listing_app(catalog_app):
+    """Catalog serving /api/wines, with one reviewer"""
+    catalog_app.register_blueprint(main_bp)
+    db.session.add(User(username='taster', email='taster@example.com'))
+    db.session.commit()
+    return catalog_app
+
+
+def add_wines(count):
+    oak, cherry = WineTrait(name=f'oak{count}', category='notes'), WineTrait(name=f'cherry{count}', category='aroma')
+    for i in range(count):
+        wine = Wine(
+            name=f'Wine {count}-{i}', type='Red', price=20.0 + i,
+            varietal=WineVarietal(name=f'Varietal {count}-{i}'),
+            region=WineRegion(name=f'Region {count}-{i}'),
+            category=WineCategory(name=f'Category {count}-{i}'),
+            traits=[oak, cherry]
+        )
+        db.session.add(wine)
+        db.session.flush()
+        db.session.add_all([WineReview(user_id=1, wine_id=wine.id, rating=rating) for rating in (3, 5)])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def count_queries(func):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return result, len(statements)
+
+
+def test_listing_wines_costs_constant_queries(listing_app):
+    client = listing_app.test_client()
+
+    add_wines(2)
+    response, few = count_queries(lambda: client.get('/api/wines'))
+    assert len(response.get_json()) == 2
+
+    add_wines(20)
+    response, many = count_queries(lambda: client.get('/api/wines'))
+    wines = response.get_json()
+    assert len(wines) == 22
+    assert few == many == 2
+    assert wines[-1]['region'] == 'Region 20-19'
+    assert [trait['name'] for trait in wines[-1]['traits']] == ['oak20', 'cherry20']
+    assert (wines[-1]['average_rating'], wines[-1]['review_count']) == (4.0, 2)
+
+
+def test_paginated_listing_reads_ratings_from_stats(listing_app):
+    listing_app.register_blueprint(wines_bp, url_prefix='/api/wines')
+    client = listing_app.test_client()
+
+    add_wines(3)
+    response, queries = count_queries(lambda: client.get('/api/wines/api/wines?per_page=2'))
+    assert response.status_code == 200
+    listing = response.get_json()
+    assert (listing['total'], listing['pages']) == (3, 2)
+    assert [wine['avg_rating'] for wine in listing['wines']] == [4.0, 4.0]
+    # Page, count and one batched trait load, whatever the page size
+    assert queries == 3
+
+
+def test_to_dict_many_loads_missing_relationships_once(listing_app):
+    add_wines(10)
+    wines = Wine.query.all()
+    dicts, queries = count_queries(lambda: Wine.to_dict_many(wines))
+    assert queries == 2
+    assert dicts == [wine.to_dict() for wine in wines]
+
+
+def test_plain_wine_queries_do_not_join_stats(listing_app):
+    add_wines(2)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        wines = Wine.query.all()
+        assert 'wine_stats' not in statements[-1]
+        # Loaded on first access instead
+        assert wines[0].avg_rating == 4.0
+        assert 'wine_stats' in statements[-1]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,76 @@
+import pytest
+
+from extensions import db
+from models import User, Wine, WineReview, WineStats
+from services.review_service import WineReviewService
+from services.wine_stats_service import WineStatsService
+from tests.fixtures import catalog_app
+
+
+@pytest.fixture
+def stats_app(catalog_app):
+    """Catalog of two wines and two users"""
+    db.session.add_all([
+        Wine(name='Cab'), Wine(name='Chard'),
+        User(username='ann', email='ann@example.com'), User(username='bob', email='bob@example.com')
+    ])
+    db.session.commit()
+    return catalog_app
+
+
+def stats_of(wine_id):
+    stats = db.session.get(WineStats, wine_id)
+    return (stats.rating_sum, stats.rating_count, stats.avg_rating) if stats else None
+
+
+def test_review_writes_keep_stats_in_step(stats_app):
+    WineReviewService.create_review(1, 1, 4)
+    review = WineReviewService.create_review(2, 1, 5)
+    assert stats_of(1) == (9.0, 2, 4.5)
+    assert db.session.get(Wine, 1).avg_rating == 4.5
+
+    # An existing review is updated in place
+    assert WineReviewService.create_review(2, 1, 3) is review
+    assert stats_of(1) == (7.0, 2, 3.5)
+
+    review.wine_id = 2
+    db.session.commit()
+    assert stats_of(1) == (4.0, 1, 4.0)
+    assert stats_of(2) == (3.0, 1, 3.0)
+    assert WineReviewService.calculate_wine_rating(2) == {'average_rating': 3.0, 'review_count': 1}
+
+    db.session.delete(review)
+    db.session.commit()
+    assert stats_of(2) == (0.0, 0, 0.0)
+    assert db.session.get(Wine, 2).review_count == 0
+    assert WineStatsService().check() == []
+
+
+def test_rolled_back_review_leaves_stats_unchanged(stats_app):
+    WineReviewService.create_review(1, 1, 4)
+    db.session.add(WineReview(user_id=2, wine_id=1, rating=1))
+    db.session.flush()
+    assert stats_of(1) == (5.0, 2, 2.5)
+    db.session.rollback()
+    assert stats_of(1) == (4.0, 1, 4.0)
+
+
+def test_check_detects_and_fixes_drift(stats_app):
+    WineReviewService.create_review(1, 1, 4)
+    # Core inserts bypass the listener
+    db.session.execute(WineReview.__table__.insert(), [{'user_id': 2, 'wine_id': 1, 'rating': 2},
+                                                       {'user_id': 2, 'wine_id': 2, 'rating': 5}])
+    db.session.commit()
+
+    service = WineStatsService()
+    mismatches = service.check()
+    assert [(m['wine_id'], m['expected'], m['actual']) for m in mismatches] == [
+        (1, (6.0, 2, 3.0), (4.0, 1, 4.0)),
+        (2, (5.0, 1, 5.0), None)
+    ]
+    assert len(service.check(fix=True)) == 2
+    assert service.check() == []
+    assert stats_of(2) == (5.0, 1, 5.0)
+
+    assert service.backfill() == 2
+    assert stats_of(1) == (6.0, 2, 3.0)
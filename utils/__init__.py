@@ -1,7 +1,10 @@
 from .auth_utils import AuthUtils
 from .data_validators import DataValidator
 from .image_utils import ImageUtils
-from .recommendation_helpers import RecommendationHelper
+from .recommendation_helpers import RecommendationHelper, IVFIndex
+from .matrix_factorization import ImplicitALS
+from .content_vectorizer import ContentVectorizer
+from .snapshot_store import SnapshotStore
 from .error_handlers import ErrorHandler
 from .email_utils import EmailUtils
 
@@ -10,6 +13,10 @@ __all__ = [
     'DataValidator',
     'ImageUtils',
     'RecommendationHelper',
+    'IVFIndex',
+    'ImplicitALS',
+    'ContentVectorizer',
+    'SnapshotStore',
     'ErrorHandler',
     'EmailUtils'
 ]
@@ -0,0 +1,56 @@
+import numpy as np
+import scipy.sparse as sparse
+from typing import List, Optional, Sequence
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class ContentVectorizer:
+    """
+    TF-IDF vectorizer for wine text (description plus trait names)
+
+    The fitted state is just the vocabulary and the idf weights, so it can
+    be persisted as two arrays and restored without refitting. Rows are
+    L2-normalized, so the dot product of two rows is their cosine
+    similarity.
+    """
+
+    def __init__(self, vocabulary: Optional[Sequence[str]] = None, idf: Optional[np.ndarray] = None,
+                 max_features: Optional[int] = None):
+        self.max_features = max_features
+        self._vectorizer = self._create(vocabulary)
+        if vocabulary is not None:
+            self._vectorizer.idf_ = np.asarray(idf, dtype=np.float64)
+
+    @staticmethod
+    def _create(vocabulary=None, max_features=None):
+        return TfidfVectorizer(
+            stop_words='english',
+            sublinear_tf=True,
+            dtype=np.float32,
+            vocabulary=list(vocabulary) if vocabulary is not None else None,
+            max_features=max_features
+        )
+
+    @property
+    def vocabulary(self) -> List[str]:
+        """Terms in column order"""
+        return self._vectorizer.get_feature_names_out().tolist()
+
+    @property
+    def idf(self) -> np.ndarray:
+        return self._vectorizer.idf_
+
+    def fit_transform(self, documents: Sequence[str]) -> sparse.csr_matrix:
+        """
+        Learn the vocabulary and idf weights and vectorize ``documents``
+
+        :raises ValueError: if the documents contain no usable terms
+        """
+        self._vectorizer = self._create(max_features=self.max_features)
+        return self._vectorizer.fit_transform(documents).tocsr()
+
+    def transform(self, documents: Sequence[str]) -> sparse.csr_matrix:
+        """
+        Vectorize ``documents`` with the fitted vocabulary (unknown terms are dropped)
+        """
+        return self._vectorizer.transform(documents).tocsr()
@@ -0,0 +1,135 @@
+import numpy as np
+import scipy.sparse as sparse
+from typing import Optional
+
+from utils.recommendation_helpers import RecommendationHelper
+
+
+class ImplicitALS:
+    """
+    Alternating least squares for implicit feedback (Hu, Koren & Volinsky)
+
+    Interaction weights are treated as confidence, ``c = 1 + alpha * w``,
+    on a binary preference (any positive weight). Each half-step solves the
+    regularized least-squares system of every user (or item) at once with
+    a few batched conjugate-gradient iterations, so training is a handful
+    of sparse/dense NumPy products per step and never loops in Python over
+    users or items.
+    """
+
+    def __init__(self, factors=32, regularization=0.1, alpha=20.0, iterations=10,
+                 cg_steps=3, random_state=42, max_block_nnz=2 ** 20):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.random_state = random_state
+        self.max_block_nnz = max_block_nnz
+        self.user_factors = None
+        self.item_factors = None
+
+    def fit(self, interactions: sparse.spmatrix) -> 'ImplicitALS':
+        """
+        Learn user and item factors from a user x item weight matrix
+
+        :param interactions: Sparse (n_users, n_items) interaction weights
+        :return: self, with float32 ``user_factors`` and ``item_factors``
+        """
+        confidence = self.confidence(interactions)
+        confidence_t = confidence.T.tocsr()
+
+        rng = np.random.default_rng(self.random_state)
+        n_users, n_items = confidence.shape
+        scale = np.float32(0.01)
+        self.user_factors = (rng.standard_normal((n_users, self.factors)) * scale).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.factors)) * scale).astype(np.float32)
+
+        for _ in range(self.iterations):
+            self._solve(confidence, self.user_factors, self.item_factors)
+            self._solve(confidence_t, self.item_factors, self.user_factors)
+        return self
+
+    def confidence(self, interactions: sparse.spmatrix) -> sparse.csr_matrix:
+        """
+        ``alpha * w`` for positive weights; the implicit 1 is added in the solver
+        """
+        matrix = sparse.csr_matrix(interactions, dtype=np.float32, copy=True)
+        matrix.data[matrix.data < 0] = 0
+        matrix.eliminate_zeros()
+        matrix.data *= np.float32(self.alpha)
+        return matrix
+
+    def fold_in(self, row: sparse.spmatrix) -> np.ndarray:
+        """
+        Compute factors for a user who was not part of training
+
+        :param row: Sparse (1, n_items) interaction weights
+        :return: float32 user factor vector
+        """
+        x = np.zeros((1, self.factors), dtype=np.float32)
+        self._solve(self.confidence(row), x, self.item_factors, cg_steps=self.factors)
+        return x[0]
+
+    def recommend(self, user_vector: np.ndarray, exclude: Optional[np.ndarray] = None, k: int = 10):
+        """
+        Score every item for one user and return the top k
+
+        :param user_vector: User factor vector
+        :param exclude: Item indices to leave out (e.g. already seen)
+        :param k: Number of items
+        :return: (item indices, scores), best first
+        """
+        scores = self.item_factors.dot(user_vector)
+        if exclude is not None and len(exclude):
+            scores[exclude] = -np.inf
+        top = RecommendationHelper.top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return top, scores[top]
+
+    def _solve(self, confidence, X, Y, cg_steps=None):
+        """
+        Update X in place: for every row u minimize
+        sum_i c_ui (p_ui - x_u . y_i)^2 + reg * |x_u|^2
+
+        The normal equations ``(YtY + Y^T (C_u - I) Y + reg I) x_u = Y^T C_u p_u``
+        are solved with batched conjugate gradient, warm-started from X.
+        Rows are processed in blocks of at most ``max_block_nnz``
+        interactions to bound the gathered (nnz, factors) temporaries.
+        """
+        cg_steps = cg_steps or self.cg_steps
+        gram = Y.T.dot(Y) + np.float32(self.regularization) * np.eye(Y.shape[1], dtype=np.float32)
+        row_nnz = np.diff(confidence.indptr)
+        bounds = np.searchsorted(np.cumsum(row_nnz), np.arange(self.max_block_nnz, row_nnz.sum(), self.max_block_nnz))
+        starts = np.unique(np.concatenate([[0], bounds, [confidence.shape[0]]]))
+
+        for start, stop in zip(starts[:-1], starts[1:]):
+            block = confidence[start:stop]
+            rows = np.repeat(np.arange(stop - start), np.diff(block.indptr))
+            Y_nz = Y[block.indices]
+
+            def product(P):
+                # (YtY + reg I) p_u + sum_i (c_ui - 1) (y_i . p_u) y_i
+                weights = block.data * np.einsum('ij,ij->i', P[rows], Y_nz)
+                return P.dot(gram) + sparse.csr_matrix(
+                    (weights, block.indices, block.indptr), shape=block.shape
+                ).dot(Y)
+
+            x = X[start:stop]
+            b = sparse.csr_matrix(
+                (block.data + 1, block.indices, block.indptr), shape=block.shape
+            ).dot(Y)
+            residual = b - product(x)
+            direction = residual.copy()
+            rs_old = np.einsum('ij,ij->i', residual, residual)
+            for _ in range(cg_steps):
+                step_product = product(direction)
+                denominator = np.einsum('ij,ij->i', direction, step_product)
+                step = np.divide(rs_old, denominator, out=np.zeros_like(rs_old), where=denominator > 0)
+                x += step[:, None] * direction
+                residual -= step[:, None] * step_product
+                rs_new = np.einsum('ij,ij->i', residual, residual)
+                ratio = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 0)
+                direction = residual + ratio[:, None] * direction
+                rs_old = rs_new
+            X[start:stop] = x
@@ -1,7 +1,13 @@
+import os
+
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import scipy.sparse as sparse
 import scipy.spatial.distance as distance
 
+# Set-bit count of every byte value, for popcount on NumPy < 2.0
+_POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
 class RecommendationHelper:
     """
     Recommendation and Similarity Calculation Utilities
@@ -71,4 +77,504 @@ class RecommendationHelper:
             )
             item['recommendation_score'] = score
         
-        return sorted(items, key=lambda x: x['recommendation_score'], reverse=True)
\ No newline at end of file
+        return sorted(items, key=lambda x: x['recommendation_score'], reverse=True)
+
+    @staticmethod
+    def blend_scores(
+        signals: Dict[str, np.ndarray],
+        weights: Dict[str, float],
+        exclude: Optional[np.ndarray] = None,
+        k: int = 10
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Blend per-item signal arrays into one score and return the top k
+
+        Vectorized counterpart of ``calculate_weighted_score``: every signal
+        is min-max normalized to [0, 1] over the eligible items (missing
+        values count as 0), so weights compare signals of any scale, and
+        all signals are combined with one weights x signals product.
+
+        :param signals: Signal name -> float array, all over the same items
+        :param weights: Signal name -> weight; signals without a weight are ignored
+        :param exclude: Boolean mask of items to leave out (e.g. already interacted)
+        :param k: Number of items
+        :return: (item indices, blended scores), best first
+        """
+        names = [name for name in signals if weights.get(name)]
+        n_items = len(next(iter(signals.values()))) if signals else 0
+        eligible = ~exclude if exclude is not None else np.ones(n_items, dtype=bool)
+        if not names or not eligible.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        stacked = np.vstack([signals[name] for name in names]).astype(np.float32)
+        stacked[~np.isfinite(stacked)] = 0
+        low = stacked.min(axis=1, where=eligible, initial=np.inf)
+        span = stacked.max(axis=1, where=eligible, initial=-np.inf) - low
+
+        # sum_i w_i (x_i - low_i) / span_i, with the scaling folded into the weights
+        scaled = np.asarray([weights[name] for name in names], dtype=np.float32)
+        scaled = np.divide(scaled, span, out=np.zeros_like(scaled), where=span > 0)
+        scores = scaled.dot(stacked) - scaled.dot(low)
+        scores[~eligible] = -np.inf
+        top = RecommendationHelper.top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return top, scores[top]
+
+    @staticmethod
+    def build_interaction_matrix(
+        user_ids: Sequence[int],
+        wine_ids: Sequence[int],
+        weights: Sequence[float],
+        catalog_wine_ids: Optional[Sequence[int]] = None
+    ) -> Tuple[sparse.csr_matrix, np.ndarray, np.ndarray]:
+        """
+        Build a sparse user x wine interaction matrix from columnar data
+
+        Rows are the sorted distinct user ids, columns the sorted distinct
+        wine ids (plus any catalog wines without interactions). When the same
+        (user, wine) pair appears more than once the last weight wins, which
+        matches the behaviour of the previous dense implementation.
+
+        :param user_ids: User id of each interaction
+        :param wine_ids: Wine id of each interaction
+        :param weights: Interaction weight of each interaction
+        :param catalog_wine_ids: Optional wine ids to include as columns
+        :return: (CSR matrix, row user ids, column wine ids)
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        wine_ids = np.asarray(wine_ids, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+
+        row_ids, rows = np.unique(user_ids, return_inverse=True)
+        if catalog_wine_ids is not None:
+            col_ids = np.union1d(np.asarray(catalog_wine_ids, dtype=np.int64), wine_ids)
+        else:
+            col_ids = np.unique(wine_ids)
+        cols = np.searchsorted(col_ids, wine_ids)
+
+        # Keep only the last occurrence of every (row, col) pair
+        linear = rows.astype(np.int64) * max(len(col_ids), 1) + cols
+        _, last = np.unique(linear[::-1], return_index=True)
+        keep = len(linear) - 1 - last
+
+        matrix = sparse.csr_matrix(
+            (weights[keep], (rows[keep], cols[keep])),
+            shape=(len(row_ids), len(col_ids)),
+            dtype=np.float32
+        )
+        return matrix, row_ids, col_ids
+
+    @staticmethod
+    def index_of(ids: Sequence[int], values: Sequence[int]) -> np.ndarray:
+        """
+        Vectorized position lookup of ``values`` in an (unsorted) id list
+
+        :param ids: Distinct ids, e.g. the model's wine_ids
+        :param values: Ids to look up
+        :return: int64 positions, -1 where a value is not in ``ids``
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(values), -1, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        positions = np.minimum(np.searchsorted(ids[order], values), len(ids) - 1)
+        return np.where(ids[order][positions] == values, order[positions], -1)
+
+    @staticmethod
+    def build_incidence_matrix(
+        row_keys: Sequence[int],
+        col_keys: Sequence[int],
+        row_ids: Sequence[int],
+        col_ids: Sequence[int]
+    ) -> sparse.csr_matrix:
+        """
+        Build a binary sparse matrix from (row id, column id) pairs
+
+        Pairs whose ids are not in ``row_ids``/``col_ids`` are ignored.
+
+        :param row_keys: Row id of each pair
+        :param col_keys: Column id of each pair
+        :param row_ids: Ids labelling the matrix rows, in order
+        :param col_ids: Ids labelling the matrix columns, in order
+        :return: float32 CSR matrix of shape (len(row_ids), len(col_ids))
+        """
+        rows = RecommendationHelper.index_of(row_ids, row_keys)
+        cols = RecommendationHelper.index_of(col_ids, col_keys)
+        known = (rows >= 0) & (cols >= 0)
+        matrix = sparse.csr_matrix(
+            (np.ones(int(known.sum()), dtype=np.float32), (rows[known], cols[known])),
+            shape=(len(row_ids), len(col_ids)),
+            dtype=np.float32
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0
+        return matrix
+
+    @staticmethod
+    def pack_bitsets(incidence: sparse.spmatrix) -> np.ndarray:
+        """
+        Pack a binary sparse matrix into one uint64 bitset per row
+
+        Bit ``j`` of row ``i`` is set when ``incidence[i, j]`` is non-zero.
+
+        :param incidence: Sparse (n_rows, n_bits) matrix
+        :return: uint64 array of shape (n_rows, ceil(n_bits / 64))
+        """
+        incidence = sparse.csr_matrix(incidence)
+        n_rows, n_bits = incidence.shape
+        bits = np.zeros((n_rows, max(1, -(-n_bits // 64)) * 64), dtype=bool)
+        coo = incidence.tocoo()
+        bits[coo.row[coo.data != 0], coo.col[coo.data != 0]] = True
+        packed = np.packbits(bits, axis=1, bitorder='little')
+        return np.ascontiguousarray(packed).view(np.uint64)
+
+    @staticmethod
+    def popcount(bitsets: np.ndarray) -> np.ndarray:
+        """
+        Count the set bits of every uint64 element
+
+        Uses ``np.bitwise_count`` (NumPy >= 2.0) and falls back to a
+        256-entry byte lookup table on older versions.
+
+        :param bitsets: uint64 array
+        :return: uint8 array of the same shape
+        """
+        bitsets = np.ascontiguousarray(bitsets, dtype=np.uint64)
+        if hasattr(np, 'bitwise_count'):
+            return np.bitwise_count(bitsets)
+        return _POPCOUNT_TABLE[bitsets.view(np.uint8)].reshape(bitsets.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+    @staticmethod
+    def cosine_similarities(matrix: sparse.spmatrix, vector: sparse.spmatrix) -> np.ndarray:
+        """
+        Cosine similarity of every row of a sparse matrix to one vector
+
+        :param matrix: Sparse (n_rows, n_features) matrix
+        :param vector: Sparse or dense vector of n_features
+        :return: float32 array of n_rows similarities (0 for empty rows)
+        """
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        vector = RecommendationHelper._dense_vector(vector)
+        dots = matrix.dot(vector)
+        row_norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        denominator = row_norms * np.float32(np.linalg.norm(vector))
+        return np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+
+    @staticmethod
+    def _dense_vector(vector) -> np.ndarray:
+        """
+        Flatten a sparse or dense vector into a 1-D float32 array
+        """
+        if sparse.issparse(vector):
+            vector = vector.toarray()
+        return np.asarray(vector, dtype=np.float32).ravel()
+
+    @staticmethod
+    def jaccard_similarities(matrix: sparse.spmatrix, vector: sparse.spmatrix) -> np.ndarray:
+        """
+        Jaccard similarity of every (binary) row of a sparse matrix to one vector
+
+        :param matrix: Sparse binary (n_rows, n_features) matrix
+        :param vector: Sparse or dense binary vector of n_features
+        :return: float32 array of n_rows similarities (0 for empty rows)
+        """
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        vector = RecommendationHelper._dense_vector(vector)
+        intersection = matrix.dot(vector)
+        union = np.diff(matrix.indptr).astype(np.float32) + np.count_nonzero(vector) - intersection
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    @staticmethod
+    def replace_rows(
+        matrix: sparse.spmatrix,
+        rows: Sequence[int],
+        new_rows: sparse.spmatrix,
+        n_rows: Optional[int] = None
+    ) -> sparse.csr_matrix:
+        """
+        Copy of a sparse matrix with some rows replaced, growing it if needed
+
+        :param matrix: Sparse matrix
+        :param rows: Row index that each row of ``new_rows`` replaces
+        :param new_rows: Sparse (len(rows), n_columns) replacement rows
+        :param n_rows: Row count of the result (defaults to the current one)
+        :return: New CSR matrix; ``matrix`` is not modified
+        """
+        matrix = sparse.csr_matrix(matrix)
+        n_rows = n_rows or matrix.shape[0]
+        grown = sparse.csr_matrix(
+            (matrix.data, matrix.indices,
+             np.concatenate([matrix.indptr, np.full(n_rows - matrix.shape[0], matrix.indptr[-1])])),
+            shape=(n_rows, matrix.shape[1])
+        )
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = np.ones(n_rows, dtype=matrix.dtype)
+        keep[rows] = 0
+        scatter = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=matrix.dtype), (rows, np.arange(len(rows)))),
+            shape=(n_rows, len(rows))
+        )
+        return sparse.csr_matrix(sparse.diags(keep).dot(grown) + scatter.dot(new_rows), dtype=matrix.dtype)
+
+    @staticmethod
+    def update_interaction_matrix(
+        matrix: sparse.csr_matrix,
+        rows: Sequence[int],
+        cols: Sequence[int],
+        weights: Sequence[float],
+        shape: Optional[Tuple[int, int]] = None
+    ) -> sparse.csr_matrix:
+        """
+        Overwrite entries of a sparse interaction matrix
+
+        The matrix is first grown to ``shape``; then every (row, col) in the
+        delta replaces the stored weight (last occurrence wins). The merge is
+        a single vectorized pass over the stored entries.
+
+        :param matrix: Existing CSR interaction matrix
+        :param rows: Row index of each updated entry
+        :param cols: Column index of each updated entry
+        :param weights: New weight of each updated entry
+        :param shape: New (rows, cols) shape, must not shrink the matrix
+        :return: Updated CSR matrix
+        """
+        shape = shape or matrix.shape
+        if shape != matrix.shape:
+            matrix = matrix.copy()
+            matrix.resize(shape)
+        if len(rows) == 0:
+            return matrix
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        weights = np.asarray(weights, dtype=matrix.dtype)
+
+        linear = rows * shape[1] + cols
+        _, last = np.unique(linear[::-1], return_index=True)
+        keep = len(linear) - 1 - last
+        delta = sparse.csr_matrix(
+            (weights[keep], (rows[keep], cols[keep])), shape=shape, dtype=matrix.dtype
+        )
+        pattern = delta.copy()
+        pattern.data = np.ones_like(pattern.data)
+
+        updated = matrix - matrix.multiply(pattern) + delta
+        updated.eliminate_zeros()
+        return updated.tocsr()
+
+    @staticmethod
+    def normalize_rows(matrix: sparse.spmatrix) -> sparse.csr_matrix:
+        """
+        Scale every row of a sparse matrix to unit L2 norm
+
+        :param matrix: Sparse matrix
+        :return: Row-normalized CSR matrix (all-zero rows stay zero)
+        """
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.csr_matrix(sparse.diags(1.0 / norms).dot(matrix), dtype=np.float32)
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k largest scores per row, best first
+
+        Uses argpartition so only the k winners are sorted.
+
+        :param scores: 1-D or 2-D score array
+        :param k: Number of indices to return
+        :return: Index array of shape (..., min(k, n))
+        """
+        scores = np.asarray(scores)
+        n = scores.shape[-1]
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+        if k < n:
+            candidates = np.argpartition(scores, n - k, axis=-1)[..., n - k:]
+        else:
+            candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind='stable')
+        return np.take_along_axis(candidates, order, axis=-1)
+
+    @staticmethod
+    def top_k_similar(
+        vectors: sparse.spmatrix,
+        k: int = 20,
+        max_block_elements: int = 2 ** 25
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine neighbours of every row of a sparse matrix
+
+        Rows are normalized once, then similarities are computed block by
+        block as sparse products against the whole matrix, so memory stays
+        bounded by ``max_block_elements`` dense scores at a time.
+
+        :param vectors: Item x feature sparse matrix
+        :param k: Neighbours to keep per item
+        :param max_block_elements: Upper bound on block_rows * n_items
+        :return: (int32 neighbour indices, float32 scores), both (n_items, k);
+                 missing neighbours have index -1 and score 0
+        """
+        normalized = RecommendationHelper.normalize_rows(vectors)
+        n_items = normalized.shape[0]
+        neighbours = np.full((n_items, k), -1, dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
+        if n_items == 0 or k == 0:
+            return neighbours, scores
+
+        transposed = normalized.T.tocsc()
+        block_rows = max(1, min(n_items, max_block_elements // n_items))
+        for start in range(0, n_items, block_rows):
+            stop = min(start + block_rows, n_items)
+            block = normalized[start:stop].dot(transposed).toarray()
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+            best = RecommendationHelper.top_k(block, k)
+            best_scores = np.take_along_axis(block, best, axis=1)
+            valid = best_scores > 0
+            width = best.shape[1]
+            neighbours[start:stop, :width] = np.where(valid, best, -1)
+            scores[start:stop, :width] = np.where(valid, best_scores, 0)
+
+        return neighbours, scores
+
+
+class IVFIndex:
+    """
+    Approximate maximum inner product search over dense vectors (IVF)
+
+    Vectors are partitioned into ``n_lists`` inverted lists by spherical
+    k-means on their directions. A query scores the centroids, scans only
+    the ``n_probe`` best lists and returns the top k of those candidates,
+    so the work per query is roughly ``n_probe / n_lists`` of a brute-force
+    scan. Each list's vectors are stored contiguously so a probe is one
+    slice and one matrix-vector product.
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, iterations: int = 10,
+                 sample_size: int = 256, random_state: int = 42, max_block_elements: int = 2 ** 24):
+        """
+        :param n_lists: Number of inverted lists (defaults to ~sqrt(n_vectors))
+        :param n_probe: Lists scanned per query unless overridden in ``query``
+        :param iterations: k-means iterations
+        :param sample_size: k-means trains on at most ``sample_size * n_lists`` vectors
+        :param random_state: Seed for sampling and centroid initialization
+        :param max_block_elements: Memory bound for one assignment block
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.random_state = random_state
+        self.max_block_elements = max_block_elements
+        self.centroids = None
+        self.list_offsets = None
+        self.list_items = None
+        self.list_vectors = None
+
+    def __len__(self):
+        return len(self.list_items) if self.list_items is not None else 0
+
+    def build(self, vectors: np.ndarray) -> 'IVFIndex':
+        """
+        Cluster ``vectors`` and fill the inverted lists
+
+        :param vectors: Dense (n_vectors, dim) array; row i is item i
+        :return: self
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n_vectors = len(vectors)
+        n_lists = min(self.n_lists or max(1, int(round(np.sqrt(n_vectors)))), max(n_vectors, 1))
+        directions = self._normalize(vectors)
+
+        rng = np.random.default_rng(self.random_state)
+        sample = directions
+        if n_vectors > self.sample_size * n_lists:
+            sample = directions[rng.choice(n_vectors, self.sample_size * n_lists, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)] if len(sample) \
+            else np.zeros((n_lists, vectors.shape[1]), dtype=np.float32)
+
+        for _ in range(self.iterations):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.flatnonzero(np.bincount(assignment, minlength=n_lists) == 0)
+            # Re-seed empty lists with random sample vectors
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = self._normalize(sums)
+
+        assignment = self._assign(directions, centroids)
+        order = np.argsort(assignment, kind='stable')
+        self.centroids = centroids
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+        self.list_items = order.astype(np.int32)
+        self.list_vectors = vectors[order]
+        return self
+
+    def query(self, vector: np.ndarray, k: int = 10, n_probe: Optional[int] = None,
+              exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top k items by inner product with ``vector``
+
+        :param vector: Query vector
+        :param k: Number of items
+        :param n_probe: Lists to scan (defaults to the index's ``n_probe``)
+        :param exclude: Item indices to leave out (e.g. already seen)
+        :return: (item indices, scores), best first
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        probes = RecommendationHelper.top_k(self.centroids.dot(vector), n_probe)
+
+        starts, stops = self.list_offsets[probes], self.list_offsets[probes + 1]
+        if len(probes) == 1:
+            items = self.list_items[starts[0]:stops[0]]
+            scores = self.list_vectors[starts[0]:stops[0]].dot(vector)
+        else:
+            items = np.concatenate([self.list_items[start:stop] for start, stop in zip(starts, stops)])
+            scores = np.concatenate([
+                self.list_vectors[start:stop].dot(vector) for start, stop in zip(starts, stops)
+            ])
+        if exclude is not None and len(exclude):
+            scores[np.isin(items, exclude)] = -np.inf
+
+        top = RecommendationHelper.top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return items[top], scores[top]
+
+    def save(self, directory: str, prefix: str = 'ivf'):
+        """
+        Write the index as ``<prefix>_*.npy`` files under ``directory``
+        """
+        for name in ('centroids', 'list_offsets', 'list_items', 'list_vectors'):
+            np.save(os.path.join(directory, f'{prefix}_{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory: str, prefix: str = 'ivf', mmap_mode: Optional[str] = 'r',
+             n_probe: int = 8) -> 'IVFIndex':
+        """
+        Open an index written by ``save``, memory-mapped by default
+        """
+        index = cls(n_probe=n_probe)
+        for name in ('centroids', 'list_offsets', 'list_items', 'list_vectors'):
+            setattr(index, name, np.load(os.path.join(directory, f'{prefix}_{name}.npy'), mmap_mode=mmap_mode))
+        index.n_lists = len(index.centroids)
+        return index
+
+    def _assign(self, directions, centroids):
+        """
+        Nearest centroid (by cosine) of every row, in bounded blocks
+        """
+        assignment = np.empty(len(directions), dtype=np.int64)
+        block_rows = max(1, self.max_block_elements // max(len(centroids), 1))
+        for start in range(0, len(directions), block_rows):
+            assignment[start:start + block_rows] = directions[start:start + block_rows].dot(centroids.T).argmax(axis=1)
+        return assignment
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
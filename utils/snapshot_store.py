@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class SnapshotStore:
+    """
+    Versioned snapshot directories shared by the recommendation model,
+    wine feature store and local search index
+
+    Each snapshot lives in ``directory/<version>`` and holds one .npy file
+    per array plus a manifest.json. ``directory/CURRENT`` names the active
+    version and is only switched, with an atomic rename, once the snapshot
+    is completely written, so readers never see a partial one.
+    """
+
+    @staticmethod
+    @contextmanager
+    def write(directory, version):
+        """
+        Stage a new snapshot and publish it when the block exits cleanly
+
+        Files are written into a hidden staging directory that is renamed to
+        ``directory/<version>`` before CURRENT is pointed at it. If the block
+        raises, the staging directory is removed and CURRENT is left alone.
+
+        :param directory: Snapshot root directory
+        :param version: Version name of the new snapshot
+        :return: Context manager yielding the staging path
+        """
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f'.{version}-', dir=directory)
+        try:
+            yield staging
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        target = os.path.join(directory, version)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.rename(staging, target)
+
+        pointer = os.path.join(directory, f'.CURRENT-{os.getpid()}')
+        with open(pointer, 'w') as current:
+            current.write(version)
+        os.replace(pointer, os.path.join(directory, 'CURRENT'))
+
+    @staticmethod
+    def save_arrays(path, arrays):
+        """
+        Write each array as ``path/<name>.npy`` so it can be memory-mapped
+
+        :param path: Snapshot (or staging) directory
+        :param arrays: Mapping of file name to array
+        """
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+
+    @staticmethod
+    def write_manifest(path, manifest):
+        """
+        Write the snapshot metadata to ``path/manifest.json``
+
+        :param path: Snapshot (or staging) directory
+        :param manifest: JSON-serialisable metadata, including its format
+        """
+        with open(os.path.join(path, 'manifest.json'), 'w') as handle:
+            json.dump(manifest, handle)
+
+    @staticmethod
+    def current(directory):
+        """
+        Read the active version from ``directory/CURRENT``
+
+        :param directory: Snapshot root directory
+        :return: Version name, or None if nothing was published yet
+        """
+        try:
+            with open(os.path.join(directory, 'CURRENT')) as current:
+                return current.read().strip()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def open(directory, snapshot_format, label='snapshot'):
+        """
+        Locate the active snapshot and read its manifest
+
+        :param directory: Snapshot root directory
+        :param snapshot_format: Format the caller knows how to read
+        :param label: Name used in the unsupported-format error
+        :return: (path, manifest) tuple, or (None, None) if no snapshot exists
+        """
+        version = SnapshotStore.current(directory)
+        if version is None:
+            return None, None
+
+        path = os.path.join(directory, version)
+        with open(os.path.join(path, 'manifest.json')) as handle:
+            manifest = json.load(handle)
+        if manifest.get('format') != snapshot_format:
+            raise ValueError(f"Unsupported {label} format: {manifest.get('format')}")
+        return path, manifest
+
+    @staticmethod
+    def load_array(path, name, mmap_mode='r'):
+        """
+        Open ``path/<name>.npy``, memory-mapped unless mmap_mode is None
+        """
+        return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+    @staticmethod
+    def prune(directory, keep):
+        """
+        Delete all but the ``keep`` newest snapshots, never the CURRENT one
+
+        :param directory: Snapshot root directory
+        :param keep: Number of versions to keep
+        """
+        active = SnapshotStore.current(directory)
+        versions = sorted(
+            name for name in os.listdir(directory)
+            if not name.startswith('.') and os.path.isdir(os.path.join(directory, name))
+        )
+        for name in versions[:-keep] if keep else versions:
+            if name != active:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)